@@ -0,0 +1,115 @@
+import hashlib
+import time
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.cache import get_cache
+
+
+WATERMARK_KEY = "watermark:{user_id}:{resource}"
+
+# Resources whose writes are tracked per user. Signals in accounts/signals.py
+# bump them; bulk writers that skip signals call bump_watermarks() themselves.
+RESOURCES = ["profiles", "exercises", "programs", "sessions", "logs"]
+
+
+def get_watermarks(user_id, resources):
+    """{resource: nanosecond timestamp of the user's last write to it}.
+
+    A watermark lost to eviction (or never set) restarts at the current time,
+    which only costs clients one full response."""
+    cache = get_cache()
+    keys = {WATERMARK_KEY.format(user_id=user_id, resource=r): r for r in resources}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        found[key] = cache.get(key)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def last_write(user_id):
+    """Nanosecond timestamp of the user's latest tracked write, or None when
+    none is known (never written, or evicted)"""
+    keys = [WATERMARK_KEY.format(user_id=user_id, resource=r) for r in RESOURCES]
+    return max(get_cache().get_many(keys).values(), default=None)
+
+
+def bump_watermarks(user_id, *resources, using=DEFAULT_DB_ALIAS):
+    """Move the user's watermarks for ``resources`` to the time the write on
+    ``using`` commits. Bumped before, a concurrent GET could pair the new
+    watermark with the old rows, and clients would keep that body as fresh."""
+    if user_id is None:
+        return
+    keys = [WATERMARK_KEY.format(user_id=user_id, resource=r) for r in resources]
+    transaction.on_commit(
+        lambda: get_cache().set_many(dict.fromkeys(keys, time.time_ns()), timeout=None),
+        using=using,
+    )
+
+
+class ConditionalGetMixin:
+    """Strong ETag and Last-Modified on list/retrieve, derived from the user's
+    watermarks for ``watermark_resources`` and the request URL, not from the
+    body. A matching If-None-Match (or, without one, an If-Modified-Since
+    not older than the last write) gets 304 before any queryset runs."""
+
+    watermark_resources = []
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if request.user.pk is None:
+            return handler(request, *args, **kwargs)
+
+        # Read before the data, so a concurrent write can only make it stale
+        watermarks = get_watermarks(request.user.pk, self.watermark_resources)
+        etag = self.get_etag(request, watermarks)
+        last_modified = self.get_last_modified(watermarks)
+
+        if self.not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def get_etag(self, request, watermarks):
+        state = [
+            str(request.user.pk),
+            request.accepted_renderer.format,
+            request.get_full_path(),
+            *(f"{resource}={watermarks[resource]}" for resource in sorted(watermarks)),
+        ]
+        return '"%s"' % hashlib.sha1("\n".join(state).encode()).hexdigest()
+
+    def get_last_modified(self, watermarks):
+        """The last write in whole seconds, rounded up, or None until that
+        second is over: a later write in the same second would have the same
+        Last-Modified, and If-Modified-Since could not tell them apart"""
+        last_modified = -(-max(watermarks.values()) // 1_000_000_000)
+        if last_modified * 1_000_000_000 > time.time_ns():
+            return None
+        return last_modified
+
+    def not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            return if_none_match.strip() == "*" or etag in parse_etags(if_none_match)
+        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        return (
+            last_modified is not None
+            and if_modified_since is not None
+            and last_modified <= if_modified_since
+        )
@@ -0,0 +1,132 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import RelatedField
+
+
+class SparseFieldsetSerializerMixin:
+    """Serializer side of ?fields=/?omit=: ``fields=`` keeps only the named
+    fields of the representation.
+
+    ``required_paths()`` reports which model columns the remaining fields
+    read, so the view can defer the rest. Fields with ``source="*"`` (method
+    fields) declare theirs in ``Meta.field_columns``; one without a
+    declaration needs the whole instance."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def required_paths(self):
+        """(columns, relations): the ``__`` paths of the columns read, and of
+        the relations whose whole row is read ("" being the instance itself)"""
+        columns, relations = set(), set()
+        declared = getattr(self.Meta, "field_columns", {})
+        for name, field in self.fields.items():
+            if field.source == "*":
+                if name in declared:
+                    columns.update(declared[name])
+                else:
+                    relations.add("")
+                continue
+            path = "__".join(field.source_attrs)
+            model_field = _resolve(self.Meta.model, path)
+            if model_field is None or not model_field.is_relation:
+                columns.add(path)
+            elif not isinstance(field, RelatedField):
+                # e.g. a nested serializer reading the related object
+                relations.add(path)
+            # A primary key field only reads the foreign key, never deferred
+        return columns, relations
+
+
+class SparseFieldsetMixin:
+    """?fields=a,b (keep) and ?omit=c (drop) on list and detail, for views
+    whose read serializer uses SparseFieldsetSerializerMixin.
+
+    The choice is pushed down into the query: the columns of the model and
+    of its select_related relations that neither the remaining fields nor
+    the ordering read are deferred, so e.g. notes and descriptions are not
+    fetched for list screens that do not show them. Foreign keys and
+    primary keys are always loaded."""
+
+    fieldset_actions = ("list", "retrieve")
+
+    def get_fieldset(self):
+        """The field names to render, or None for all of them"""
+        if self.action not in self.fieldset_actions:
+            return None
+        params = self.request.query_params
+        if "fields" not in params and "omit" not in params:
+            return None
+        available = list(self.get_serializer_class()().fields)
+        selected = _parse_names(params, "fields", available) or set(available)
+        return selected - _parse_names(params, "omit", available)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.fieldset_actions:
+            kwargs.setdefault("fields", self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in self.fieldset_actions:
+            return queryset
+        deferred = unused_columns(queryset, self.get_serializer())
+        return queryset.defer(*deferred) if deferred else queryset
+
+
+def unused_columns(queryset, serializer):
+    """The ``__`` paths of the non-key columns loaded by ``queryset`` (its
+    model and select_related relations) that ``serializer`` does not read"""
+    columns, relations = serializer.required_paths()
+    for field in queryset.query.order_by or queryset.model._meta.ordering:
+        if isinstance(field, str):
+            columns.add(field.lstrip("-"))
+
+    unused = []
+    for prefix in ["", *_select_related_paths(queryset.query.select_related)]:
+        if prefix in relations:
+            continue
+        model = queryset.model if not prefix else _resolve(queryset.model, prefix).related_model
+        for field in model._meta.concrete_fields:
+            path = f"{prefix}__{field.name}" if prefix else field.name
+            if not (field.primary_key or field.is_relation or path in columns):
+                unused.append(path)
+    return unused
+
+
+def _parse_names(params, param, available):
+    requested = {name.strip() for name in params.get(param, "").split(",") if name.strip()}
+    unknown = requested - set(available)
+    if unknown:
+        raise ValidationError(
+            {param: f"Unknown field {', '.join(sorted(unknown))}; use {', '.join(available)}."}
+        )
+    return requested
+
+
+def _resolve(model, path):
+    """The model field at the end of a ``__`` path, or None if there is none"""
+    field = None
+    for name in path.split("__"):
+        if model is None:
+            return None
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        model = field.related_model
+    return field
+
+
+def _select_related_paths(select_related, prefix=""):
+    if not isinstance(select_related, dict):
+        return []
+    paths = []
+    for name, nested in select_related.items():
+        path = f"{prefix}__{name}" if prefix else name
+        paths.append(path)
+        paths.extend(_select_related_paths(nested, path))
+    return paths
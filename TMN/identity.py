@@ -0,0 +1,85 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+
+
+class IdentityMap:
+    """Model instances loaded during one request, by model and primary key.
+
+    Permissions, serializers and views resolve ids through it, so an object
+    is fetched at most once per request whoever asks first. Misses are
+    remembered too. Instances are shared, not copied: a change made by one
+    reader is seen by the next."""
+
+    def __init__(self):
+        self._instances = {}
+
+    def get(self, model, pk):
+        """The instance with this pk, or None if there is none"""
+        return self.get_many(model, [pk]).get(self._key(model, pk))
+
+    def get_many(self, model, pks):
+        """{pk: instance} for the pks that exist, fetching the unseen ones in one query"""
+        keys = {self._key(model, pk) for pk in pks} - {None}
+        missing = [key for key in keys if (model, key) not in self._instances]
+        if missing:
+            found = model._default_manager.in_bulk(missing)
+            for key in missing:
+                self._instances[model, key] = found.get(key)
+        return {
+            key: self._instances[model, key]
+            for key in keys
+            if self._instances[model, key] is not None
+        }
+
+    def add(self, *instances):
+        """Remember instances loaded elsewhere, and the related objects
+        already cached on them (e.g. by select_related)"""
+        for instance in instances:
+            self._instances[type(instance), instance.pk] = instance
+            for related in instance._state.fields_cache.values():
+                if related is not None and hasattr(related, "_state"):
+                    self._instances.setdefault((type(related), related.pk), related)
+
+    @staticmethod
+    def _key(model, pk):
+        if isinstance(pk, bool):
+            return None
+        try:
+            return model._meta.pk.to_python(pk)
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+
+
+def identity_map(request):
+    """The request's IdentityMap, created on first use"""
+    try:
+        return request._identity_map
+    except AttributeError:
+        request._identity_map = IdentityMap()
+        return request._identity_map
+
+
+class IdentityMapMixin:
+    """Adds the view's object, and what it was loaded with, to the identity map"""
+
+    def get_object(self):
+        obj = super().get_object()
+        identity_map(self.request).add(obj)
+        return obj
+
+
+class IdentityMapRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField resolving pks through the request's identity
+    map. Restricted querysets (with filters) are queried as usual."""
+
+    def to_internal_value(self, data):
+        request = self.context.get("request")
+        queryset = self.get_queryset()
+        if request is None or queryset.query.has_filters():
+            return super().to_internal_value(data)
+        if not isinstance(data, (int, str)) or IdentityMap._key(queryset.model, data) is None:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        instance = identity_map(request).get(queryset.model, data)
+        if instance is None:
+            self.fail("does_not_exist", pk_value=data)
+        return instance
@@ -0,0 +1,264 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.functional import SimpleLazyObject
+from rest_framework import serializers
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+# (name, help, RequestMetrics attribute); times are exported in seconds
+SERIES = [
+    ("tmn_request_duration_seconds", "Time to build the response.", "total_time"),
+    ("tmn_request_sql_queries", "SQL queries per request.", "queries"),
+    ("tmn_request_sql_duration_seconds", "Time spent in SQL per request.", "sql_time"),
+    (
+        "tmn_request_serializer_duration_seconds",
+        "Time spent serializing per request.",
+        "serializer_time",
+    ),
+]
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.total_time = 0.0
+        self.serializing = False
+        # Worker threads of one request (see accounts.dashboard) share it
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper (see connection.execute_wrapper)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.sql_time += elapsed
+                self.queries += 1
+
+    def server_timing(self):
+        return ", ".join(
+            [
+                f'db;dur={self.sql_time * 1000:.2f};desc="{self.queries} queries"',
+                f"serialize;dur={self.serializer_time * 1000:.2f}",
+                f"total;dur={self.total_time * 1000:.2f}",
+            ]
+        )
+
+
+def _execute(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(connection, **kwargs):
+    """Count the connection's queries in the metrics of the request running
+    them. The request is found through a context variable, which follows it
+    into the threads its sync code runs in (under ASGI, or worker threads)."""
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+def install_execute_wrappers(**kwargs):
+    # request_started is sent in the thread that runs the request's sync
+    # code, whose connections may predate the middleware
+    for connection in connections.all(initialized_only=True):
+        install_execute_wrapper(connection)
+
+
+@contextmanager
+def timed_serialization():
+    """Counts the block as serializer time of the current request; nested
+    blocks (serializers rendering serializers) are counted once"""
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+        metrics.serializing = False
+
+
+def _timed_data(prop):
+    def data(self):
+        with timed_serialization():
+            return prop.fget(self)
+
+    return property(data)
+
+
+def instrument_serializers():
+    """Time Serializer.data and ListSerializer.data; installed once, only
+    when the middleware is enabled"""
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__["data"]
+        if not getattr(prop.fget, "timed", False):
+            cls.data = _timed_data(prop)
+            cls.__dict__["data"].fget.timed = True
+
+
+class Summary:
+    """Count, sum and a window of the latest observations, for quantiles"""
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        return [(q, ordered[min(len(ordered) - 1, int(q * len(ordered)))]) for q in QUANTILES]
+
+
+class MetricsRegistry:
+    """In-process summaries per (view, method). Each worker process keeps
+    its own, so scrape every worker (or aggregate by instance)."""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._summaries = {}
+
+    def observe(self, labels, metrics):
+        with self._lock:
+            for name, _, attribute in SERIES:
+                key = (name, labels)
+                if key not in self._summaries:
+                    self._summaries[key] = Summary(self.window)
+                self._summaries[key].observe(getattr(metrics, attribute))
+
+    def clear(self):
+        with self._lock:
+            self._summaries.clear()
+
+    def render(self):
+        """The Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            lines = []
+            for name, help_text, _ in SERIES:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+                for (series, labels), summary in sorted(self._summaries.items()):
+                    if series != name:
+                        continue
+                    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    for q, value in summary.quantiles():
+                        lines.append(f'{name}{{{label_text},quantile="{q}"}} {value:g}')
+                    lines.append(f"{name}_sum{{{label_text}}} {summary.total:g}")
+                    lines.append(f"{name}_count{{{label_text}}} {summary.count}")
+            return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """Records per request the SQL query count and time, serializer time and
+    total time; sends them as a Server-Timing header to staff users and adds
+    them to the per-view summaries served by MetricsView.
+
+    With REQUEST_METRICS off the middleware removes itself at startup, so
+    requests pay nothing. It runs natively under both WSGI and ASGI, so it
+    does not force async views through a thread."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_METRICS", False):
+            raise MiddlewareNotUsed
+        registry.window = getattr(settings, "REQUEST_METRICS_WINDOW", registry.window)
+        instrument_serializers()
+        connection_created.connect(install_execute_wrapper)
+        request_started.connect(install_execute_wrappers)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        metrics.total_time = time.perf_counter() - started
+        if self.shows_timing(request):
+            response["Server-Timing"] = metrics.server_timing()
+        registry.observe((("view", self.view_name(request)), ("method", request.method)), metrics)
+        return response
+
+    @staticmethod
+    def shows_timing(request):
+        """Whether the request's user is staff. Only a user already loaded
+        counts (DRF sets the one it authenticated on the request): loading
+        one here would cost a query, and cannot run in an async request."""
+        user = vars(request).get("user")
+        if isinstance(user, SimpleLazyObject):
+            user = vars(request).get("_cached_user")
+        return getattr(user, "is_staff", False)
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, "resolver_match", None)
+        return match.view_name if match is not None else "unresolved"
+
+
+class MetricsView(APIView):
+    """Request metrics in the Prometheus text format (staff only)"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
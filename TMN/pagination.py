@@ -0,0 +1,169 @@
+import base64
+import json
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on the queryset's own ordering.
+
+    The cursor is an opaque token holding the ordering values of the last (or,
+    going back, the first) row of the page, and the next page is selected with
+    a keyset condition like ``(date, id) > (d, i)`` rather than an OFFSET, so a
+    page deep in a long history costs the same as the first one. The primary
+    key is appended to the ordering when needed so rows are never skipped or
+    repeated between pages.
+
+    ``?page_size=`` overrides API_PAGE_SIZE, up to API_MAX_PAGE_SIZE."""
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        values, self.reverse = self.decode_cursor(request)
+
+        ordering = [self._flip(field) for field in self.ordering] if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._after(ordering, values))
+                # Surface malformed cursor values now rather than at render time
+                rows = list(queryset[: self.page_size + 1])
+            except (DjangoValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+        else:
+            rows = list(queryset[: self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        if self.reverse:
+            self.page.reverse()
+        # Arriving from one side means there are rows on that side
+        self.has_next = has_more if not self.reverse else values is not None
+        self.has_previous = has_more if self.reverse else values is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        default = getattr(settings, "API_PAGE_SIZE", 50)
+        maximum = getattr(settings, "API_MAX_PAGE_SIZE", 500)
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return default
+        return min(size, maximum) if size > 0 else default
+
+    def get_ordering(self, queryset):
+        ordering = [
+            field
+            for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str) and field != "?"
+        ]
+        pk_names = {"pk", queryset.model._meta.pk.name}
+        if not ordering or ordering[-1].lstrip("-") not in pk_names:
+            descending = bool(ordering) and ordering[-1].startswith("-")
+            ordering.append("-pk" if descending else "pk")
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            values, reverse = payload["v"], bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _link(self, row, reverse):
+        values = [_cursor_value(_lookup(row, field.lstrip("-"))) for field in self.ordering]
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(values, reverse)
+        )
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _after(ordering, values):
+        """(f1, f2, ...) strictly after (v1, v2, ...) in the given ordering"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip("-")
+            operator = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{operator}": value})
+            equal &= Q(**{name: value})
+        # The redundant bound on the leading column lets the database seek to
+        # the cursor in an index instead of filtering the rows before it
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+        return bound & condition
+
+
+def _lookup(obj, path):
+    # Rows from .values() carry the ordering columns under their lookups
+    if isinstance(obj, Mapping):
+        return obj[path]
+    for name in path.split("__"):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _cursor_value(value):
+    # Dates and datetimes round-trip through their ISO form, microseconds included
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
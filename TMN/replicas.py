@@ -0,0 +1,87 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from TMN.conditional import last_write
+from TMN.streaming import iterate_with
+
+
+_reads = ContextVar("replica_reads", default=None)
+
+
+def read_database(user):
+    """Where the user's replica-eligible reads go: REPLICA_DATABASE, unless
+    none is set or the user wrote in the last REPLICA_PIN_SECONDS, which
+    keeps them reading their own writes while the replica catches up.
+
+    The writes are known from the watermarks. Without any (evicted, or never
+    set) the user reads from "default" too, until a conditional GET sets
+    them again."""
+    alias = getattr(settings, "REPLICA_DATABASE", None)
+    if not alias or user.pk is None:
+        return DEFAULT_DB_ALIAS
+    written = last_write(user.pk)
+    window = getattr(settings, "REPLICA_PIN_SECONDS", 30) * 1_000_000_000
+    if written is None or written > time.time_ns() - window:
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+class ReplicaRouter:
+    """Writes go to "default", and so do reads, except inside the views of
+    ReplicaReadsMixin, which send theirs to the replica. The replica is not
+    migrated: it gets the schema with the data (see sync_replica)."""
+
+    def db_for_read(self, model, **hints):
+        # Never None: Django would fall back to the database an instance
+        # was read from, sending later reads of replica rows to the replica
+        return _reads.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == getattr(settings, "REPLICA_DATABASE", None):
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """Runs the reads of ``replica_actions`` (of a viewset) or of every GET
+    (of other views) on the replica, as chosen by read_database(). Streamed
+    bodies keep reading from it while they are sent."""
+
+    replica_actions = ["list"]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = None
+        if self.reads_from_replica(request):
+            alias = read_database(request.user)
+            if alias != DEFAULT_DB_ALIAS:
+                self._replica_token = _reads.set(alias)
+
+    def reads_from_replica(self, request):
+        action = getattr(self, "action", None)
+        if action is None:
+            return request.method in ("GET", "HEAD")
+        return action in self.replica_actions
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            self._replica_token = None
+            alias = _reads.get()
+            _reads.reset(token)
+            if response.streaming:
+                response.streaming_content = iterate_with(
+                    _reads, alias, response.streaming_content
+                )
+        return response
@@ -48,12 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "TMN.metrics.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "TMN.shards.UserShardMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -94,13 +96,80 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development only
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# TMN.sqlite is the stock SQLite backend with WAL, tuned pragmas and BEGIN
+# IMMEDIATE transactions (see TMN/sqlite/base.py); OPTIONS["pragmas"]
+# overrides its pragmas. Connections are kept for CONN_MAX_AGE seconds and
+# checked before a request reuses them.
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "TMN.sqlite",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+    },
+    "replica": {
+        "ENGINE": "TMN.sqlite",
+        "NAME": BASE_DIR / "db.replica.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+    },
+    "shard0": {
+        "ENGINE": "TMN.sqlite",
+        "NAME": BASE_DIR / "db.shard0.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+    },
+    "shard1": {
+        "ENGINE": "TMN.sqlite",
+        "NAME": BASE_DIR / "db.shard1.sqlite3",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+    },
+}
+
+# Read replica (TMN/replicas.py). With REPLICA_DATABASE set, analytics,
+# exports and list endpoints read from that alias and everything else uses
+# "default". A user's reads stay on "default" for REPLICA_PIN_SECONDS after
+# their last write, which must be longer than the replica's lag. The last
+# write is read from the watermarks in the cache, so with several workers
+# the cache must be shared (not LocMem), or a worker that did not see the
+# write sends the user to the lagging replica; writes that skip signals
+# (queryset update(), raw SQL) must call bump_watermarks() for the same
+# reason. Locally the replica is a second SQLite file: after `manage.py
+# migrate`, keep it fresh with `manage.py sync_replica --interval 10` and
+# set REPLICA_DATABASE to "replica".
+REPLICA_DATABASE = None
+REPLICA_PIN_SECONDS = 30
+
+# User shards (TMN/shards.py). With SHARD_DATABASES set, the per-user models
+# (profiles, exercises, programs, sessions, logs and what is derived from
+# them) live on the alias each user id hashes to; users and the other auth
+# tables stay on "default", and per-user reads skip the replica. Run
+# `manage.py migrate --database <alias>` for each shard, then
+# `manage.py rebalance_shards` to move existing data, again after adding a
+# shard. Add new shards at the end: a shard's position picks its id range.
+DATABASE_ROUTERS = ["TMN.shards.ShardRouter", "TMN.replicas.ReplicaRouter"]
+SHARD_DATABASES = []
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMem is per process: when running several workers, point this at a shared
+# backend (e.g. FileBasedCache) so analytics invalidation reaches all of them.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tmn-default",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
+# Analytics responses are cached per user and data version (see accounts/cache.py)
+ANALYTICS_CACHE_ALIAS = "default"
+ANALYTICS_CACHE_TIMEOUT = 60 * 60 * 6
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,11 +217,40 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ]
 }
 
+# Page size of the cursor-paginated list endpoints (TMN.pagination), which
+# clients can change with ?page_size= up to the maximum
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Serve the log and session lists from .values() rows instead of the read
+# serializers (workouts/fast_lists.py); the output is the same either way
+API_FAST_LISTS = True
+
+# Per-request SQL/serializer timing: a Server-Timing header on the responses
+# to staff users and per-view summaries (latest REQUEST_METRICS_WINDOW
+# requests) at /api/_metrics/ for staff. Off, the middleware drops out at
+# startup.
+REQUEST_METRICS = False
+REQUEST_METRICS_WINDOW = 1024
+
+# CachedJWTAuthentication (accounts/authentication.py) keeps up to
+# JWT_USER_CACHE_SIZE verified users per process for JWT_USER_CACHE_TTL
+# seconds, so token requests skip the user query. Saving a user drops them
+# from the cache of the process that saved them; the TTL bounds how long
+# other workers still accept a deactivated user or an old password.
+JWT_USER_CACHE_SIZE = 10000
+JWT_USER_CACHE_TTL = 60
+
+# Idempotency-Key responses (workouts/idempotency.py) are replayed for
+# IDEMPOTENCY_KEY_TTL seconds; run `manage.py purge_idempotency_keys`
+# periodically (e.g. daily from cron) to delete the expired ones.
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
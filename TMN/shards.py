@@ -0,0 +1,238 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from TMN.streaming import iterate_with
+
+
+# Per-user models by label, with the lookup from each to its owner's id, in
+# dependency order (parents first). Users and the other auth tables stay on
+# "default"; every shard keeps a copy of the rows of its users, which the
+# foreign keys of their data point to (see copy_users).
+SHARDED_MODELS = {
+    "accounts.Profile": "user_id",
+    "exercises.Exercise": "user_id",
+    "programs.ExerciseProgram": "user_id",
+    "programs.ProgramExercise": "program__user_id",
+    "workouts.TrainingSession": "user_id",
+    "workouts.WorkoutLog": "session__user_id",
+    "workouts.DailyExerciseRollup": "user_id",
+    "workouts.PersonalRecord": "user_id",
+    "workouts.IdempotencyKey": "user_id",
+}
+
+# Shard number n (from 1, in SHARD_DATABASES order) hands out ids from
+# n * ID_RANGE, and "default" keeps the ids below it, so rows keep their ids
+# when rebalance_shards moves them out of "default" or into a shard added
+# at the end. Stays under 2**53 for JSON clients.
+ID_RANGE = 10**12
+
+_shard = ContextVar("shard", default=None)
+_request = ContextVar("shard_request", default=None)
+
+
+def shard_databases():
+    return getattr(settings, "SHARD_DATABASES", [])
+
+
+def sharded_models():
+    """The per-user model classes, parents first"""
+    return [apps.get_model(label) for label in SHARDED_MODELS]
+
+
+def owner_lookup(model):
+    return SHARDED_MODELS[model._meta.label]
+
+
+def _weight(alias, user_id):
+    digest = hashlib.blake2b(f"{alias}:{user_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_for(user_id, aliases=None):
+    """The alias holding the user's data. Rendezvous hashing: each user goes
+    to the alias scoring highest for them, so adding a shard only moves the
+    users the new one wins, and removing one only moves its own users."""
+    aliases = shard_databases() if aliases is None else aliases
+    return max(aliases, key=lambda alias: _weight(alias, user_id))
+
+
+@contextmanager
+def use_shard(alias):
+    """Route the per-user queries of the block to ``alias``"""
+    token = _shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _shard.reset(token)
+
+
+def use_user_shard(user_id):
+    """Route the per-user queries of the block to the user's shard; does
+    nothing when sharding is off"""
+    return use_shard(shard_for(user_id) if shard_databases() else None)
+
+
+def user_groups(user_ids=None):
+    """Yield ``user_ids`` split by shard, each group with its shard selected
+    while the caller handles it. None (all users) yields None once per shard.
+    Without sharding ``user_ids`` is yielded as is."""
+    aliases = shard_databases()
+    if not aliases:
+        yield user_ids
+        return
+    if user_ids is None:
+        groups = dict.fromkeys(aliases)
+    else:
+        groups = {}
+        for user_id in user_ids:
+            groups.setdefault(shard_for(user_id), []).append(user_id)
+    for alias, group in groups.items():
+        with use_shard(alias):
+            yield group
+
+
+def current_shard():
+    """The shard selected with use_shard(), or else that of the user of the
+    request being handled (see UserShardMiddleware)"""
+    alias = _shard.get()
+    if alias is not None:
+        return alias
+    user = getattr(_request.get(), "user", None)
+    if user is not None and user.is_authenticated:
+        return shard_for(user.pk)
+    return None
+
+
+def _hinted_shard(instance):
+    if instance._state.db in shard_databases():
+        return instance._state.db
+    if isinstance(instance, get_user_model()):
+        user_id = instance.pk
+    else:
+        user_id = getattr(instance, "user_id", None)
+    return None if user_id is None else shard_for(user_id)
+
+
+class ShardRouter:
+    """Sends the queries of SHARDED_MODELS to the shard of the user they
+    belong to, found from the instance involved (a user, or a row of theirs)
+    or else from current_shard(). Other models are left to the next router.
+
+    With SHARD_DATABASES empty (the default) it routes nothing. Otherwise
+    every migrated shard gets all the tables, as "default" does."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label not in SHARDED_MODELS or not shard_databases():
+            return None
+        instance = hints.get("instance")
+        alias = (_hinted_shard(instance) if instance is not None else None) or current_shard()
+        if alias is None:
+            raise RuntimeError(
+                f"No shard for {model._meta.label}: query it in a request of "
+                "an authenticated user, or inside use_user_shard()/use_shard()"
+            )
+        return alias
+
+    db_for_write = db_for_read
+
+
+class UserShardMiddleware:
+    """Makes the request current while it is handled, so ShardRouter routes
+    per-user queries to the shard of its user, as authenticated by Django or
+    (once the view has run authentication) by DRF. Streamed bodies keep it
+    current while they are sent.
+
+    With SHARD_DATABASES empty the middleware removes itself at startup."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not shard_databases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if response.streaming:
+            response.streaming_content = iterate_with(
+                _request, request, response.streaming_content
+            )
+        return response
+
+
+def copy_users(users):
+    """Write the users' rows to their shards, inserting or updating them"""
+    if not shard_databases():
+        return
+    User = get_user_model()
+    fields = User._meta.concrete_fields
+    by_shard = {}
+    for user in users:
+        copy = User(**{field.attname: getattr(user, field.attname) for field in fields})
+        by_shard.setdefault(shard_for(user.pk), []).append(copy)
+    for alias, copies in by_shard.items():
+        User._base_manager.using(alias).bulk_create(
+            copies,
+            update_conflicts=True,
+            unique_fields=[User._meta.pk.name],
+            update_fields=[field.name for field in fields if not field.primary_key],
+        )
+
+
+def delete_user_data(user):
+    """Delete the user's row from their shard, and their data with it"""
+    if not shard_databases():
+        return
+    alias = shard_for(user.pk)
+    with use_shard(alias):
+        get_user_model()._base_manager.using(alias).filter(pk=user.pk).delete()
+
+
+def reserve_id_ranges(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Move the id sequences of a SQLite shard's per-user tables to the
+    start of its ID_RANGE; connected to post_migrate"""
+    aliases = shard_databases()
+    connection = connections[using]
+    if using not in aliases or connection.vendor != "sqlite":
+        return
+    start = (aliases.index(using) + 1) * ID_RANGE
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s",
+                [start, table, start],
+            )
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s"
+                " WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                [table, start, table],
+            )
@@ -0,0 +1,52 @@
+"""SQLite backend for concurrent requests (ENGINE = "TMN.sqlite").
+
+On top of django.db.backends.sqlite3 it:
+
+- runs PRAGMAS on every new connection, WAL first, so readers no longer
+  block the writer and a write waits for the lock instead of failing.
+  OPTIONS["pragmas"] overrides or extends them (None skips one).
+- starts atomic blocks with BEGIN IMMEDIATE unless OPTIONS sets
+  "transaction_mode". A deferred transaction that reads before it writes
+  cannot upgrade its lock once another writer committed in between, and
+  SQLite fails it with "database is locked" without waiting.
+- checks a persistent connection (CONN_MAX_AGE with CONN_HEALTH_CHECKS)
+  with a query before reusing it; the stock backend assumes it is usable.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    # With WAL only checkpoints need an fsync to be safe against corruption
+    "synchronous": "NORMAL",
+    # Milliseconds a writer waits for the lock before "database is locked"
+    "busy_timeout": 5000,
+    # Negative sizes are in KiB: a 20MB page cache per connection
+    "cache_size": -20000,
+    "temp_store": "MEMORY",
+    "mmap_size": 128 * 1024 * 1024,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **kwargs.pop("pragmas", {})}
+        if "transaction_mode" not in self.settings_dict["OPTIONS"]:
+            self.transaction_mode = "IMMEDIATE"
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def is_usable(self):
+        try:
+            self.connection.execute("SELECT 1")
+        except self.Database.Error:
+            return False
+        return True
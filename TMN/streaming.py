@@ -0,0 +1,14 @@
+def iterate_with(var, value, iterable):
+    """Iterate a streamed response body with the context variable ``var`` set
+    to ``value`` while each chunk is produced"""
+    iterator = iter(iterable)
+    while True:
+        # Set around each step: the server may iterate in another context
+        token = var.set(value)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            var.reset(token)
+        yield chunk
@@ -1,7 +1,16 @@
 from django.contrib import admin
 from django.urls import path , include
-from accounts.analytics import WeightAnalyticsView, BMIAnalyticsView , ExerciseAnalyticsView
+from accounts.analytics import (
+    WeightAnalyticsView,
+    BMIAnalyticsView,
+    WeightTrendAnalyticsView,
+    ExerciseAnalyticsView,
+    ExerciseBatchAnalyticsView,
+    AnalyticsCacheStatsView,
+)
 from accounts import urls as accounts
+from accounts.dashboard import DashboardView
+from TMN.metrics import MetricsView
 
 
 urlpatterns = [
@@ -12,6 +21,11 @@ urlpatterns = [
     path('api/programs/', include('programs.urls')),
     path('api/workouts/', include('workouts.urls')),
     path('api/analytics/weight/', WeightAnalyticsView.as_view()),
+    path('api/analytics/weight/trend/', WeightTrendAnalyticsView.as_view()),
     path('api/analytics/bmi/', BMIAnalyticsView.as_view()),
     path('api/analytics/exercise/<int:exercise_id>/', ExerciseAnalyticsView.as_view()),
+    path('api/analytics/exercises/', ExerciseBatchAnalyticsView.as_view()),
+    path('api/analytics/cache-stats/', AnalyticsCacheStatsView.as_view()),
+    path('api/analytics/dashboard/', DashboardView.as_view()),
+    path('api/_metrics/', MetricsView.as_view()),
 ]
@@ -1,14 +1,30 @@
 from .models import Profile
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Avg, Max, Min, Sum, Count
+from rest_framework.permissions import IsAdminUser
+from rest_framework.exceptions import ValidationError
+from django.db.models import (
+    Avg,
+    Max,
+    Min,
+    Sum,
+    Count,
+    F,
+    Window,
+    ExpressionWrapper,
+    FloatField,
+)
 from datetime import timedelta
-from workouts.models import WorkoutLog
+from workouts.models import DailyExerciseRollup
 from exercises.models import Exercise
 from django.utils import timezone
+from TMN.replicas import ReplicaReadsMixin
+from .cache import cached_analytics, get_cache_stats
+from .series import BUCKETS, as_date, lttb, parse_series_options
+from .trends import clean, bmi, compute_weight_trend, load_profile_series, scalar_bmi
 
 
-class BaseAnalyticsView(APIView):
+class BaseAnalyticsView(ReplicaReadsMixin, APIView):
 
     DEFAULT_DAYS = 30
 
@@ -18,10 +34,26 @@ class BaseAnalyticsView(APIView):
         start_date = end_date - timedelta(days=days)
         return start_date, end_date, days
 
+    def bucket_history(self, profiles, bucket, value):
+        """Average ``value`` per day/week/month, grouped in SQL"""
+        rows = (
+            profiles.annotate(period=BUCKETS[bucket]("created_at"))
+            .values("period")
+            .annotate(value=Avg(value))
+            .order_by("period")
+        )
+        return [
+            {"date": as_date(row["period"]), "value": round(row["value"], 1)}
+            for row in rows
+            if row["value"] is not None
+        ]
+
 
 class WeightAnalyticsView(BaseAnalyticsView):
+    @cached_analytics("weight")
     def get(self, request):
         start_date, end_date, days = self.get_time_range(request)
+        bucket, max_points = parse_series_options(request.query_params)
 
         profiles = Profile.objects.filter(
             user=request.user, created_at__range=[start_date, end_date]
@@ -30,6 +62,13 @@ class WeightAnalyticsView(BaseAnalyticsView):
         if not profiles.exists():
             return Response({"message": "No profile data available"}, status=404)
 
+        if bucket:
+            history = self.bucket_history(profiles, bucket, "weight")
+        else:
+            history = [
+                {"date": p.created_at.date(), "value": p.weight} for p in profiles
+            ]
+
         return Response(
             {
                 "time_period": f"Last {days} days",
@@ -37,16 +76,16 @@ class WeightAnalyticsView(BaseAnalyticsView):
                 "stats": profiles.aggregate(
                     avg=Avg("weight"), max=Max("weight"), min=Min("weight")
                 ),
-                "history": [
-                    {"date": p.created_at.date(), "value": p.weight} for p in profiles
-                ],
+                "history": lttb(history, max_points, "date", "value"),
             }
         )
 
 
 class BMIAnalyticsView(BaseAnalyticsView):
+    @cached_analytics("bmi")
     def get(self, request):
         start_date, end_date, days = self.get_time_range(request)
+        bucket, max_points = parse_series_options(request.query_params)
 
         profiles = Profile.objects.filter(
             user=request.user, created_at__range=[start_date, end_date]
@@ -55,100 +94,268 @@ class BMIAnalyticsView(BaseAnalyticsView):
         if not profiles.exists():
             return Response({"message": "No profile data available"}, status=404)
 
-        # Calculate BMI for each profile
-        def calculate_bmi(profile):
-            if profile.height and profile.weight:
-                height_in_meters = profile.height / 100  # Convert cm to meters
-                return round(profile.weight / (height_in_meters**2), 1)
-            return None
+        if bucket:
+            history = self.bucket_history(
+                profiles.filter(height__gt=0, weight__gt=0),
+                bucket,
+                ExpressionWrapper(
+                    F("weight") * 10000.0 / (F("height") * F("height")),
+                    output_field=FloatField(),
+                ),
+            )
+            current = scalar_bmi(*profiles.values_list("weight", "height").last())
+        else:
+            # Load the window once and compute every BMI in one array operation
+            series = load_profile_series(request.user, start_date, end_date)
+            values = bmi(series.weight, series.height)
+            current = clean(values[-1])
+            history = [
+                {"date": created_at.date(), "value": value}
+                for created_at, value in zip(series.created_at, values.tolist())
+                if value == value  # Only include valid BMI values (NaN != NaN)
+            ]
 
         return Response(
             {
                 "time_period": f"Last {days} days",
-                "current": calculate_bmi(profiles.last()),
-                "history": [
-                    {"date": p.created_at.date(), "value": calculate_bmi(p)}
-                    for p in profiles
-                    if calculate_bmi(p) is not None  # Only include valid BMI values
-                ],
+                "current": current,
+                "history": lttb(history, max_points, "date", "value"),
             }
         )
 
 
-class ExerciseAnalyticsView(BaseAnalyticsView):  
-    def get(self, request, exercise_id):
-        start_date, end_date, days = self.get_time_range(request)
+class WeightTrendAnalyticsView(BaseAnalyticsView):
+    """Moving average, smoothed trend, weekly rate and projection of body weight.
+
+    Optional parameters: ``window`` (points in the moving average, default 7),
+    ``alpha`` (smoothing factor in (0, 1], default 0.3) and ``horizon``
+    (days to project ahead, default 30)."""
 
+    @cached_analytics("weight_trend")
+    def get(self, request):
+        start_date, end_date, days = self.get_time_range(request)
+        _, max_points = parse_series_options(request.query_params)
         try:
-            exercise = Exercise.objects.get(id=exercise_id, user=request.user)
-        except Exercise.DoesNotExist:
-            return Response({"error": "Exercise not found"}, status=404)
+            window = int(request.query_params.get("window", 7))
+            alpha = float(request.query_params.get("alpha", 0.3))
+            horizon = int(request.query_params.get("horizon", 30))
+        except ValueError:
+            raise ValidationError("window, alpha and horizon must be numbers.")
+        if window < 1 or not 0 < alpha <= 1 or horizon < 0:
+            raise ValidationError("Expected window >= 1, 0 < alpha <= 1 and horizon >= 0.")
+
+        series = load_profile_series(request.user, start_date, end_date)
+        trend = compute_weight_trend(series, window=window, alpha=alpha, horizon_days=horizon)
+        if trend is None:
+            return Response({"message": "No profile data available"}, status=404)
+
+        trend["points"] = lttb(trend["points"], max_points, "date", "weight")
+        return Response({"time_period": f"Last {days} days", **trend})
+
+
+class BaseExerciseAnalyticsView(BaseAnalyticsView):
+    def get_daily_rollups(self, request, exercise_ids, start_date, end_date):
+        """Rollup rows of the window grouped by exercise, ordered by date.
+
+        Per-exercise totals are computed with window functions on the same
+        query, so one query serves any number of exercises."""
+        per_exercise = {"partition_by": [F("exercise_id")]}
+        rollups = (
+            DailyExerciseRollup.objects.filter(
+                user=request.user,
+                exercise_id__in=exercise_ids,
+                date__range=[start_date.date(), end_date.date()],
+            )
+            .annotate(
+                window_volume=Window(Sum("total_reps"), **per_exercise),
+                window_logs=Window(Sum("log_count"), **per_exercise),
+                window_sessions=Window(Sum("session_count"), **per_exercise),
+            )
+            .order_by("exercise_id", "date")
+        )
+        grouped = {exercise_id: [] for exercise_id in exercise_ids}
+        for day in rollups:
+            grouped[day.exercise_id].append(day)
+        return grouped
+
+    def get_bucketed_progression(self, request, exercise_ids, start_date, end_date, bucket):
+        """Heaviest weight per week/month and exercise, grouped in SQL"""
+        rows = (
+            DailyExerciseRollup.objects.filter(
+                user=request.user,
+                exercise_id__in=exercise_ids,
+                date__range=[start_date.date(), end_date.date()],
+            )
+            .annotate(period=BUCKETS[bucket]("date"))
+            .values("exercise_id", "period")
+            .annotate(volume=Max("max_weight"))
+            .order_by("exercise_id", "period")
+        )
+        grouped = {exercise_id: [] for exercise_id in exercise_ids}
+        for row in rows:
+            grouped[row["exercise_id"]].append(
+                {"session__date": as_date(row["period"]).isoformat(), "volume": row["volume"] or 0}
+            )
+        return grouped
+
+    def get_progressions(self, request, exercise_ids, start_date, end_date, grouped):
+        """Progression series per exercise honouring ``bucket`` and ``max_points``.
+
+        Rollup rows are already one per day, so only week/month buckets need
+        an extra grouped query."""
+        bucket, max_points = parse_series_options(request.query_params)
+        if bucket in ("week", "month"):
+            progressions = self.get_bucketed_progression(
+                request, exercise_ids, start_date, end_date, bucket
+            )
+        else:
+            progressions = {
+                exercise_id: [
+                    {"session__date": day.date.isoformat(), "volume": day.max_weight or 0}
+                    for day in days_logged
+                ]
+                for exercise_id, days_logged in grouped.items()
+            }
+        return {
+            exercise_id: lttb(points, max_points, "session__date", "volume")
+            for exercise_id, points in progressions.items()
+        }
+
+    def build_exercise_analytics(self, exercise, days_logged, days, progression):
+        totals = days_logged[0] if days_logged else None
+        total_volume = totals.window_volume if totals else 0
+        log_count = totals.window_logs if totals else 0
+        session_count = totals.window_sessions if totals else 0
 
-        logs = WorkoutLog.objects.filter(
-            exercise=exercise,
-            session__user=request.user,
-            session__date__range=[start_date, end_date],
-        ).select_related("session")
-
-        # Calculate total volume
-        total_volume = 0
-        for log in logs:
-            total_volume += (log.sets or 0) * (log.reps or 0) 
-        
         volume_data = {
             "total_volume": total_volume,
-            "sessions_per_week": round(logs.count() / (days / 7), 1) if days > 0 else 0,
+            "sessions_per_week": round(log_count / (days / 7), 1) if days > 0 else 0,
         }
 
-        session_count = logs.values("session").distinct().count()
         frequency_data = {
             "total_sessions": session_count,
             "sessions_per_week": round(session_count / (days / 7), 1) if days > 0 else 0,
         }
 
-        # Progressive overload tracking
-        progression = []
-        for log in logs.order_by("session__date"):
-            volume = (log.weight or 0)
-            progression.append({
-                "session__date": log.session.date.isoformat(),
-                "volume": volume
-            })
-
-        return Response(
-            {
-                "exercise": exercise.name,
-                "time_period": f"Last {days} days",
-                "volume": volume_data,
-                "frequency": frequency_data,
-                "progression": progression,
-                "last_improvement": self._get_improvement(logs),
-            }
-        )
+        return {
+            "exercise": exercise.name,
+            "time_period": f"Last {days} days",
+            "volume": volume_data,
+            "frequency": frequency_data,
+            "progression": progression,
+            "last_improvement": self._get_improvement(days_logged, log_count),
+        }
 
-    def _get_improvement(self, logs):
+    def _get_improvement(self, days_logged, log_count):
         """Calculate percentage improvement over period"""
-        if logs.count() < 2:
+        if log_count < 2:
             return None
 
-        sorted_logs = logs.order_by("session__date")
-        first = sorted_logs.first()
-        last = sorted_logs.last()
-        
-        first_vol = (first.sets or 0) * (first.reps or 0) * (first.weight or 1)
-        last_vol = (last.sets or 0) * (last.reps or 0) * (last.weight or 1)
+        first = days_logged[0]
+        last = days_logged[-1]
+
+        first_vol = first.first_load
+        last_vol = last.last_load
 
         if first_vol == 0:  # Avoid division by zero
             return None
 
         improvement_percentage = round((last_vol - first_vol) / first_vol * 100, 1)
-        time_span_days = (last.session.date - first.session.date).days
+        time_span_days = (last.date - first.date).days
 
         return {
             "percentage": improvement_percentage,
             "time_span": time_span_days,
             "first_volume": first_vol,
             "last_volume": last_vol,
-            "first_date": first.session.date.isoformat(),
-            "last_date": last.session.date.isoformat(),
-        }
\ No newline at end of file
+            "first_date": first.date.isoformat(),
+            "last_date": last.date.isoformat(),
+        }
+
+
+class ExerciseAnalyticsView(BaseExerciseAnalyticsView):  
+    @cached_analytics("exercise")
+    def get(self, request, exercise_id):
+        start_date, end_date, days = self.get_time_range(request)
+
+        try:
+            exercise = Exercise.objects.get(id=exercise_id, user=request.user)
+        except Exercise.DoesNotExist:
+            return Response({"error": "Exercise not found"}, status=404)
+
+        # One pre-aggregated row per training day instead of every raw log
+        grouped = self.get_daily_rollups(request, [exercise.id], start_date, end_date)
+        # Progressive overload tracking
+        progressions = self.get_progressions(
+            request, [exercise.id], start_date, end_date, grouped
+        )
+        return Response(
+            self.build_exercise_analytics(
+                exercise, grouped[exercise.id], days, progressions[exercise.id]
+            )
+        )
+
+
+class ExerciseBatchAnalyticsView(BaseExerciseAnalyticsView):
+    """Exercise analytics for many exercises at once.
+
+    Select them with ``?ids=1,2,3`` or every exercise of a program with
+    ``?program_id=``; an empty ``?ids=`` selects none. Costs two queries
+    regardless of how many are requested."""
+
+    @cached_analytics("exercises")
+    def get(self, request):
+        start_date, end_date, days = self.get_time_range(request)
+
+        exercises = Exercise.objects.filter(user=request.user)
+        ids = request.query_params.get("ids")
+        program_id = request.query_params.get("program_id")
+        if ids is not None:
+            try:
+                exercise_ids = [int(i) for i in ids.split(",") if i.strip()]
+            except ValueError:
+                return Response({"error": "ids must be a comma separated list of integers"}, status=400)
+            exercises = exercises.filter(id__in=exercise_ids)
+        elif program_id:
+            try:
+                program_id = int(program_id)
+            except ValueError:
+                return Response({"error": "program_id must be an integer"}, status=400)
+            exercises = exercises.filter(
+                program_exercises__program_id=program_id,
+                program_exercises__program__user=request.user,
+            ).order_by("program_exercises__order")
+        else:
+            return Response({"error": "Provide ids or program_id"}, status=400)
+
+        exercises = list(exercises)
+        exercise_ids = [exercise.id for exercise in exercises]
+        grouped = self.get_daily_rollups(request, exercise_ids, start_date, end_date)
+        progressions = self.get_progressions(
+            request, exercise_ids, start_date, end_date, grouped
+        )
+
+        return Response(
+            {
+                "time_period": f"Last {days} days",
+                "results": [
+                    {
+                        "exercise_id": exercise.id,
+                        **self.build_exercise_analytics(
+                            exercise, grouped[exercise.id], days, progressions[exercise.id]
+                        ),
+                    }
+                    for exercise in exercises
+                ],
+            }
+        )
+
+
+class AnalyticsCacheStatsView(APIView):
+    """Hit/miss counters of the analytics response cache (staff only)"""
+
+    permission_classes = [IsAdminUser]
+    ENDPOINTS = ["weight", "bmi", "weight_trend", "exercise", "exercises"]
+
+    def get(self, request):
+        return Response(get_cache_stats(self.ENDPOINTS))
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from TMN.shards import reserve_id_ranges
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(reserve_id_ranges, sender=self)
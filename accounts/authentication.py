@@ -0,0 +1,99 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """Users by id (as a string, like in tokens), least recently used first. Entries expire
+    JWT_USER_CACHE_TTL seconds after they were loaded, and the oldest are
+    evicted beyond JWT_USER_CACHE_SIZE entries. Safe to share between the
+    threads of a process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= time.monotonic():
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        ttl = getattr(settings, "JWT_USER_CACHE_TTL", 60)
+        max_size = getattr(settings, "JWT_USER_CACHE_SIZE", 10000)
+        with self._lock:
+            self._users[user_id] = (time.monotonic() + ttl, user)
+            self._users.move_to_end(user_id)
+            while len(self._users) > max_size:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def __len__(self):
+        return len(self._users)
+
+
+user_cache = UserCache()
+
+
+def forget_user(user, using=DEFAULT_DB_ALIAS):
+    """Drop the user's entry now, and again when the transaction saving them
+    commits: a request in between may cache the row being replaced"""
+    user_id = str(getattr(user, api_settings.USER_ID_FIELD))
+    user_cache.invalidate(user_id)
+    transaction.on_commit(lambda: user_cache.invalidate(user_id), using=using)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication without the user query on every request: users it
+    loads are kept in ``user_cache`` and each request gets its own copy.
+
+    Saving or deleting a user drops their entry (see accounts.signals), but
+    only in the process that did it; other processes keep serving the old
+    row, deactivated or with its old password, for up to JWT_USER_CACHE_TTL
+    seconds. Queryset updates send no signals, so every process keeps the
+    old row of users changed that way until it expires."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = None if user_id is None else user_cache.get(str(user_id))
+        if user is None:
+            # Inactive users and revoked tokens fail here, uncached
+            user = super().get_user(validated_token)
+            user_cache.set(str(user_id), user)
+        else:
+            self.check_user(user, validated_token)
+        return copy.copy(user)
+
+    def check_user(self, user, validated_token):
+        """The checks JWTAuthentication.get_user makes after its query"""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
@@ -0,0 +1,130 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.response import Response
+
+
+VERSION_KEY = "analytics:version:{user_id}"
+RESPONSE_KEY = "analytics:response:{user_id}:{endpoint}:{days}:{version}:{params}"
+STATS_KEY = "analytics:stats:{endpoint}:{outcome}"
+
+
+def get_cache():
+    return caches[settings.ANALYTICS_CACHE_ALIAS]
+
+
+def _fresh_version():
+    # Time based, so a version key lost to eviction never restarts at a value
+    # that older cached responses were stored under
+    return time.time_ns()
+
+
+def get_data_version(user_id):
+    cache = get_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(user_id, using=DEFAULT_DB_ALIAS):
+    """Invalidate every cached analytics response of this user once the
+    write on ``using`` commits. Bumped before, a request could compute from
+    the old rows and cache the result under the new version."""
+    if user_id is None:
+        return
+    key = VERSION_KEY.format(user_id=user_id)
+
+    def bump():
+        cache = get_cache()
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), timeout=None)
+
+    transaction.on_commit(bump, using=using)
+
+
+def _record(endpoint, outcome):
+    cache = get_cache()
+    key = STATS_KEY.format(endpoint=endpoint, outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_cache_stats(endpoints):
+    """Hit/miss counters per endpoint, as recorded by cached_analytics"""
+    cache = get_cache()
+    stats = {}
+    for endpoint in endpoints:
+        hits = cache.get(STATS_KEY.format(endpoint=endpoint, outcome="hit"), 0)
+        misses = cache.get(STATS_KEY.format(endpoint=endpoint, outcome="miss"), 0)
+        total = hits + misses
+        stats[endpoint] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 3) if total else None,
+        }
+    return stats
+
+
+def response_cache_key(user_id, endpoint, days, query_params, view_kwargs):
+    params = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        if key != "days"
+        for value in values
+    )
+    params += sorted(view_kwargs.items())
+    digest = hashlib.md5(repr(params).encode(), usedforsecurity=False).hexdigest()
+    return RESPONSE_KEY.format(
+        user_id=user_id,
+        endpoint=endpoint,
+        days=days,
+        version=get_data_version(user_id),
+        params=digest,
+    )
+
+
+def cached_analytics(endpoint):
+    """Cache successful responses of an analytics ``get`` per user and data version.
+
+    The version is bumped by signals whenever the user's profiles, sessions,
+    logs or exercises change, so a cached response is never served stale."""
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk
+            if user_id is None:
+                return view_method(self, request, *args, **kwargs)
+
+            cache = get_cache()
+            _, _, days = self.get_time_range(request)
+            key = response_cache_key(user_id, endpoint, days, request.query_params, kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                _record(endpoint, "hit")
+                response = Response(cached)
+                response["X-Cache"] = "HIT"
+                return response
+
+            _record(endpoint, "miss")
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+            response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
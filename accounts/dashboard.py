@@ -0,0 +1,170 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Max
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from workouts.models import DailyExerciseRollup
+from workouts.views import TrainingSessionViewSet
+from .analytics import (
+    BMIAnalyticsView,
+    ExerciseBatchAnalyticsView,
+    WeightAnalyticsView,
+    WeightTrendAnalyticsView,
+)
+
+
+SERIES_PARAMS = ["days", "bucket", "max_points"]
+RECENT_SESSIONS = 5
+RECENT_EXERCISES = 5
+
+# A widget's response must not depend on the dashboard request's validators
+CONDITIONAL_HEADERS = ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+
+
+class Widget:
+    """An existing GET endpoint, rendered as one part of the dashboard.
+
+    ``params`` are passed on from the dashboard's query string and
+    ``defaults`` fill in the ones it leaves out."""
+
+    def __init__(self, path, view, params=(), defaults=None):
+        self.path = path
+        self.view = view
+        self.params = params
+        self.defaults = defaults or {}
+
+    def get_params(self, request, user):
+        params = {name: request.GET[name] for name in self.params if name in request.GET}
+        return {**self.defaults, **params}
+
+    def build_request(self, request, user, params):
+        """A GET of the widget's endpoint, authenticated as ``user``"""
+        query = QueryDict(mutable=True)
+        query.update(params)
+        query._mutable = False
+        subrequest = HttpRequest()
+        subrequest.method = "GET"
+        subrequest.path = subrequest.path_info = self.path
+        subrequest.META = {
+            key: value for key, value in request.META.items() if key not in CONDITIONAL_HEADERS
+        }
+        subrequest.META["QUERY_STRING"] = query.urlencode()
+        subrequest.GET = query
+        # Picked up by rest_framework.request.Request, so the dashboard's
+        # authentication is not repeated per widget
+        subrequest._force_auth_user = user
+        return subrequest
+
+    def run(self, request, user):
+        """(status, data) of the endpoint. Runs in a worker thread, which
+        cleans up its own database connections like a request thread does."""
+        close_old_connections()
+        try:
+            response = self.view(self.build_request(request, user, self.get_params(request, user)))
+            return response.status_code, response.data
+        finally:
+            close_old_connections()
+
+
+class RecentExercisesWidget(Widget):
+    """Exercise analytics of ``ids`` or ``program_id`` if given, otherwise of
+    the exercises trained most recently"""
+
+    def get_params(self, request, user):
+        params = super().get_params(request, user)
+        if "ids" not in params and "program_id" not in params:
+            recent = (
+                DailyExerciseRollup.objects.filter(user=user)
+                .values("exercise_id")
+                .annotate(last=Max("date"))
+                .order_by("-last", "exercise_id")[:RECENT_EXERCISES]
+            )
+            params["ids"] = ",".join(str(row["exercise_id"]) for row in recent)
+        return params
+
+
+class DashboardView(View):
+    """Every home screen widget in one response.
+
+    The widgets are the existing endpoints (with their caching), run
+    concurrently in worker threads, so the response takes about as long as
+    the slowest of them instead of their sum. ``?widgets=`` picks some of
+    them; ``days``, ``bucket`` and ``max_points`` are passed on to the
+    analytics widgets and ``ids``/``program_id`` to the exercise one."""
+
+    widgets = {
+        "weight": Widget("/api/analytics/weight/", WeightAnalyticsView.as_view(), SERIES_PARAMS),
+        "weight_trend": Widget(
+            "/api/analytics/weight/trend/", WeightTrendAnalyticsView.as_view(), SERIES_PARAMS
+        ),
+        "bmi": Widget("/api/analytics/bmi/", BMIAnalyticsView.as_view(), SERIES_PARAMS),
+        "sessions": Widget(
+            "/api/workouts/sessions/",
+            TrainingSessionViewSet.as_view({"get": "list"}),
+            defaults={"page_size": RECENT_SESSIONS},
+        ),
+        "exercises": RecentExercisesWidget(
+            "/api/analytics/exercises/",
+            ExerciseBatchAnalyticsView.as_view(),
+            [*SERIES_PARAMS, "ids", "program_id"],
+        ),
+    }
+
+    async def get(self, request):
+        try:
+            user = await sync_to_async(self.authenticate)(request)
+            names = self.get_widget_names(request)
+        except exceptions.APIException as exc:
+            return self.error_response(request, exc)
+
+        results = await asyncio.gather(
+            *[
+                sync_to_async(self.widgets[name].run, thread_sensitive=False)(request, user)
+                for name in names
+            ]
+        )
+        return self.render(
+            {name: {"status": status, "data": data} for name, (status, data) in zip(names, results)}
+        )
+
+    def authenticate(self, request):
+        """The user, as the API's authentication classes see them"""
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+        )
+        if not drf_request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        return drf_request.user
+
+    def get_widget_names(self, request):
+        if "widgets" not in request.GET:
+            return list(self.widgets)
+        names = [name for name in request.GET["widgets"].split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.widgets]
+        if unknown:
+            raise exceptions.ValidationError(
+                {"widgets": f"Unknown: {', '.join(unknown)}. Choose from {', '.join(self.widgets)}."}
+            )
+        return names
+
+    def error_response(self, request, exc):
+        # As rest_framework.views.exception_handler would answer
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = self.render(data, status=exc.status_code)
+        if exc.status_code == 401:
+            authenticator = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]()
+            response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+        return response
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            JSONRenderer().render(data), status=status, content_type="application/json"
+        )
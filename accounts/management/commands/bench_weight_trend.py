@@ -0,0 +1,84 @@
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+
+from accounts.trends import compute_weight_trend, series_from_rows
+
+
+def per_row_trend(rows, window=7, alpha=0.3):
+    """The row-by-row approach the analytics views used before, extended to
+    the same outputs so both sides do equivalent work."""
+
+    def calculate_bmi(weight, height):
+        if height and weight:
+            height_in_meters = height / 100
+            return round(weight / (height_in_meters**2), 1)
+        return None
+
+    history = [
+        {"date": created_at.date(), "value": calculate_bmi(weight, height)}
+        for created_at, weight, height in rows
+        if calculate_bmi(weight, height) is not None
+    ]
+
+    weights = [weight for _, weight, _ in rows]
+    averages, trend = [], []
+    smoothed = None
+    for i, weight in enumerate(weights):
+        recent = [w for w in weights[max(0, i - window + 1) : i + 1] if w is not None]
+        averages.append(sum(recent) / len(recent) if recent else None)
+        if weight is not None:
+            smoothed = weight if smoothed is None else alpha * weight + (1 - alpha) * smoothed
+        trend.append(smoothed)
+
+    origin = rows[0][0]
+    days = [(created_at - origin).total_seconds() / 86400 for created_at, _, _ in rows]
+    changes = [
+        (trend[i + 1] - trend[i]) / (days[i + 1] - days[i]) * 7
+        for i in range(len(rows) - 1)
+        if days[i + 1] != days[i]
+    ]
+
+    n = len(days)
+    mean_x = sum(days) / n
+    mean_y = sum(weights) / n
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(days, weights)) / sum(
+        (x - mean_x) ** 2 for x in days
+    )
+    return history, averages, trend, changes, slope
+
+
+class Command(BaseCommand):
+    help = "Compare the vectorized weight/BMI trend engine with the per-row approach"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        weight = 90.0
+        rows = []
+        for i in range(options["points"]):
+            weight += rng.uniform(-0.6, 0.5)
+            rows.append((start + timedelta(hours=6 * i), round(weight), 180))
+
+        def vectorized():
+            return compute_weight_trend(series_from_rows(rows))
+
+        def per_row():
+            return per_row_trend(rows)
+
+        results = {}
+        for name, func in [("per-row", per_row), ("vectorized", vectorized)]:
+            best = min(timeit.repeat(func, number=1, repeat=options["repeat"]))
+            results[name] = best
+            self.stdout.write(f"{name:>10}: {best * 1000:8.2f} ms for {len(rows)} points")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"speed-up: {results['per-row'] / results['vectorized']:.1f}x")
+        )
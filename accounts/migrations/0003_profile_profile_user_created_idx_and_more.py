@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_user_is_active_alter_user_is_staff'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['user', 'created_at'], name='profile_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['user', 'is_current'], name='profile_user_current_idx'),
+        ),
+    ]
@@ -73,6 +73,10 @@ class Profile(models.Model):
         verbose_name = 'Profile'
         verbose_name_plural = 'Profiles'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='profile_user_created_idx'),
+            models.Index(fields=['user', 'is_current'], name='profile_user_current_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'is_current'],
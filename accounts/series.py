@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from rest_framework.exceptions import ValidationError
+
+
+BUCKETS = {
+    "day": TruncDate,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+
+def parse_series_options(query_params):
+    """Read and validate the ``bucket`` and ``max_points`` query parameters"""
+    bucket = query_params.get("bucket")
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValidationError({"bucket": f"Must be one of: {', '.join(BUCKETS)}."})
+
+    max_points = query_params.get("max_points")
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+        except ValueError:
+            raise ValidationError({"max_points": "Must be an integer."})
+        if max_points < 3:
+            raise ValidationError({"max_points": "Must be at least 3."})
+    return bucket, max_points
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _x(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return as_date(value).toordinal()
+
+
+def lttb(points, max_points, x_key, y_key):
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, for each of ``max_points - 2`` equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket. Peaks and
+    troughs survive, unlike plain striding. Points with a None y are dropped
+    when downsampling.
+    """
+    if max_points is None or len(points) <= max_points:
+        return points
+    points = [p for p in points if p[y_key] is not None]
+    if len(points) <= max_points:
+        return points
+
+    xs = [_x(p[x_key]) for p in points]
+    ys = [float(p[y_key]) for p in points]
+    sampled = [points[0]]
+    every = (len(points) - 2) / (max_points - 2)
+    a = 0
+
+    for i in range(max_points - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs(
+                (xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a])
+            )
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,103 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from TMN.conditional import bump_watermarks
+from TMN.shards import copy_users, delete_user_data, shard_databases
+from exercises.models import Exercise
+from programs.models import ExerciseProgram, ProgramExercise
+from workouts.models import TrainingSession, WorkoutLog
+from workouts.signals import deleted_with_parent
+from .authentication import forget_user
+from .cache import bump_data_version
+from .models import Profile, User
+
+
+WATERMARK_RESOURCES = {
+    Profile: "profiles",
+    Exercise: "exercises",
+    ExerciseProgram: "programs",
+    TrainingSession: "sessions",
+}
+
+
+@receiver(post_save, sender=User)
+def copy_user_to_shard(sender, instance, raw=False, **kwargs):
+    if not raw:
+        copy_users([instance])
+
+
+@receiver(post_delete, sender=User)
+def delete_user_data_from_shard(sender, instance, using, **kwargs):
+    # Deleting the shard's copy sends this signal too
+    if using not in shard_databases():
+        delete_user_data(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, using, **kwargs):
+    # Covers deactivation and password changes, which are saves too
+    forget_user(instance, using)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_save, sender=ExerciseProgram)
+@receiver(post_delete, sender=ExerciseProgram)
+@receiver(post_save, sender=TrainingSession)
+@receiver(post_delete, sender=TrainingSession)
+def invalidate_owner_analytics(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        bump_data_version(instance.user_id, using=using)
+
+
+@receiver(post_save, sender=ProgramExercise)
+@receiver(post_delete, sender=ProgramExercise)
+def invalidate_program_owner_analytics(sender, instance, using, raw=False, **kwargs):
+    # Exercise analytics of ?program_id= follow the program's exercises
+    if not raw:
+        bump_data_version(instance.program.user_id, using=using)
+
+
+@receiver(post_save, sender=WorkoutLog)
+@receiver(post_delete, sender=WorkoutLog)
+def invalidate_log_owner_analytics(sender, instance, using, raw=False, origin=None, **kwargs):
+    # Deleted with its session, exercise or user, which invalidate for it
+    if not raw and not deleted_with_parent(origin):
+        bump_data_version(instance.session.user_id, using=using)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+@receiver(post_save, sender=ExerciseProgram)
+@receiver(post_delete, sender=ExerciseProgram)
+@receiver(post_save, sender=TrainingSession)
+@receiver(post_delete, sender=TrainingSession)
+def bump_owner_watermark(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        bump_watermarks(instance.user_id, WATERMARK_RESOURCES[sender], using=using)
+
+
+@receiver(post_save, sender=ProgramExercise)
+@receiver(post_delete, sender=ProgramExercise)
+def bump_program_watermark(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        bump_watermarks(instance.program.user_id, "programs", using=using)
+
+
+@receiver(post_save, sender=WorkoutLog)
+@receiver(post_delete, sender=WorkoutLog)
+def bump_log_watermark(sender, instance, using, raw=False, origin=None, **kwargs):
+    if not raw and not deleted_with_parent(origin):
+        bump_watermarks(instance.session.user_id, "logs", using=using)
+
+
+@receiver(post_delete, sender=Exercise)
+@receiver(post_delete, sender=TrainingSession)
+def bump_cascaded_log_watermark(sender, instance, using, **kwargs):
+    # Their logs are deleted with them without bumping "logs" themselves
+    bump_watermarks(instance.user_id, "logs", using=using)
@@ -1,3 +1,378 @@
-from django.test import TestCase
+import asyncio
+import re
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from exercises.models import Exercise
+from programs.models import ExerciseProgram, ProgramExercise
+from workouts.models import TrainingSession, WorkoutLog
+from .authentication import user_cache
+from .dashboard import DashboardView, Widget
+from .models import Profile, User
+from .series import lttb
+from .trends import exponential_smoothing, moving_average
+
+
+class ExerciseAnalyticsTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="lifter", email="lifter@example.com", password="pass1234"
+        )
+        self.exercise = Exercise.objects.create(
+            name="Bench Press", category="Chest", user=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/analytics/exercise/{self.exercise.id}/"
+
+    def add_logs(self, days, logs_per_day=1):
+        today = timezone.now().date()
+        for offset in range(days):
+            session = TrainingSession.objects.create(
+                user=self.user, date=today - timedelta(days=offset), duration=45
+            )
+            for i in range(logs_per_day):
+                WorkoutLog.objects.create(
+                    session=session,
+                    exercise=self.exercise,
+                    sets=3,
+                    reps=8,
+                    weight=Decimal(60 + offset + i),
+                )
+
+
+class ExerciseAnalyticsViewTests(ExerciseAnalyticsTestMixin, TestCase):
+    def test_response_summarises_window(self):
+        self.add_logs(days=3, logs_per_day=2)
+
+        data = self.client.get(self.url, {"days": 7}).json()
+
+        self.assertEqual(data["volume"]["total_volume"], 6 * 24)
+        self.assertEqual(data["frequency"]["total_sessions"], 3)
+        self.assertEqual([p["volume"] for p in data["progression"]], [63.0, 62.0, 61.0])
+        self.assertEqual(data["last_improvement"]["first_volume"], 24 * 62.0)
+        self.assertEqual(data["last_improvement"]["last_volume"], 24 * 61.0)
+
+    def test_query_count_does_not_grow_with_logs(self):
+        self.add_logs(days=2)
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {"days": 30})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_logs(days=20, logs_per_day=5)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"days": 30})
+        self.assertEqual(response.status_code, 200)
+
+    def test_empty_window(self):
+        data = self.client.get(self.url).json()
+
+        self.assertEqual(data["volume"]["total_volume"], 0)
+        self.assertEqual(data["progression"], [])
+        self.assertIsNone(data["last_improvement"])
+
+
+class AnalyticsCacheTests(ExerciseAnalyticsTestMixin, TestCase):
+    def test_repeat_request_is_served_from_cache(self):
+        self.add_logs(days=2)
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        # A different window is a different entry
+        self.assertEqual(self.client.get(self.url, {"days": 7})["X-Cache"], "MISS")
+
+    def test_writes_invalidate_cached_responses(self):
+        self.add_logs(days=1)
+        before = self.client.get(self.url).json()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.add_logs(days=1)
+                # Not invalidated before the write commits, or this request
+                # could cache the old rows' result under the new version
+                self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+        response = self.client.get(self.url)
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(
+            response.json()["volume"]["total_volume"],
+            2 * before["volume"]["total_volume"],
+        )
+
+
+class ExerciseBatchAnalyticsViewTests(ExerciseAnalyticsTestMixin, TestCase):
+    def test_batch_matches_single_endpoint_with_constant_queries(self):
+        self.add_logs(days=3)
+        others = [
+            Exercise.objects.create(name=f"Row {i}", category="Back", user=self.user)
+            for i in range(4)
+        ]
+        ids = ",".join(str(e.id) for e in [self.exercise, *others])
+
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/analytics/exercises/", {"ids": ids})
+
+        results = response.json()["results"]
+        self.assertEqual(len(results), 5)
+        single = self.client.get(self.url).json()
+        batch = next(r for r in results if r.pop("exercise_id") == self.exercise.id)
+        self.assertEqual(batch, single)
+
+    def test_requires_a_selection(self):
+        response = self.client.get("/api/analytics/exercises/")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/analytics/exercises/", {"program_id": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_program_selection_follows_program_changes(self):
+        program = ExerciseProgram.objects.create(name="Push", user=self.user)
+        ProgramExercise.objects.create(program=program, exercise=self.exercise, order=1)
+        url = "/api/analytics/exercises/"
+
+        def names():
+            results = self.client.get(url, {"program_id": program.id}).json()["results"]
+            return [Exercise.objects.get(pk=r["exercise_id"]).name for r in results]
+
+        self.assertEqual(names(), ["Bench Press"])
+        squat = Exercise.objects.create(name="Squat", category="Legs", user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProgramExercise.objects.create(program=program, exercise=squat, order=0)
+        self.assertEqual(names(), ["Squat", "Bench Press"])
+        with self.captureOnCommitCallbacks(execute=True):
+            program.program_exercises.filter(exercise=squat).delete()
+        self.assertEqual(names(), ["Bench Press"])
+
+
+class SeriesOptionsTests(ExerciseAnalyticsTestMixin, TestCase):
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        today = timezone.now().date()
+        points = [
+            {"date": today + timedelta(days=i), "value": 100 if i == 500 else i % 7}
+            for i in range(1000)
+        ]
+
+        sampled = lttb(points, 50, "date", "value")
+
+        self.assertEqual(len(sampled), 50)
+        self.assertEqual(sampled[0], points[0])
+        self.assertEqual(sampled[-1], points[-1])
+        self.assertIn(points[500], sampled)
+
+    def test_weekly_buckets_and_max_points(self):
+        self.add_logs(days=60)
+
+        weekly = self.client.get(self.url, {"days": 60, "bucket": "week"}).json()
+        self.assertLessEqual(len(weekly["progression"]), 10)
+        self.assertEqual(weekly["volume"]["total_volume"], 60 * 24)
+
+        sampled = self.client.get(self.url, {"days": 60, "max_points": 12}).json()
+        self.assertEqual(len(sampled["progression"]), 12)
+
+        self.assertEqual(self.client.get(self.url, {"bucket": "year"}).status_code, 400)
+
+    def test_profile_history_buckets(self):
+        for weight in (80, 82):
+            Profile.objects.create(user=self.user, height=180, weight=weight)
+
+        data = self.client.get("/api/analytics/weight/", {"bucket": "day"}).json()
+        self.assertEqual(data["history"], [{"date": str(timezone.now().date()), "value": 81.0}])
+
+        data = self.client.get("/api/analytics/bmi/", {"bucket": "month"}).json()
+        self.assertEqual(len(data["history"]), 1)
+        self.assertAlmostEqual(data["history"][0]["value"], 25.0, places=1)
+
+
+class WeightTrendTests(ExerciseAnalyticsTestMixin, TestCase):
+    def test_vectorized_smoothing_matches_recurrence(self):
+        values = np.random.default_rng(0).normal(80, 2, 2000)
+        values[[5, 700]] = np.nan
+
+        expected, smoothed = [], values[0]
+        for value in values:
+            if value == value:
+                smoothed = 0.3 * value + 0.7 * smoothed
+            expected.append(smoothed)
+
+        np.testing.assert_allclose(exponential_smoothing(values, 0.3), expected)
+        np.testing.assert_allclose(
+            moving_average(np.array([1.0, 2.0, np.nan, 4.0]), 2), [1.0, 1.5, 2.0, 4.0]
+        )
+
+    def test_trend_endpoint(self):
+        for weight in (90, 88, 86):
+            Profile.objects.create(user=self.user, height=200, weight=weight)
+
+        data = self.client.get("/api/analytics/weight/trend/").json()
+
+        self.assertEqual(len(data["points"]), 3)
+        self.assertEqual(data["points"][0]["bmi"], 22.5)
+        self.assertIn("weekly_change", data["points"][0])
+        self.assertIsNotNone(data["projection"])
+        self.assertEqual(self.client.get("/api/analytics/weight/trend/", {"alpha": 2}).status_code, 400)
+
+
+class DashboardTests(ExerciseAnalyticsTestMixin, TransactionTestCase):
+    # Widgets run in worker threads with their own database connections,
+    # which would not see the data of a test wrapped in a transaction
+    dashboard_url = "/api/analytics/dashboard/"
+
+    def setUp(self):
+        super().setUp()
+        for weight in (90, 88, 86):
+            Profile.objects.create(user=self.user, height=200, weight=weight)
+        self.add_logs(days=3)
+        self.headers = {"authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def fetch(self, *queries, headers=None):
+        """Concurrent GETs of the dashboard through the ASGI handler"""
+        if headers is None:
+            headers = self.headers
+
+        async def fetch_all():
+            client = AsyncClient()
+            return await asyncio.gather(
+                *[client.get(self.dashboard_url, query, headers=headers) for query in queries]
+            )
+
+        return async_to_sync(fetch_all)()
+
+    @override_settings(REQUEST_METRICS=True)
+    def test_widgets_match_their_endpoints(self):
+        # Staff get Server-Timing
+        self.user.is_staff = True
+        self.user.save()
+        (response,) = self.fetch({"days": 7})
+
+        self.assertEqual(response.status_code, 200)
+        # Queries of the widgets' worker threads count towards the request
+        queries = re.search(r"(\d+) queries", response["Server-Timing"]).group(1)
+        self.assertGreater(int(queries), 5)
+        widgets = response.json()
+        self.assertEqual(
+            list(widgets), ["weight", "weight_trend", "bmi", "sessions", "exercises"]
+        )
+        endpoints = {
+            "weight": ("/api/analytics/weight/", {"days": 7}),
+            "weight_trend": ("/api/analytics/weight/trend/", {"days": 7}),
+            "bmi": ("/api/analytics/bmi/", {"days": 7}),
+            "sessions": ("/api/workouts/sessions/", {"page_size": 5}),
+            "exercises": ("/api/analytics/exercises/", {"days": 7, "ids": self.exercise.id}),
+        }
+        for name, (path, query) in endpoints.items():
+            expected = self.client.get(path, query)
+            self.assertEqual(
+                widgets[name], {"status": expected.status_code, "data": expected.json()}, name
+            )
+
+    def test_selection_and_errors(self):
+        chosen, unknown, anonymous = self.fetch(
+            {"widgets": "bmi,exercises", "ids": ""}, {"widgets": "bmi,steps"}
+        ) + self.fetch({}, headers={})
+
+        self.assertEqual(list(chosen.json()), ["bmi", "exercises"])
+        self.assertEqual(chosen.json()["exercises"]["data"]["results"], [])
+        self.assertEqual(unknown.status_code, 400)
+        self.assertIn("steps", unknown.json()["widgets"])
+        self.assertEqual(anonymous.status_code, 401)
+        self.assertIn("WWW-Authenticate", anonymous.headers)
+
+    def test_widgets_and_requests_run_concurrently(self):
+        run = Widget.run
+        widgets = len(DashboardView.widgets)
+        # Every widget waits until as many are running: run one after another,
+        # the first would time out. The default executor has at least 5 threads.
+        barrier = threading.Barrier(widgets, timeout=10)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def counted_run(widget, request, user):
+            with lock:
+                running.append(widget)
+                peak.append(len(running))
+            try:
+                barrier.wait()
+            finally:
+                with lock:
+                    running.remove(widget)
+            return run(widget, request, user)
+
+        with mock.patch.object(Widget, "run", counted_run):
+            (response,) = self.fetch({})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(max(peak), widgets)
+
+            responses = self.fetch({}, {}, {})
+        self.assertEqual([r.status_code for r in responses], [200] * 3)
+        self.assertFalse(barrier.broken)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    url = "/api/exercises/"
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username="cached", email="cached@example.com", password="pass1234"
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def user_queries(self):
+        """Status of a GET and the number of its queries on the user table"""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(self.url)
+        return response.status_code, sum('"accounts_user"' in query["sql"] for query in captured)
+
+    def test_cached_users_cost_no_queries(self):
+        self.assertEqual(self.user_queries(), (200, 1))
+        self.assertEqual(self.user_queries(), (200, 0))
+
+        # Requests get copies, so one cannot change the user of the next
+        request = self.client.get(self.url).wsgi_request
+        request.user.first_name = "Changed"
+        self.assertEqual(user_cache.get(str(self.user.pk)).first_name, "")
+
+    def test_saving_a_user_invalidates_them(self):
+        self.user_queries()
+        self.user.set_password("another1234")
+        self.user.save()
+        self.assertEqual(self.user_queries(), (200, 1))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.user_queries(), (401, 1))
+        # Inactive users are not cached
+        self.assertEqual(self.user_queries(), (401, 1))
+
+    def test_lru_and_ttl(self):
+        with self.settings(JWT_USER_CACHE_SIZE=2, JWT_USER_CACHE_TTL=60):
+            for user_id in (1, 2):
+                user_cache.set(user_id, f"user {user_id}")
+            user_cache.get(1)
+            user_cache.set(3, "user 3")
+            later = time.monotonic() + 61
+            with mock.patch("accounts.authentication.time.monotonic", return_value=later):
+                expired = user_cache.get(3)
+
+        self.assertEqual(user_cache.get(1), "user 1")
+        self.assertIsNone(user_cache.get(2))
+        self.assertIsNone(expired)
+        self.assertEqual(len(user_cache), 1)
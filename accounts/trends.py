@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+
+from .models import Profile
+
+
+SECONDS_PER_DAY = 86400.0
+
+
+@dataclass
+class ProfileSeries:
+    """A user's profile history as parallel arrays, oldest first"""
+
+    created_at: list
+    days: np.ndarray  # fractional days since the first point
+    weight: np.ndarray  # kg, NaN where missing
+    height: np.ndarray  # cm, NaN where missing
+
+    def __len__(self):
+        return len(self.created_at)
+
+
+def load_profile_series(user, start_date, end_date):
+    """Fetch the window's profiles in one query, straight into arrays"""
+    rows = list(
+        Profile.objects.filter(user=user, created_at__range=[start_date, end_date])
+        .order_by("created_at")
+        .values_list("created_at", "weight", "height")
+    )
+    return series_from_rows(rows)
+
+
+def series_from_rows(rows):
+    if not rows:
+        empty = np.empty(0)
+        return ProfileSeries([], empty, empty, empty)
+    created_at, weight, height = zip(*rows)
+    timestamps = np.fromiter(
+        (c.timestamp() for c in created_at), dtype=float, count=len(created_at)
+    )
+    days = (timestamps - timestamps[0]) / SECONDS_PER_DAY
+    # None -> NaN so missing values drop out of every vectorized step
+    weight = np.array(weight, dtype=float)
+    height = np.array(height, dtype=float)
+    return ProfileSeries(list(created_at), days, weight, height)
+
+
+def bmi(weight, height):
+    """BMI per point; NaN where weight or height is missing or zero"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = weight / (height / 100.0) ** 2
+    values[~np.isfinite(values) | (values <= 0)] = np.nan
+    return np.round(values, 1)
+
+
+def scalar_bmi(weight, height):
+    return clean(bmi(np.array([weight], dtype=float), np.array([height], dtype=float))[0])
+
+
+def moving_average(values, window):
+    """Trailing mean over the last ``window`` valid points (shorter at the start)"""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    sums = np.cumsum(filled)
+    counts = np.cumsum(valid)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums / counts
+
+
+def exponential_smoothing(values, alpha):
+    """Exponentially smoothed trend, s_t = alpha * x_t + (1 - alpha) * s_(t-1).
+
+    The recurrence is evaluated in closed form block by block (cumulative sums
+    of discounted values), so it stays vectorized without the powers of
+    (1 - alpha) overflowing on long series. Missing values carry the trend."""
+    valid = ~np.isnan(values)
+    observed = values[valid]
+    if alpha >= 1 or not len(observed):
+        return _forward_fill(values)
+
+    smoothed = np.empty_like(observed)
+    decay = 1.0 - alpha
+    # Keep decay ** -block well inside float64 range
+    block = int(max(1, min(256, 250 / max(-np.log10(decay), 1e-9))))
+    previous = observed[0]
+    for start in range(0, len(observed), block):
+        chunk = observed[start : start + block]
+        powers = decay ** np.arange(len(chunk))
+        discounted = np.cumsum(chunk / powers) * powers
+        smoothed[start : start + len(chunk)] = alpha * discounted + decay * powers * previous
+        previous = smoothed[start + len(chunk) - 1]
+
+    result = np.full_like(values, np.nan)
+    result[valid] = smoothed
+    return _forward_fill(result)
+
+
+def _forward_fill(values):
+    """Replace each NaN with the last valid value before it (leading NaNs stay)"""
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(len(values)), 0)
+    np.maximum.accumulate(index, out=index)
+    filled = values[index]
+    filled[: np.argmax(valid) if valid.any() else len(values)] = np.nan
+    return filled
+
+
+def linear_fit(days, values):
+    """Least-squares slope (per day) and intercept over the valid points"""
+    valid = ~np.isnan(values)
+    if valid.sum() < 2 or np.ptp(days[valid]) == 0:
+        return None, None
+    slope, intercept = np.polyfit(days[valid], values[valid], 1)
+    return slope, intercept
+
+
+def compute_weight_trend(series, window=7, alpha=0.3, horizon_days=30):
+    """BMI, moving average, smoothed trend, weekly rate of change and a
+    linear projection for the whole series in one vectorized pass."""
+    if not len(series):
+        return None
+
+    bmi_values = bmi(series.weight, series.height)
+    averaged = moving_average(series.weight, window)
+    trend = exponential_smoothing(series.weight, alpha)
+    if len(series) > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weekly_change = np.gradient(trend, series.days) * 7
+        weekly_change[~np.isfinite(weekly_change)] = np.nan
+    else:
+        weekly_change = np.full(1, np.nan)
+    slope, intercept = linear_fit(series.days, series.weight)
+
+    projection = None
+    if slope is not None:
+        projected_days = series.days[-1] + horizon_days
+        projected_weight = slope * projected_days + intercept
+        last_height = series.height[~np.isnan(series.height)]
+        projection = {
+            "date": (series.created_at[-1] + timedelta(days=horizon_days)).date(),
+            "weight": clean(round(projected_weight, 1)),
+            "bmi": scalar_bmi(projected_weight, last_height[-1]) if len(last_height) else None,
+        }
+
+    columns = zip(
+        series.created_at,
+        _to_list(series.weight, 1),
+        _to_list(bmi_values, 1),
+        _to_list(averaged, 2),
+        _to_list(trend, 2),
+        _to_list(weekly_change, 2),
+    )
+    return {
+        "rate_per_week": clean(round(slope * 7, 2)) if slope is not None else None,
+        "projection": projection,
+        "points": [
+            {
+                "date": created_at.date(),
+                "weight": weight,
+                "bmi": bmi_value,
+                "moving_average": average,
+                "trend": smoothed,
+                "weekly_change": change,
+            }
+            for created_at, weight, bmi_value, average, smoothed, change in columns
+        ],
+    }
+
+
+def _to_list(values, decimals):
+    """Rounded plain-Python list with NaN replaced by None, in one array pass"""
+    rounded = np.round(values, decimals).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+def clean(value):
+    """NaN -> None and NumPy scalars -> plain floats for the JSON renderer"""
+    if value is None or value != value:
+        return None
+    return float(value)
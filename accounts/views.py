@@ -5,15 +5,20 @@ from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from .permissions import IsOwner, IsCurrentProfileOwner
 from .serializers import UserRegisterSerializer
+from TMN.conditional import ConditionalGetMixin
+from TMN.pagination import KeysetPagination
+from TMN.replicas import ReplicaReadsMixin
 
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = UserRegisterSerializer
 
 
-class ProfileHistoryView(generics.ListAPIView):
+class ProfileHistoryView(ConditionalGetMixin, ReplicaReadsMixin, generics.ListAPIView):
     serializer_class = ProfileSerializer
     permission_classes = [IsOwner]
+    pagination_class = KeysetPagination
+    watermark_resources = ["profiles"]
 
     def get_queryset(self):
         user = self.request.user
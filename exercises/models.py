@@ -28,6 +28,10 @@ class Exercise(models.Model):
         verbose_name = 'Exercise'
         verbose_name_plural = 'Exercises'
         ordering = ['name']
+        indexes = [
+            # Name-ordered lists and the (user, name, category) duplicate check
+            models.Index(fields=['user', 'name', 'category'], name='exercise_user_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.category})"
\ No newline at end of file
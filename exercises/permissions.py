@@ -3,5 +3,4 @@ from rest_framework import permissions
 
 class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
-
+        return obj.user_id == request.user.pk
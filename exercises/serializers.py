@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from TMN.fieldsets import SparseFieldsetSerializerMixin
 from .models import Exercise
 
 
-class ExerciseSerializer(serializers.ModelSerializer):
+class ExerciseSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Exercise
         fields = ["id", "name", "category", "description"]  # Add description
@@ -1,14 +1,27 @@
 from rest_framework import viewsets, permissions
+from TMN.conditional import ConditionalGetMixin
+from TMN.fieldsets import SparseFieldsetMixin
+from TMN.identity import IdentityMapMixin
+from TMN.pagination import KeysetPagination
+from TMN.replicas import ReplicaReadsMixin
 from .models import Exercise
 from .serializers import ExerciseSerializer
 from .permissions import IsOwner
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
-class ExerciseViewSet(viewsets.ModelViewSet):
+class ExerciseViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    IdentityMapMixin,
+    ReplicaReadsMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = ExerciseSerializer
     queryset = Exercise.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    pagination_class = KeysetPagination
+    watermark_resources = ["exercises"]
 
     def get_queryset(self):
         queryset = Exercise.objects.filter(user=self.request.user)
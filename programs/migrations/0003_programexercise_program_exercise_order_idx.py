@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0002_exercise_exercise_user_name_idx'),
+        ('programs', '0002_programexercise_default_rest_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='programexercise',
+            index=models.Index(fields=['program', 'order'], name='program_exercise_order_idx'),
+        ),
+    ]
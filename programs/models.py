@@ -66,6 +66,9 @@ class ProgramExercise(models.Model):
         verbose_name_plural = 'Program Exercises'
         ordering = ['order']
         unique_together = ['program', 'exercise']
+        indexes = [
+            models.Index(fields=['program', 'order'], name='program_exercise_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.exercise.name} in {self.program.name}"
\ No newline at end of file
@@ -1,10 +1,14 @@
 from rest_framework import permissions
+
+from TMN.identity import identity_map
 from .models import ExerciseProgram
 
 
 class IsProgramOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        # Program exercises are owned through their program
+        program = getattr(obj, "program", obj)
+        return program.user_id == request.user.pk
 
 
 class CanAddExerciseToProgram(permissions.BasePermission):
@@ -12,6 +16,7 @@ class CanAddExerciseToProgram(permissions.BasePermission):
         if request.method == "POST":
             program_id = request.data.get("program")
             if program_id:
-                program = ExerciseProgram.objects.get(pk=program_id)
-                return program.user == request.user
+                program = identity_map(request).get(ExerciseProgram, program_id)
+                # An unknown program is reported by the serializer
+                return program is None or program.user_id == request.user.pk
         return True
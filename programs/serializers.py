@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from TMN.fieldsets import SparseFieldsetSerializerMixin
+from TMN.identity import IdentityMapRelatedField
+from exercises.models import Exercise
 from .models import ProgramExercise , ExerciseProgram
 from django.utils import timezone
 
@@ -28,7 +31,7 @@ class ExerciseProgramSerializer(serializers.ModelSerializer):
     
     
     
-class ProgramExerciseReadSerializer(serializers.ModelSerializer):
+class ProgramExerciseReadSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     
     program_name = serializers.CharField(source='program.name', read_only=True)
     exercise_name = serializers.CharField(source='exercise.name', read_only=True)
@@ -42,7 +45,9 @@ class ProgramExerciseReadSerializer(serializers.ModelSerializer):
         
         
 class ProgramExerciseWriteSerializer(serializers.ModelSerializer):
-    
+    program = IdentityMapRelatedField(queryset=ExerciseProgram.objects.all())
+    exercise = IdentityMapRelatedField(queryset=Exercise.objects.all())
+
     class Meta:
         model = ProgramExercise
         fields = ['program', 'exercise', 'default_sets', 'default_reps', 'default_rest_time', 'order']
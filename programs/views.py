@@ -1,5 +1,10 @@
 from django.shortcuts import render
 from rest_framework import viewsets, mixins
+from TMN.conditional import ConditionalGetMixin
+from TMN.fieldsets import SparseFieldsetMixin
+from TMN.identity import IdentityMapMixin
+from TMN.pagination import KeysetPagination
+from TMN.replicas import ReplicaReadsMixin
 from .models import ExerciseProgram, ProgramExercise
 from .serializers import (
     ExerciseProgramSerializer,
@@ -13,10 +18,13 @@ from rest_framework.response import Response
 from rest_framework import status
 
 
-class ExerciseProgramViewSet(viewsets.ModelViewSet):
+class ExerciseProgramViewSet(
+    ConditionalGetMixin, IdentityMapMixin, ReplicaReadsMixin, viewsets.ModelViewSet
+):
     serializer_class = ExerciseProgramSerializer
     queryset = ExerciseProgram.objects.all()
     permission_classes = [IsAuthenticated, IsProgramOwner]
+    watermark_resources = ["programs"]
 
     def get_queryset(self):
         return ExerciseProgram.objects.filter(user=self.request.user)
@@ -26,6 +34,10 @@ class ExerciseProgramViewSet(viewsets.ModelViewSet):
 
 
 class ProgramExerciseViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    IdentityMapMixin,
+    ReplicaReadsMixin,
     viewsets.GenericViewSet,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
@@ -34,7 +46,9 @@ class ProgramExerciseViewSet(
     mixins.DestroyModelMixin,
 ):
     permission_classes = [IsProgramOwner, CanAddExerciseToProgram]
+    pagination_class = KeysetPagination
     queryset = ProgramExercise.objects.all()
+    watermark_resources = ["programs", "exercises"]
 
     def get_serializer_class(self):
         if self.request.method in ["POST", "PATCH", "PUT"]:
@@ -53,7 +67,7 @@ class ProgramExerciseViewSet(
 
     def perform_create(self, serializer):
         program = serializer.validated_data["program"]
-        if program.user != self.request.user:
+        if program.user_id != self.request.user.pk:
             raise PermissionDenied("شما مجوز اضافه کردن تمرین به این برنامه را ندارید")
         serializer.save()
 
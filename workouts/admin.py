@@ -1,7 +1,10 @@
 from django.contrib import admin
-from .models import WorkoutLog,TrainingSession
+from .models import WorkoutLog,TrainingSession,DailyExerciseRollup,PersonalRecord,IdempotencyKey
 
 
 admin.site.register(WorkoutLog)
 admin.site.register(TrainingSession)
+admin.site.register(DailyExerciseRollup)
+admin.site.register(PersonalRecord)
+admin.site.register(IdempotencyKey)
 # Register your models here.
@@ -0,0 +1,28 @@
+from django.db import connections, router, transaction
+
+
+def insert_rows(model, columns, rows, using=None):
+    """INSERT plain tuples into ``model``'s table with a single executemany.
+
+    A lean alternative to bulk_create for large, already validated batches:
+    no model instances are built and values are not prepared field by field,
+    so callers pass database-ready values (ISO date strings, Decimals as
+    strings). Like bulk_create it sends no signals. Returns the row count."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    connection = connections[using or router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(model._meta.get_field(name).column) for name in columns),
+        ", ".join(["%s"] * len(columns)),
+    )
+    # One transaction, or SQLite commits every row of the executemany on its own
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(rows)
+
+
+def db_decimal(value):
+    return None if value is None else str(value)
@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from .models import TrainingSession
+
+
+# (output column, ORM lookup) pairs; sessions are LEFT JOINed to their logs so
+# sessions without any logged exercise are exported too
+EXPORT_COLUMNS = [
+    ("session_id", "id"),
+    ("date", "date"),
+    ("program", "program__name"),
+    ("duration", "duration"),
+    ("session_notes", "notes"),
+    ("log_id", "workout_logs__id"),
+    ("exercise_id", "workout_logs__exercise_id"),
+    ("exercise", "workout_logs__exercise__name"),
+    ("category", "workout_logs__exercise__category"),
+    ("sets", "workout_logs__sets"),
+    ("reps", "workout_logs__reps"),
+    ("weight", "workout_logs__weight"),
+    ("rest_time", "workout_logs__rest_time"),
+    ("notes", "workout_logs__notes"),
+]
+HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+
+def export_rows(user, since=None, until=None, chunk_size=2000):
+    """Yield one flat tuple per (session, log) of the user, oldest first.
+
+    Rows are fetched from the cursor in chunks as they are consumed, so memory use
+    does not depend on the size of the history."""
+    sessions = TrainingSession.objects.filter(user=user)
+    if since:
+        sessions = sessions.filter(date__gte=since)
+    if until:
+        sessions = sessions.filter(date__lte=until)
+    return (
+        sessions.order_by("date", "id", "workout_logs__id")
+        .values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(HEADER, row))) + "\n"
+
+
+class ExportRenderer(BaseRenderer):
+    """Lets DRF negotiate ``?format=``; the export view streams the body itself,
+    so only regular (error) responses go through render(), as JSON."""
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
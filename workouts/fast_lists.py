@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F
+from rest_framework.response import Response
+
+from TMN.metrics import timed_serialization
+
+from .serializers import TrainingSessionSerializer, WorkoutLogSerializer
+
+
+# WorkoutLogSerializer.get_volume in SQL, rounded like the Decimal product
+LOG_VOLUME = ExpressionWrapper(
+    F("sets") * F("reps") * F("weight"),
+    output_field=DecimalField(max_digits=16, decimal_places=2),
+)
+
+
+class ValuesRows:
+    """Renders a read serializer's output from ``.values()`` rows, without
+    model instances or per-row field objects. Subclasses define
+    ``represent(row)``, which must return exactly what ``serializer_class``
+    does (WorkoutFastListTests checks); the serializer's own fields format
+    the non-JSON-native values."""
+
+    serializer_class = None
+    lookups = []
+    annotations = {}
+
+    def __init__(self):
+        self.fields = self.serializer_class().fields
+
+    def values(self, queryset):
+        # The ordering columns are kept for the cursor of the next page
+        ordering = [
+            field.lstrip("-")
+            for field in queryset.query.order_by or queryset.model._meta.ordering
+            if isinstance(field, str)
+        ]
+        extra = [name for name in [*ordering, "pk"] if name not in self.lookups]
+        return queryset.values(*self.lookups, *extra, **self.annotations)
+
+
+class WorkoutLogRows(ValuesRows):
+    serializer_class = WorkoutLogSerializer
+    lookups = [
+        "id",
+        "session_id",
+        "exercise_id",
+        "exercise__name",
+        "sets",
+        "reps",
+        "weight",
+        "rest_time",
+        "notes",
+    ]
+    annotations = {"volume": LOG_VOLUME}
+
+    def represent(self, row):
+        weight = row["weight"]
+        return {
+            "id": row["id"],
+            "session_id": str(row["session_id"]),
+            "exercise": row["exercise_id"],
+            "exercise_name": row["exercise__name"],
+            "sets": row["sets"],
+            "reps": row["reps"],
+            "weight": None if weight is None else self.fields["weight"].to_representation(weight),
+            "rest_time": row["rest_time"],
+            "volume": row["volume"],
+            "notes": row["notes"] or "",
+        }
+
+
+class TrainingSessionRows(ValuesRows):
+    serializer_class = TrainingSessionSerializer
+    lookups = [
+        "user__username",
+        "date",
+        "created_at",
+        "program_id",
+        "program__name",
+        "duration",
+        "notes",
+        "id",
+    ]
+
+    def represent(self, row):
+        data = {
+            "user": row["user__username"],
+            "date": self.fields["date"].to_representation(row["date"]),
+            "created_at": self.fields["created_at"].to_representation(row["created_at"]),
+            "program": row["program_id"],
+        }
+        # Like the serializer, which skips program.name when there is no program
+        if row["program_id"] is not None:
+            data["program_name"] = row["program__name"]
+        data["duration"] = row["duration"]
+        data["notes"] = row["notes"]
+        data["id"] = row["id"]
+        return data
+
+
+class FastListMixin:
+    """Serves list requests from ``list_rows`` (a ValuesRows class) instead
+    of the read serializer while API_FAST_LISTS is on. Requests that shape
+    the output (?include=, ?fields=, ?omit=) keep the serializer."""
+
+    list_rows = None
+    shaping_params = ("include", "fields", "omit")
+
+    def use_fast_list(self):
+        params = self.request.query_params
+        return getattr(settings, "API_FAST_LISTS", True) and not any(
+            name in params for name in self.shaping_params
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+        rows = self.list_rows()
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with timed_serialization():
+            data = [rows.represent(row) for row in (queryset if page is None else page)]
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
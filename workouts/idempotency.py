@@ -0,0 +1,107 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from TMN.shards import user_groups
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+def expiry_cutoff():
+    """Keys created before this are expired: ignored, and deleted by purge_expired_keys()"""
+    return timezone.now() - timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", 86400))
+
+
+def purge_expired_keys():
+    """Delete the expired keys of every user; returns how many were deleted"""
+    deleted = 0
+    for _ in user_groups():
+        deleted += IdempotencyKey.objects.filter(created_at__lt=expiry_cutoff()).delete()[0]
+    return deleted
+
+
+def request_hash(request):
+    """SHA-256 of the parsed request body, which a retry must repeat"""
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(stored, request, body_hash):
+    if stored.request_path != request.path:
+        return Response(
+            {"detail": f"This {HEADER} was already used for another request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if stored.request_hash != body_hash:
+        return Response(
+            {"detail": f"This {HEADER} was already used with another request body."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored.response, status=stored.status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view_method):
+    """Make a write action safe to retry with an ``Idempotency-Key`` header.
+
+    The action runs in a transaction together with storing its successful
+    response under the user's key, so a retry (or a concurrent duplicate that
+    loses the unique constraint race) gets the stored response back instead
+    of repeating the write. Reusing a key for another path or body gets 422.
+    Keys expire after IDEMPOTENCY_KEY_TTL seconds. Requests without the
+    header are unaffected."""
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        body_hash = request_hash(request)
+        stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if stored is not None and stored.created_at < expiry_cutoff():
+            stored.delete()
+            stored = None
+        if stored is not None:
+            return _replay(stored, request, body_hash)
+
+        try:
+            with transaction.atomic(using=router.db_for_write(IdempotencyKey)):
+                response = view_method(self, request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        request_path=request.path,
+                        request_hash=body_hash,
+                        status_code=response.status_code,
+                        response=response.data,
+                    )
+        except IntegrityError:
+            stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if stored is None:
+                raise
+            return _replay(stored, request, body_hash)
+        return response
+
+    return wrapper
@@ -0,0 +1,326 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import router, transaction
+from django.utils.dateparse import parse_date
+
+from TMN.conditional import bump_watermarks
+from TMN.shards import use_user_shard
+from accounts.cache import bump_data_version
+from exercises.models import Exercise
+from programs.models import ExerciseProgram
+from .bulk import db_decimal, insert_rows
+from .models import TrainingSession, WorkoutLog
+from .records import refresh_personal_records
+from .rollups import rebuild_daily_rollups
+
+
+IMPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+DEFAULT_CATEGORY = "General"
+FILE_TYPES = ["csv", "ndjson", "json"]
+SMALL_INT_MAX = 32767
+LOG_COLUMNS = ["session", "exercise", "sets", "reps", "weight", "rest_time", "notes"]
+
+
+def detect_file_type(filename):
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return {"jsonl": "ndjson"}.get(extension, extension) if extension else None
+
+
+def read_rows(stream, file_type):
+    """Yield raw row dicts from a text stream without loading the whole file.
+
+    CSV and NDJSON are read line by line. A plain JSON array has to be parsed
+    in one go, so prefer NDJSON for very large files. Unparseable NDJSON
+    lines are yielded as None and reported as row errors."""
+    if file_type == "csv":
+        yield from csv.DictReader(stream)
+    elif file_type == "ndjson":
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row if isinstance(row, dict) else None
+    elif file_type == "json":
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ValueError("A JSON import must be a list of objects.")
+        for row in data:
+            yield row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported file type, use one of: {', '.join(FILE_TYPES)}.")
+
+
+def _text(raw, name, max_length=None):
+    value = raw.get(name)
+    if value is None:
+        return ""
+    value = str(value).strip()
+    if max_length and len(value) > max_length:
+        raise ValueError(f"Ensure this field has no more than {max_length} characters.")
+    return value
+
+
+def _integer(raw, name, required=False, default=None):
+    value = _text(raw, name)
+    if value == "":
+        if required:
+            raise ValueError("This field is required.")
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError("A valid integer is required.")
+    if not 0 <= number <= SMALL_INT_MAX:
+        raise ValueError(f"Ensure this value is between 0 and {SMALL_INT_MAX}.")
+    return number
+
+
+def _weight(raw):
+    value = _text(raw, "weight")
+    if value == "":
+        return None
+    try:
+        weight = Decimal(value).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError("A valid number is required.")
+    if not 0 <= weight < 1000:
+        raise ValueError("Ensure this value is between 0 and 999.99.")
+    return weight
+
+
+def clean_row(raw):
+    """Validate one raw row; returns (values, errors) with errors keyed by column.
+
+    Rows from the export that describe a session without logs (no exercise,
+    sets or reps) are accepted and only create the session."""
+    if raw is None:
+        return None, {"row": "Invalid JSON object."}
+
+    values, errors = {}, {}
+    parsers = {
+        "date": lambda: parse_date(_text(raw, "date")),
+        "session_ref": lambda: _text(raw, "session_id") or _text(raw, "session"),
+        "duration": lambda: _integer(raw, "duration", default=0),
+        "session_notes": lambda: _text(raw, "session_notes"),
+        "program": lambda: _text(raw, "program", max_length=100),
+        "exercise": lambda: _text(raw, "exercise", max_length=100),
+        "category": lambda: _text(raw, "category"),
+        "weight": lambda: _weight(raw),
+        "rest_time": lambda: _integer(raw, "rest_time"),
+        "notes": lambda: _text(raw, "notes") or None,
+    }
+    for name, parse in parsers.items():
+        try:
+            values[name] = parse()
+        except ValueError as exc:
+            errors[name] = str(exc)
+
+    if not errors.get("date") and values.get("date") is None:
+        errors["date"] = "A valid date (YYYY-MM-DD) is required."
+
+    values["has_log"] = bool(values.get("exercise") or _text(raw, "sets") or _text(raw, "reps"))
+    if values["has_log"]:
+        if not values.get("exercise") and "exercise" not in errors:
+            errors["exercise"] = "This field is required."
+        for name in ("sets", "reps"):
+            try:
+                values[name] = _integer(raw, name, required=True)
+            except ValueError as exc:
+                errors[name] = str(exc)
+    return values, errors
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    sessions_created: int = 0
+    exercises_created: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    def as_dict(self):
+        return {
+            "imported": self.imported,
+            "sessions_created": self.sessions_created,
+            "exercises_created": self.exercises_created,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "rows_per_second": round(self.imported / self.seconds) if self.seconds else None,
+        }
+
+
+class WorkoutImporter:
+    """Imports rows for one user in chunks of ``chunk_size``.
+
+    Exercises, programs and sessions are resolved with set-based lookups
+    (one query per kind and chunk at most), missing ones are created with
+    bulk_create, and each chunk's logs are inserted with one executemany in
+    one transaction. Rollups, personal records and the analytics cache are
+    refreshed once at the end, since bulk_create sends no signals."""
+
+    def __init__(self, user, chunk_size=IMPORT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.result = ImportResult()
+        self.exercises = {}
+        self.exercises_by_name = {}
+        for exercise_id, name, category in (
+            Exercise.objects.filter(user=user).order_by("id").values_list("id", "name", "category")
+        ):
+            self.exercises.setdefault((name, category), exercise_id)
+            self.exercises_by_name.setdefault(name, exercise_id)
+        self.programs = dict(
+            ExerciseProgram.objects.filter(user=user).order_by("-id").values_list("name", "id")
+        )
+        self.sessions = {}
+        self.touched_pairs = set()
+        self.first_date = self.last_date = None
+
+    def run(self, rows):
+        started = time.perf_counter()
+        numbered = enumerate(rows, start=1)
+        try:
+            while True:
+                chunk = list(islice(numbered, self.chunk_size))
+                if not chunk:
+                    break
+                self._import_chunk(chunk)
+        finally:
+            # Chunks commit on their own, so refresh what the committed ones
+            # touched even when a later one fails (e.g. on an undecodable line)
+            self._finish()
+        self.result.seconds = time.perf_counter() - started
+        return self.result
+
+    def _report(self, number, errors):
+        self.result.error_count += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append({"row": number, "errors": errors})
+
+    def _import_chunk(self, chunk):
+        cleaned = []
+        for number, raw in chunk:
+            values, errors = clean_row(raw)
+            if errors:
+                self._report(number, errors)
+            else:
+                cleaned.append(values)
+        if not cleaned:
+            return
+
+        with transaction.atomic(using=router.db_for_write(WorkoutLog)):
+            self._resolve_exercises(cleaned)
+            self._resolve_sessions(cleaned)
+            imported = insert_rows(
+                WorkoutLog,
+                LOG_COLUMNS,
+                (
+                    (
+                        self.sessions[self._session_key(values)],
+                        values["exercise_id"],
+                        values["sets"],
+                        values["reps"],
+                        db_decimal(values["weight"]),
+                        values["rest_time"],
+                        values["notes"],
+                    )
+                    for values in cleaned
+                    if values["has_log"]
+                ),
+            )
+
+        self.result.imported += imported
+        for values in cleaned:
+            self.first_date = min(filter(None, [self.first_date, values["date"]]))
+            self.last_date = max(filter(None, [self.last_date, values["date"]]))
+            if values["has_log"]:
+                self.touched_pairs.add((self.user.id, values["exercise_id"]))
+
+    def _exercise_id(self, values):
+        if values["category"]:
+            return self.exercises.get((values["exercise"], values["category"]))
+        return self.exercises_by_name.get(values["exercise"])
+
+    def _resolve_exercises(self, cleaned):
+        missing = {}
+        for values in cleaned:
+            if values["has_log"] and self._exercise_id(values) is None:
+                category = values["category"] or DEFAULT_CATEGORY
+                missing.setdefault(
+                    (values["exercise"], category),
+                    Exercise(user=self.user, name=values["exercise"], category=category),
+                )
+        for exercise in Exercise.objects.bulk_create(missing.values()):
+            self.exercises.setdefault((exercise.name, exercise.category), exercise.id)
+            self.exercises_by_name.setdefault(exercise.name, exercise.id)
+        self.result.exercises_created += len(missing)
+
+        for values in cleaned:
+            if values["has_log"]:
+                values["exercise_id"] = self._exercise_id(values) or self.exercises[
+                    (values["exercise"], values["category"] or DEFAULT_CATEGORY)
+                ]
+
+    def _session_key(self, values):
+        # Rows sharing a session reference (e.g. the export's session_id) form
+        # one new session; rows without one join the user's session that day
+        if values["session_ref"]:
+            return ("ref", values["session_ref"])
+        return ("date", values["date"])
+
+    def _resolve_sessions(self, cleaned):
+        unseen_dates = {
+            values["date"]
+            for values in cleaned
+            if not values["session_ref"] and ("date", values["date"]) not in self.sessions
+        }
+        if unseen_dates:
+            for session_id, day in (
+                TrainingSession.objects.filter(user=self.user, date__in=unseen_dates)
+                .order_by("-id")
+                .values_list("id", "date")
+            ):
+                self.sessions[("date", day)] = session_id
+
+        missing = {}
+        for values in cleaned:
+            key = self._session_key(values)
+            if key not in self.sessions and key not in missing:
+                missing[key] = TrainingSession(
+                    user=self.user,
+                    date=values["date"],
+                    duration=values["duration"],
+                    notes=values["session_notes"],
+                    program_id=self.programs.get(values["program"]),
+                )
+        created = TrainingSession.objects.bulk_create(missing.values())
+        for key, session in zip(missing, created):
+            self.sessions[key] = session.id
+        self.result.sessions_created += len(created)
+
+    def _finish(self):
+        if not self.result.imported and not self.result.sessions_created:
+            return
+        using = router.db_for_write(WorkoutLog)
+        with transaction.atomic(using=using):
+            rebuild_daily_rollups(
+                user_ids=[self.user.id], since=self.first_date, until=self.last_date
+            )
+            refresh_personal_records(self.touched_pairs)
+        bump_data_version(self.user.id, using=using)
+        bump_watermarks(self.user.id, "exercises", "sessions", "logs", using=using)
+
+
+def import_workouts(user, stream, file_type, chunk_size=IMPORT_CHUNK_SIZE):
+    with use_user_shard(user.pk):
+        return WorkoutImporter(user, chunk_size=chunk_size).run(read_rows(stream, file_type))
@@ -0,0 +1,38 @@
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+
+from programs.models import ProgramExercise
+from .models import WorkoutLog
+
+
+# ?include= values of the session endpoints; a nested include implies its parent
+INCLUDES = ["logs", "logs.exercise", "program", "program.exercises"]
+
+
+def parse_includes(value):
+    requested = {name.strip() for name in (value or "").split(",") if name.strip()}
+    unknown = requested - set(INCLUDES)
+    if unknown:
+        raise ValidationError(
+            {"include": f"Unknown include {', '.join(sorted(unknown))}; use {', '.join(INCLUDES)}."}
+        )
+    for name in list(requested):
+        if "." in name:
+            requested.add(name.split(".", 1)[0])
+    return requested
+
+
+def plan_includes(queryset, includes):
+    """Prefetch everything the included data needs, so a page of sessions
+    costs one query plus one per included collection. The program itself is
+    joined already (see TrainingSessionViewSet.get_queryset)."""
+    if "logs" in includes:
+        # exercise_name is always rendered, so the exercise is joined either way
+        logs = WorkoutLog.objects.select_related("exercise").order_by("id")
+        queryset = queryset.prefetch_related(Prefetch("workout_logs", queryset=logs))
+    if "program.exercises" in includes:
+        program_exercises = ProgramExercise.objects.select_related("exercise").order_by("order", "id")
+        queryset = queryset.prefetch_related(
+            Prefetch("program__program_exercises", queryset=program_exercises)
+        )
+    return queryset
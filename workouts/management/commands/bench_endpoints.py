@@ -0,0 +1,243 @@
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from TMN.metrics import Summary
+from TMN.shards import shard_databases, use_user_shard
+from accounts.cache import get_cache
+from exercises.models import Exercise
+from programs.models import ExerciseProgram
+from workouts.models import TrainingSession, WorkoutLog
+
+
+# Values for URL parameters other than a viewset's pk
+PARAMETERS = {
+    "exercise_id": lambda user: Exercise.objects.filter(user=user).order_by("id").first(),
+}
+
+# Query strings by view name, for endpoints that need one or whose defaults
+# would miss most of the seeded history
+QUERIES = {
+    "accounts.analytics.WeightAnalyticsView": lambda user: {"days": 365},
+    "accounts.analytics.WeightTrendAnalyticsView": lambda user: {"days": 365},
+    "accounts.analytics.BMIAnalyticsView": lambda user: {"days": 365},
+    "accounts.analytics.ExerciseBatchAnalyticsView": lambda user: {
+        "program_id": ExerciseProgram.objects.filter(user=user).order_by("id").first().id
+    },
+}
+
+SKIPPED_PREFIXES = ("admin/",)
+
+
+def get_endpoints(patterns=None, prefix=""):
+    """(route, URLPattern, URL parameter names) of every GET endpoint"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    endpoints = []
+    for pattern in patterns:
+        route = prefix + _readable(str(pattern.pattern))
+        if route.startswith(SKIPPED_PREFIXES):
+            continue
+        if isinstance(pattern, URLResolver):
+            endpoints.extend(get_endpoints(pattern.url_patterns, route))
+        elif isinstance(pattern, URLPattern) and _handles_get(pattern.callback):
+            names = set(pattern.pattern.regex.groupindex)
+            # The router's ?format suffix variants repeat the plain routes
+            if "format" not in names:
+                endpoints.append((route, pattern, names))
+    return endpoints
+
+
+def _readable(pattern):
+    """'^logs/(?P<pk>[^/.]+)/$' (router regexes) as 'logs/<pk>/'"""
+    return re.sub(r"\(\?P<(\w+)>[^)]*\)", r"<\1>", pattern).lstrip("^").rstrip("$")
+
+
+def _handles_get(callback):
+    actions = getattr(callback, "actions", None)
+    if actions is not None:
+        return "get" in actions
+    view_class = getattr(callback, "view_class", None)
+    return view_class is not None and hasattr(view_class, "get")
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every GET endpoint of the API as one (seeded) user and report "
+        "latency percentiles and query counts. --save-baseline writes them to "
+        "a JSON file; --baseline compares with one and fails on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", default="fit0000", help="See seed_fitness")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", help="Regex on the route of the endpoints to run")
+        parser.add_argument(
+            "--cold", action="store_true", help="Clear the cache before each request"
+        )
+        parser.add_argument("--save-baseline", metavar="PATH")
+        parser.add_argument("--baseline", metavar="PATH")
+        parser.add_argument(
+            "--threshold", type=float, default=0.25,
+            help="Allowed p50 slowdown against the baseline, as a fraction",
+        )
+        parser.add_argument(
+            "--min-delta-ms", type=float, default=2.0,
+            help="Ignore slowdowns smaller than this, which are noise",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(
+                f"User {options['username']!r} does not exist, run seed_fitness first"
+            )
+
+        # Expected 403/404s would otherwise be logged for every request
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        client = APIClient(SERVER_NAME="localhost")
+        client.force_authenticate(user)
+        results = {}
+        # URL parameters and the dataset are looked up outside requests
+        with use_user_shard(user.pk):
+            for route, pattern, names in get_endpoints():
+                if options["only"] and not re.search(options["only"], route):
+                    continue
+                url = self.build_url(user, pattern, names)
+                if url is None:
+                    self.stderr.write(f"Skipping {route}: no value for {', '.join(sorted(names))}")
+                    continue
+                results[f"GET /{route}"] = self.measure(client, url, options)
+
+            self.report(results)
+            if options["save_baseline"]:
+                self.save(options["save_baseline"], user, options, results)
+        if options["baseline"]:
+            self.compare(options["baseline"], results, options)
+
+    def build_url(self, user, pattern, names):
+        kwargs = {}
+        for name in names:
+            if name == "pk" and hasattr(pattern.callback, "cls"):
+                obj = self.first_object(user, pattern.callback)
+            elif name in PARAMETERS:
+                obj = PARAMETERS[name](user)
+            else:
+                return None
+            if obj is None:
+                return None
+            kwargs[name] = obj.pk
+        url = reverse(pattern.callback, kwargs=kwargs)
+        query = QUERIES.get(pattern.lookup_str)
+        if query is not None:
+            url += "?" + "&".join(f"{key}={value}" for key, value in query(user).items())
+        return url
+
+    def first_object(self, user, callback):
+        """The first object the viewset would show the user"""
+        view = callback.cls(**callback.initkwargs)
+        view.request = Request(APIRequestFactory().get("/"))
+        view.request.user = user
+        view.action = callback.actions["get"]
+        view.args, view.kwargs, view.format_kwarg = (), {}, None
+        return view.get_queryset().first()
+
+    def measure(self, client, url, options):
+        cache = get_cache()
+        for _ in range(options["warmup"]):
+            client.get(url)
+        summary = Summary(options["repeat"])
+        queries = 0
+        for _ in range(options["repeat"]):
+            if options["cold"]:
+                cache.clear()
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connections[alias]))
+                    for alias in self.databases()
+                ]
+                started = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                summary.observe((time.perf_counter() - started) * 1000)
+            queries = max(queries, sum(len(context) for context in captured))
+        result = {f"p{round(q * 100)}_ms": round(value, 3) for q, value in summary.quantiles()}
+        result.update(queries=queries, status=response.status_code, url=url)
+        return result
+
+    @staticmethod
+    def databases():
+        """The aliases requests can query: "default", the shards and the replica"""
+        aliases = [DEFAULT_DB_ALIAS, *shard_databases()]
+        replica = getattr(settings, "REPLICA_DATABASE", None)
+        if replica and replica not in aliases:
+            aliases.append(replica)
+        return aliases
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'endpoint':<60} {'status':>6} {'queries':>7}"
+            f" {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<60} {r['status']:>6} {r['queries']:>7}"
+                f" {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+            )
+
+    def save(self, path, user, options, results):
+        baseline = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "username": user.username,
+            "repeat": options["repeat"],
+            "dataset": {
+                "sessions": TrainingSession.objects.filter(user=user).count(),
+                "logs": WorkoutLog.objects.filter(session__user=user).count(),
+            },
+            "endpoints": results,
+        }
+        with open(path, "w", encoding="utf-8") as stream:
+            json.dump(baseline, stream, indent=2, sort_keys=True)
+        self.stdout.write(f"Saved the baseline to {path}")
+
+    def compare(self, path, results, options):
+        with open(path, encoding="utf-8") as stream:
+            baseline = json.load(stream)["endpoints"]
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result["status"] != before["status"]:
+                regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+            if result["queries"] > before["queries"]:
+                regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+            slower = result["p50_ms"] - before["p50_ms"]
+            if (
+                result["p50_ms"] > before["p50_ms"] * (1 + options["threshold"])
+                and slower > options["min_delta_ms"]
+            ):
+                regressions.append(
+                    f"{name}: p50 {before['p50_ms']:.2f}ms -> {result['p50_ms']:.2f}ms"
+                )
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f"{len(regressions)} regressions against {path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {path}"))
@@ -0,0 +1,56 @@
+import statistics
+import time
+
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from workouts.views import TrainingSessionViewSet, WorkoutLogViewSet
+from .bench_pagination import Command as PaginationCommand
+
+
+ENDPOINTS = [
+    ("logs", "/api/workouts/logs/", WorkoutLogViewSet),
+    ("sessions", "/api/workouts/sessions/", TrainingSessionViewSet),
+]
+
+
+class Command(PaginationCommand):
+    help = (
+        "Compare list latency of the .values() fast path with the read "
+        "serializers, side by side, on the pagination benchmark's user"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(page_size=500, repeat=9)
+
+    def handle(self, *args, **options):
+        user = self.seed(options)
+        factory = APIRequestFactory(SERVER_NAME="localhost")
+        params = {"page_size": options["page_size"]}
+
+        def timed(view, url, fast):
+            samples, body = [], None
+            with override_settings(API_FAST_LISTS=fast):
+                for _ in range(options["repeat"]):
+                    request = factory.get(url, params)
+                    force_authenticate(request, user=user)
+                    started = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    samples.append(time.perf_counter() - started)
+                    assert response.status_code == 200, response.data
+                    body = response.content
+            return statistics.median(samples) * 1000, body
+
+        self.stdout.write(f"page size {options['page_size']}, median of {options['repeat']}")
+        self.stdout.write(f"{'endpoint':>10} {'serializer ms':>14} {'fast ms':>10} {'speedup':>8}")
+        for name, url, viewset in ENDPOINTS:
+            view = viewset.as_view({"get": "list"})
+            serializer_ms, serialized = timed(view, url, fast=False)
+            fast_ms, fast = timed(view, url, fast=True)
+            if fast != serialized:
+                self.stderr.write(f"{name}: the fast path's output differs from the serializer's")
+            self.stdout.write(
+                f"{name:>10} {serializer_ms:>14.2f} {fast_ms:>10.2f} {serializer_ms / fast_ms:>7.1f}x"
+            )
@@ -0,0 +1,125 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from exercises.models import Exercise
+from workouts.bulk import insert_rows
+from workouts.models import TrainingSession, WorkoutLog
+from workouts.records import rebuild_personal_records
+from workouts.rollups import rebuild_daily_rollups
+from workouts.views import WorkoutLogViewSet
+
+
+LOGS_PER_SESSION = 10
+DEPTHS = [0, 0.25, 0.5, 0.75, 0.99]
+
+
+class OffsetWorkoutLogViewSet(WorkoutLogViewSet):
+    """The same endpoint with OFFSET paging, as the baseline"""
+
+    pagination_class = LimitOffsetPagination
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-page latency of the cursor-paginated log list with OFFSET "
+        "paging at increasing depths, on a user with a large history"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logs", type=int, default=500_000)
+        parser.add_argument("--username", default="bench-pagination")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        user = self.seed(options)
+        total = WorkoutLog.objects.filter(session__user=user).count()
+        page_size = options["page_size"]
+        factory = APIRequestFactory(SERVER_NAME="localhost")
+        cursor_view = WorkoutLogViewSet.as_view({"get": "list"})
+        offset_view = OffsetWorkoutLogViewSet.as_view({"get": "list"})
+        ordering = WorkoutLogViewSet.pagination_class().get_ordering(
+            WorkoutLog.objects.order_by("session__date", "id")
+        )
+        logs = WorkoutLog.objects.filter(session__user=user).order_by(*ordering)
+
+        def timed(view, params):
+            samples = []
+            for _ in range(options["repeat"]):
+                request = factory.get("/api/workouts/logs/", params)
+                force_authenticate(request, user=user)
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                samples.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.data
+            return statistics.median(samples) * 1000
+
+        self.stdout.write(f"{total} logs, page size {page_size}")
+        self.stdout.write(f"{'depth':>8} {'row':>8} {'cursor ms':>10} {'offset ms':>10}")
+        for depth in DEPTHS:
+            offset = int((total - page_size) * depth)
+            params = {"page_size": page_size}
+            if offset:
+                # The cursor a client would hold after paging down to this row
+                row = logs.select_related("session")[offset - 1]
+                paginator = WorkoutLogViewSet.pagination_class()
+                paginator.ordering = ordering
+                params["cursor"] = paginator.encode_cursor(
+                    [row.session.date.isoformat(), row.pk], reverse=False
+                )
+            cursor_ms = timed(cursor_view, params)
+            offset_ms = timed(offset_view, {"limit": page_size, "offset": offset})
+            self.stdout.write(f"{depth:>8.0%} {offset:>8} {cursor_ms:>10.2f} {offset_ms:>10.2f}")
+
+    def seed(self, options):
+        """Create the benchmark user's history once; later runs reuse it"""
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(
+            username=options["username"],
+            defaults={"email": f"{options['username']}@example.com"},
+        )
+        existing = WorkoutLog.objects.filter(session__user=user).count()
+        if existing >= options["logs"]:
+            return user
+
+        self.stdout.write(f"Seeding {options['logs'] - existing} logs for {user.username}...")
+        rng = random.Random(options["seed"])
+        exercises = [
+            Exercise.objects.get_or_create(
+                user=user, name=f"Bench exercise {i}", defaults={"category": "Bench"}
+            )[0].id
+            for i in range(LOGS_PER_SESSION)
+        ]
+        start = date(2000, 1, 1)
+        session_count = -(-(options["logs"] - existing) // LOGS_PER_SESSION)
+        offset = TrainingSession.objects.filter(user=user).count()
+        for first in range(0, session_count, 5000):
+            with transaction.atomic():
+                sessions = TrainingSession.objects.bulk_create(
+                    TrainingSession(
+                        user=user, date=start + timedelta(days=(offset + i) // 2), duration=60
+                    )
+                    for i in range(first, min(first + 5000, session_count))
+                )
+                insert_rows(
+                    WorkoutLog,
+                    ["session", "exercise", "sets", "reps", "weight"],
+                    [
+                        (session.id, exercise_id, 3, rng.randint(3, 12), f"{rng.uniform(20, 150):.2f}")
+                        for session in sessions
+                        for exercise_id in exercises
+                    ],
+                )
+        rebuild_daily_rollups(user_ids=[user.id])
+        rebuild_personal_records(user_ids=[user.id])
+        return user
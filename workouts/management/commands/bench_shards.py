@@ -0,0 +1,191 @@
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, router, transaction
+from django.test.utils import override_settings
+
+from TMN.shards import reserve_id_ranges, shard_for, use_user_shard
+from exercises.models import Exercise
+from workouts.models import TrainingSession, WorkoutLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure log-post throughput (a session and its logs per transaction, "
+        "through ShardRouter) with the per-user data spread over 1, 2 and 4 "
+        "scratch SQLite shards, every writer posting for their own user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--shards", default="1,2,4", help="Comma-separated shard counts to compare"
+        )
+        parser.add_argument("--writers", type=int, default=16)
+        parser.add_argument("--seconds", type=float, default=5.0, help="Per shard count")
+        parser.add_argument("--logs-per-post", type=int, default=4)
+        parser.add_argument(
+            "--work-ms",
+            type=float,
+            default=2.0,
+            help=(
+                "Time a post spends in its transaction besides the inserts, like "
+                "the view's validation, signals and serialization, or a slow "
+                "disk's sync; the write lock of its shard is held meanwhile"
+            ),
+        )
+        parser.add_argument(
+            "--synchronous",
+            default="FULL",
+            choices=["OFF", "NORMAL", "FULL"],
+            help="PRAGMA synchronous of the shards; FULL syncs every commit to disk",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            counts = [int(count) for count in options["shards"].split(",")]
+        except ValueError:
+            raise CommandError("--shards must be comma-separated numbers")
+        if not counts or min(counts) < 1:
+            raise CommandError("--shards must be comma-separated numbers")
+
+        directory = Path(tempfile.mkdtemp(prefix="bench-shards-"))
+        self.aliases = []
+        try:
+            template = directory / "template.sqlite3"
+            user_ids, exercise_ids = self.prepare(template, options)
+            results = {}
+            for count in counts:
+                aliases = []
+                for number in range(count):
+                    path = directory / f"{count}-{number}.sqlite3"
+                    shutil.copy(template, path)
+                    aliases.append(self.register(f"bench_{count}_{number}", path, options))
+                results[count] = self.run(aliases, user_ids, exercise_ids, options)
+        finally:
+            for alias in self.aliases:
+                connections[alias].close()
+                del connections[alias]
+                del connections.settings[alias]
+            shutil.rmtree(directory, ignore_errors=True)
+        self.report(results, options)
+
+    def register(self, alias, path, options):
+        """A database alias for the scratch file, added for this run only"""
+        settings = dict(connections.settings["default"])
+        settings.update(
+            ENGINE="TMN.sqlite",
+            NAME=str(path),
+            OPTIONS={"pragmas": {"synchronous": options["synchronous"]}},
+            CONN_MAX_AGE=0,
+            TEST={},
+        )
+        connections.settings[alias] = settings
+        self.aliases.append(alias)
+        return alias
+
+    def prepare(self, path, options):
+        """Migrate a scratch database with a user per writer, which every
+        shard starts as a copy of"""
+        alias = self.register("bench_template", path, options)
+        call_command("migrate", database=alias, verbosity=0)
+        User = get_user_model()
+        users = User.objects.using(alias).bulk_create(
+            User(username=f"shard{number}", email=f"shard{number}@example.com")
+            for number in range(options["writers"])
+        )
+        exercises = Exercise.objects.using(alias).bulk_create(
+            Exercise(user=user, name=f"Lift {number}", category="Legs")
+            for user in users
+            for number in range(options["logs_per_post"])
+        )
+        connections[alias].close()
+        exercise_ids = {}
+        for exercise in exercises:
+            exercise_ids.setdefault(exercise.user_id, []).append(exercise.id)
+        return [user.id for user in users], exercise_ids
+
+    def run(self, aliases, user_ids, exercise_ids, options):
+        latencies = []
+        errors = {"locked": 0}
+        lock = threading.Lock()
+
+        def writer(user_id):
+            day = date(2020, 1, 1)
+            with use_user_shard(user_id):
+                alias = router.db_for_write(WorkoutLog)
+                try:
+                    while time.perf_counter() < deadline:
+                        day += timedelta(days=1)
+                        started = time.perf_counter()
+                        try:
+                            with transaction.atomic(using=alias):
+                                time.sleep(options["work_ms"] / 1000)
+                                (session,) = TrainingSession.objects.bulk_create(
+                                    [TrainingSession(user_id=user_id, date=day, duration=60)]
+                                )
+                                WorkoutLog.objects.bulk_create(
+                                    WorkoutLog(
+                                        session=session,
+                                        exercise_id=exercise_id,
+                                        sets=3,
+                                        reps=8,
+                                        weight=100,
+                                    )
+                                    for exercise_id in exercise_ids[user_id]
+                                )
+                        except OperationalError:
+                            with lock:
+                                errors["locked"] += 1
+                            continue
+                        with lock:
+                            latencies.append(time.perf_counter() - started)
+                finally:
+                    connections[alias].close()
+
+        with override_settings(SHARD_DATABASES=aliases):
+            for alias in aliases:
+                reserve_id_ranges(using=alias)
+                connections[alias].close()
+            placement = [shard_for(user_id) for user_id in user_ids]
+            threads = [threading.Thread(target=writer, args=(user_id,)) for user_id in user_ids]
+            deadline = time.perf_counter() + options["seconds"]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        ordered = sorted(latencies) or [0.0]
+        return {
+            "users": "/".join(str(placement.count(alias)) for alias in aliases),
+            "posts_per_second": len(latencies) / elapsed,
+            "locked": errors["locked"],
+            "p50_ms": statistics.median(ordered) * 1000,
+            "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        }
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"{options['writers']} writers, {options['seconds']:g}s per shard count,"
+            f" {options['work_ms']:g}ms of work per post, synchronous={options['synchronous']}"
+        )
+        self.stdout.write(
+            f"{'shards':>6} {'users':>12} {'posts/s':>9} {'locked':>7}"
+            f" {'p50 ms':>8} {'p99 ms':>8} {'speedup':>8}"
+        )
+        base = next(iter(results.values()))["posts_per_second"]
+        for count, r in results.items():
+            speedup = r["posts_per_second"] / base if base else 0.0
+            self.stdout.write(
+                f"{count:>6} {r['users']:>12} {r['posts_per_second']:>9.1f} {r['locked']:>7}"
+                f" {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {speedup:>7.1f}x"
+            )
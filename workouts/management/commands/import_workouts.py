@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from workouts.importer import FILE_TYPES, IMPORT_CHUNK_SIZE, detect_file_type, import_workouts
+
+
+class Command(BaseCommand):
+    help = "Bulk import workout history for one user from a CSV, NDJSON or JSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import")
+        parser.add_argument("--user", required=True, help="Username of the owner")
+        parser.add_argument("--file-type", choices=FILE_TYPES, help="Defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist")
+
+        file_type = options["file_type"] or detect_file_type(options["path"])
+        if file_type not in FILE_TYPES:
+            raise CommandError("Cannot tell the file type, pass --file-type")
+
+        with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+            try:
+                result = import_workouts(
+                    user, stream, file_type, chunk_size=options["chunk_size"]
+                ).as_dict()
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        for error in result["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result['imported']} logs "
+                f"({result['sessions_created']} new sessions, "
+                f"{result['exercises_created']} new exercises, "
+                f"{result['error_count']} rejected rows, "
+                f"{result['rows_per_second']} rows/s)"
+            )
+        )
@@ -0,0 +1,143 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from TMN.shards import (
+    copy_users,
+    owner_lookup,
+    shard_databases,
+    shard_for,
+    sharded_models,
+)
+
+
+DELETE_BATCH = 500
+
+
+def delete_rows(model, pks, using):
+    """Delete rows by pk without cascades or signals: the rows were copied,
+    not removed, so nothing derived from them needs updating"""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), DELETE_BATCH):
+            batch = pks[start : start + DELETE_BATCH]
+            cursor.execute(
+                f"DELETE FROM {quote(model._meta.db_table)}"
+                f" WHERE {quote(model._meta.pk.column)} IN ({', '.join(['%s'] * len(batch))})",
+                batch,
+            )
+
+
+class Command(BaseCommand):
+    help = (
+        "Move every user's data to the shard their id hashes to, from the "
+        "other shards and from \"default\" (data written before sharding was "
+        "enabled). Run it after adding a shard at the end of SHARD_DATABASES. "
+        "Each user moves in one transaction per database, keeping the ids of "
+        "their rows; their requests already go to the new shard, so run it "
+        "when traffic is low."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only list the users that would move"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        aliases = shard_databases()
+        if not aliases:
+            raise CommandError("SHARD_DATABASES is empty, sharding is off")
+        sources = aliases if DEFAULT_DB_ALIAS in aliases else [DEFAULT_DB_ALIAS, *aliases]
+
+        moves = [
+            (user_id, source, shard_for(user_id))
+            for source in sources
+            for user_id in sorted(self.user_ids(source))
+            if shard_for(user_id) != source
+        ]
+        moved = rows = 0
+        for user_id, source, target in moves:
+            if options["dry_run"]:
+                self.stdout.write(f"Would move user {user_id}: {source} -> {target}")
+                continue
+            count = self.move(user_id, source, target, options["batch_size"])
+            if count is None:
+                self.stderr.write(f"Skipping user {user_id} on {source}: no such user")
+                continue
+            self.stdout.write(f"Moved user {user_id}: {source} -> {target} ({count} rows)")
+            moved += 1
+            rows += count
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(moves)} users to move")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Moved {moved} users ({rows} rows)"))
+
+    def user_ids(self, using):
+        """Ids of the users with data on ``using``"""
+        user_ids = set()
+        for model in sharded_models():
+            if owner_lookup(model) == "user_id":
+                user_ids.update(
+                    model._base_manager.using(using).values_list("user_id", flat=True).distinct()
+                )
+        return user_ids
+
+    def move(self, user_id, source, target, batch_size):
+        """Copy the user's rows to ``target``, parents first, then delete
+        them from ``source``; returns the number of rows moved.
+
+        ``target`` commits first: a failure before ``source`` commits leaves
+        the rows on both, and the next run only deletes them from ``source``."""
+        User = get_user_model()
+        user = User._base_manager.using(DEFAULT_DB_ALIAS).filter(pk=user_id).first()
+        if user is None:
+            return None
+        copy_users([user])
+
+        copied = []
+        with transaction.atomic(using=source), transaction.atomic(using=target):
+            for model in sharded_models():
+                rows = (
+                    model._base_manager.using(source)
+                    .filter(**{owner_lookup(model): user_id})
+                    .order_by("pk")
+                    .iterator(chunk_size=batch_size)
+                )
+                pks = []
+                while batch := list(islice(rows, batch_size)):
+                    present = self.copied_before(model, batch, user_id, target)
+                    model._base_manager.using(target).bulk_create(
+                        [row for row in batch if row.pk not in present]
+                    )
+                    pks += [row.pk for row in batch]
+                copied.append((model, pks))
+            for model, pks in reversed(copied):
+                delete_rows(model, pks, source)
+            if source != DEFAULT_DB_ALIAS:
+                # The source shard's copy of the user row
+                delete_rows(User, [user_id], source)
+        return sum(len(pks) for _, pks in copied)
+
+    def copied_before(self, model, batch, user_id, using):
+        """The pks of ``batch`` already on ``using`` as rows of the same user,
+        left by a move whose ``source`` failed to commit; they stay as they
+        are. Shard id ranges keep the ids of rows moving out of "default" or
+        into a newer shard free. Other moves can collide with another user's
+        rows (SQLite continues a table after its highest id), which rolls
+        the user's move back."""
+        taken = model._base_manager.using(using).filter(pk__in=[row.pk for row in batch])
+        present = set(
+            taken.filter(**{owner_lookup(model): user_id}).values_list("pk", flat=True)
+        )
+        collision = taken.exclude(pk__in=present).values_list("pk", flat=True).first()
+        if collision is not None:
+            raise CommandError(
+                f"{model._meta.label} {collision} already exists on {using}, "
+                "not moving its owner"
+            )
+        return present
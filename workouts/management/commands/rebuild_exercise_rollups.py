@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from workouts.rollups import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user, per-exercise daily rollup table from raw workout logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild rollups for this user id (repeatable)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows streamed and inserted per batch",
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_daily_rollups(
+            user_ids=options["user_ids"], chunk_size=options["chunk_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily rollup rows"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from workouts.records import rebuild_personal_records
+
+
+class Command(BaseCommand):
+    help = "Recompute every personal record from the raw workout logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild records for this user id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        pairs = rebuild_personal_records(user_ids=options["user_ids"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt personal records for {pairs} user/exercise pairs")
+        )
@@ -0,0 +1,229 @@
+import random
+import time
+from datetime import date, datetime, time as day_time, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.utils.dateparse import parse_date
+
+from TMN.conditional import RESOURCES, bump_watermarks
+from TMN.shards import copy_users, use_user_shard
+from accounts.cache import bump_data_version
+from accounts.models import Profile
+from exercises.models import Exercise
+from programs.models import ExerciseProgram, ProgramExercise
+from workouts.bulk import insert_rows
+from workouts.models import TrainingSession, WorkoutLog
+from workouts.records import rebuild_personal_records
+from workouts.rollups import rebuild_daily_rollups
+
+
+# (name, category, starting weight in kg)
+CATALOG = [
+    ("Back Squat", "Legs", 60),
+    ("Front Squat", "Legs", 50),
+    ("Deadlift", "Back", 80),
+    ("Romanian Deadlift", "Legs", 60),
+    ("Bench Press", "Chest", 50),
+    ("Incline Bench Press", "Chest", 40),
+    ("Overhead Press", "Shoulders", 30),
+    ("Barbell Row", "Back", 45),
+    ("Pull Up", "Back", 0),
+    ("Dip", "Chest", 0),
+    ("Lunge", "Legs", 30),
+    ("Hip Thrust", "Legs", 60),
+    ("Lateral Raise", "Shoulders", 8),
+    ("Biceps Curl", "Arms", 12),
+    ("Triceps Extension", "Arms", 15),
+    ("Calf Raise", "Legs", 40),
+]
+SESSION_BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users with years of profile, session and log history for "
+        "benchmarks. The same options (including --until) always produce the "
+        "same data; users that already exist are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--years", type=float, default=2.0)
+        parser.add_argument("--sessions-per-week", type=int, default=4)
+        parser.add_argument("--logs-per-session", type=int, default=5)
+        parser.add_argument(
+            "--exercises", type=int, default=12, help=f"Per user, up to {len(CATALOG)}"
+        )
+        parser.add_argument("--prefix", default="fit", help="Usernames are <prefix><number>")
+        parser.add_argument("--password", default="fitness123")
+        parser.add_argument("--until", help="Date of the last session, defaults to today")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        until = parse_date(options["until"]) if options["until"] else date.today()
+        if until is None:
+            raise CommandError("--until must be a date (YYYY-MM-DD)")
+        if not 1 <= options["exercises"] <= len(CATALOG):
+            raise CommandError(f"--exercises must be between 1 and {len(CATALOG)}")
+        self.options = options
+        self.until = until
+        self.since = until - timedelta(days=round(options["years"] * 365))
+
+        started = time.perf_counter()
+        users = self.create_users()
+        logs = 0
+        for user in users:
+            logs += self.seed_user(user, random.Random(f"{options['seed']}:{user.username}"))
+        if users:
+            user_ids = [user.id for user in users]
+            rebuild_daily_rollups(user_ids=user_ids)
+            rebuild_personal_records(user_ids=user_ids)
+            for user_id in user_ids:
+                bump_data_version(user_id)
+                bump_watermarks(user_id, *RESOURCES)
+
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(users)} users and {logs} logs in {seconds:.1f}s"
+                f" ({logs / seconds if seconds else 0:.0f} logs/s)"
+            )
+        )
+
+    def create_users(self):
+        User = get_user_model()
+        prefix = self.options["prefix"]
+        names = [f"{prefix}{number:04d}" for number in range(self.options["users"])]
+        existing = set(User.objects.filter(username__in=names).values_list("username", flat=True))
+        # Hashing is slow on purpose, so every user gets the same hash
+        password = make_password(self.options["password"])
+        missing = [
+            User(username=name, email=f"{name}@example.com", password=password)
+            for name in names
+            if name not in existing
+        ]
+        if existing:
+            self.stdout.write(f"Skipping {len(existing)} existing users")
+        users = User.objects.bulk_create(missing)
+        # bulk_create sends no post_save
+        copy_users(users)
+        return users
+
+    def seed_user(self, user, rng):
+        """Everything of one user, in one transaction on their shard; returns
+        the number of logs"""
+        with use_user_shard(user.pk), transaction.atomic(using=router.db_for_write(WorkoutLog)):
+            return self.seed_history(user, rng)
+
+    def seed_history(self, user, rng):
+        self.seed_profiles(user, rng)
+        catalog = rng.sample(CATALOG, self.options["exercises"])
+        exercises = Exercise.objects.bulk_create(
+            Exercise(user=user, name=name, category=category) for name, category, _ in catalog
+        )
+        start_weight = {exercise.id: weight for exercise, (_, _, weight) in zip(exercises, catalog)}
+        programs = self.seed_programs(user, exercises, rng)
+
+        days = self.training_days(rng)
+        logs = 0
+        for first in range(0, len(days), SESSION_BATCH):
+            batch = days[first : first + SESSION_BATCH]
+            sessions = TrainingSession.objects.bulk_create(
+                TrainingSession(
+                    user=user,
+                    date=day,
+                    duration=rng.randint(30, 90),
+                    program=rng.choice(programs) if rng.random() < 0.5 else None,
+                    notes=rng.choice(["", "", "", "Felt strong", "Tired", "Short on time"]),
+                )
+                for day in batch
+            )
+            rows = []
+            for session in sessions:
+                # Loads creep up over the years, with day to day noise
+                progress = 1 + (session.date - self.since).days / 365 * 0.15
+                count = self.options["logs_per_session"] + rng.randint(-1, 1)
+                count = max(1, min(len(exercises), count))
+                for exercise in rng.sample(exercises, count):
+                    base = start_weight[exercise.id]
+                    weight = None if not base else f"{base * progress * rng.uniform(0.9, 1.1):.2f}"
+                    rows.append(
+                        (
+                            session.id,
+                            exercise.id,
+                            rng.randint(2, 5),
+                            rng.randint(3, 12),
+                            weight,
+                            rng.choice([None, 60, 90, 120, 180]),
+                            rng.choice([None, None, None, "Paused", "Belt"]),
+                        )
+                    )
+            logs += insert_rows(
+                WorkoutLog,
+                ["session", "exercise", "sets", "reps", "weight", "rest_time", "notes"],
+                rows,
+            )
+        return logs
+
+    def seed_profiles(self, user, rng):
+        """One profile per quarter, the latest one current"""
+        quarters = max(1, round((self.until - self.since).days / 91))
+        weight = rng.randint(55, 100)
+        height = rng.randint(155, 200)
+        profiles = []
+        for quarter in range(quarters):
+            weight = max(40, weight + rng.randint(-3, 2))
+            profiles.append(
+                Profile(
+                    user=user,
+                    height=height,
+                    weight=weight,
+                    location=rng.choice(["Tehran", "Berlin", "Toronto", "Lisbon"]),
+                    birth_date=date(
+                        rng.randint(1960, 2005), rng.randint(1, 12), rng.randint(1, 28)
+                    ),
+                    is_current=quarter == quarters - 1,
+                )
+            )
+        Profile.objects.bulk_create(profiles)
+        # created_at is auto_now_add, so the history dates are set afterwards
+        for quarter, profile in enumerate(profiles):
+            day = self.since + timedelta(days=quarter * 91)
+            profile.created_at = datetime.combine(day, day_time(8), tzinfo=timezone.utc)
+        Profile.objects.bulk_update(profiles, ["created_at"])
+
+    def seed_programs(self, user, exercises, rng):
+        programs = ExerciseProgram.objects.bulk_create(
+            ExerciseProgram(user=user, name=name, description=f"{name} block")
+            for name in ["Strength", "Hypertrophy"]
+        )
+        ProgramExercise.objects.bulk_create(
+            ProgramExercise(
+                program=program,
+                exercise=exercise,
+                order=order,
+                default_sets=rng.randint(3, 5),
+                default_reps=rng.randint(5, 12),
+                default_rest_time=rng.choice([60, 90, 120]),
+            )
+            for program in programs
+            for order, exercise in enumerate(
+                rng.sample(exercises, min(5, len(exercises))), start=1
+            )
+        )
+        return programs
+
+    def training_days(self, rng):
+        per_week = min(7, self.options["sessions_per_week"])
+        days = []
+        week = self.since
+        while week <= self.until:
+            for offset in sorted(rng.sample(range(7), per_week)):
+                day = week + timedelta(days=offset)
+                if day <= self.until:
+                    days.append(day)
+            week += timedelta(days=7)
+        return days
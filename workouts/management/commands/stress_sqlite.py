@@ -0,0 +1,187 @@
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from exercises.models import Exercise
+from workouts.models import TrainingSession, WorkoutLog
+
+
+# (name, ENGINE); both get the same OPTIONS-free settings otherwise
+BACKENDS = [
+    ("stock", "django.db.backends.sqlite3"),
+    ("tuned", "TMN.sqlite"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a scratch SQLite database with concurrent log posts (a read, "
+        "then a session and its logs in one transaction) and readers, once "
+        "with the stock backend and once with TMN.sqlite, and compare "
+        "committed posts per second, lock errors and write latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5.0, help="Per backend")
+        parser.add_argument("--logs-per-post", type=int, default=4)
+
+    def handle(self, *args, **options):
+        directory = Path(tempfile.mkdtemp(prefix="stress-sqlite-"))
+        self.aliases = []
+        try:
+            template = directory / "template.sqlite3"
+            user_ids, exercise_ids = self.prepare(template, options)
+            results = {}
+            for name, engine in BACKENDS:
+                path = directory / f"{name}.sqlite3"
+                shutil.copy(template, path)
+                alias = self.register(f"stress_{name}", engine, path)
+                results[name] = self.run(alias, user_ids, exercise_ids, options)
+        finally:
+            for alias in self.aliases:
+                connections[alias].close()
+                del connections[alias]
+                del connections.settings[alias]
+            shutil.rmtree(directory, ignore_errors=True)
+        self.report(results, options)
+
+    def register(self, alias, engine, path):
+        """A database alias for the scratch file, added for this run only"""
+        settings = dict(connections.settings["default"])
+        settings.update(ENGINE=engine, NAME=str(path), OPTIONS={}, CONN_MAX_AGE=0, TEST={})
+        connections.settings[alias] = settings
+        self.aliases.append(alias)
+        return alias
+
+    def prepare(self, path, options):
+        """Migrate a scratch database and give every writer its own user"""
+        alias = self.register("stress_template", BACKENDS[0][1], path)
+        call_command("migrate", database=alias, verbosity=0)
+        User = get_user_model()
+        users = User.objects.using(alias).bulk_create(
+            User(username=f"stress{number}", email=f"stress{number}@example.com")
+            for number in range(options["writers"])
+        )
+        exercises = Exercise.objects.using(alias).bulk_create(
+            Exercise(user=user, name=f"Lift {number}", category="Legs")
+            for user in users
+            for number in range(options["logs_per_post"])
+        )
+        connections[alias].close()
+        exercise_ids = {}
+        for exercise in exercises:
+            exercise_ids.setdefault(exercise.user_id, []).append(exercise.id)
+        return [user.id for user in users], exercise_ids
+
+    def run(self, alias, user_ids, exercise_ids, options):
+        deadline = time.perf_counter() + options["seconds"]
+        latencies, reads = [], []
+        errors = {"locked": 0}
+        lock = threading.Lock()
+
+        def writer(user_id):
+            day = date(2020, 1, 1)
+            while time.perf_counter() < deadline:
+                day += timedelta(days=1)
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias):
+                        # Like validation in a log post: read, then write
+                        TrainingSession.objects.using(alias).filter(
+                            user_id=user_id, date=day
+                        ).exists()
+                        (session,) = TrainingSession.objects.using(alias).bulk_create(
+                            [TrainingSession(user_id=user_id, date=day, duration=60)]
+                        )
+                        WorkoutLog.objects.using(alias).bulk_create(
+                            WorkoutLog(
+                                session=session,
+                                exercise_id=exercise_id,
+                                sets=3,
+                                reps=8,
+                                weight=100,
+                            )
+                            for exercise_id in exercise_ids[user_id]
+                        )
+                except OperationalError:
+                    with lock:
+                        errors["locked"] += 1
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        def reader(user_id):
+            count = 0
+            while time.perf_counter() < deadline:
+                try:
+                    list(
+                        WorkoutLog.objects.using(alias)
+                        .filter(session__user_id=user_id)
+                        .order_by("-id")[:50]
+                    )
+                except OperationalError:
+                    continue
+                count += 1
+            with lock:
+                reads.append(count)
+
+        def target(work, user_id):
+            try:
+                work(user_id)
+            finally:
+                connections[alias].close()
+
+        threads = [
+            threading.Thread(target=target, args=(writer, user_id)) for user_id in user_ids
+        ]
+        threads += [
+            threading.Thread(target=target, args=(reader, user_ids[number % len(user_ids)]))
+            for number in range(options["readers"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        ordered = sorted(latencies) or [0.0]
+        return {
+            "posts_per_second": len(latencies) / elapsed,
+            "locked": errors["locked"],
+            "reads_per_second": sum(reads) / elapsed,
+            "p50_ms": statistics.median(ordered) * 1000,
+            "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        }
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"{options['writers']} writers, {options['readers']} readers, "
+            f"{options['seconds']:g}s per backend"
+        )
+        self.stdout.write(
+            f"{'backend':>8} {'posts/s':>9} {'locked':>7}"
+            f" {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:>8} {r['posts_per_second']:>9.1f} {r['locked']:>7}"
+                f" {r['reads_per_second']:>9.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+            )
+        stock, tuned = results["stock"], results["tuned"]
+        if stock["posts_per_second"]:
+            self.stdout.write(
+                f"TMN.sqlite commits {tuned['posts_per_second'] / stock['posts_per_second']:.1f}x"
+                " the posts of the stock backend"
+            )
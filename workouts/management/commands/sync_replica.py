@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default SQLite database onto the replica alias with SQLite's "
+        "online backup, once or every --interval seconds. For running with "
+        "two SQLite files locally; server databases replicate by themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=getattr(settings, "REPLICA_DATABASE", None) or "replica",
+            help="The replica alias",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0, help="Repeat every so many seconds"
+        )
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        if alias == DEFAULT_DB_ALIAS or alias not in connections:
+            raise CommandError(f"{alias!r} is not a replica alias in DATABASES")
+        source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if source.vendor != "sqlite" or target.vendor != "sqlite":
+            raise CommandError("sync_replica copies SQLite databases only")
+
+        while True:
+            started = time.perf_counter()
+            source.ensure_connection()
+            target.ensure_connection()
+            # In one step, so readers of the replica see the old or the new copy
+            source.connection.backup(target.connection)
+            self.stdout.write(
+                f"Copied {DEFAULT_DB_ALIAS} to {alias} in "
+                f"{(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:55
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The fold of workouts.rollups as of this migration, kept here so replaying
+# it does not depend on the current code
+
+LOG_ORDERING = ('session__user_id', 'exercise_id', 'session__date', 'session_id', 'id')
+
+
+def summarize_logs(rows, DailyExerciseRollup):
+    """Fold log rows, sorted by LOG_ORDERING, into one unsaved rollup per day"""
+    rollup = None
+    for user_id, exercise_id, day, session_id, _id, sets, reps, weight in rows:
+        if rollup is None or (rollup.user_id, rollup.exercise_id, rollup.date) != (user_id, exercise_id, day):
+            if rollup is not None:
+                rollup.session_count = len(rollup.sessions)
+                yield rollup
+            rollup = DailyExerciseRollup(
+                user_id=user_id,
+                exercise_id=exercise_id,
+                date=day,
+                log_count=0,
+                total_sets=0,
+                total_reps=0,
+                max_weight=None,
+                first_load=None,
+            )
+            rollup.sessions = set()
+        load = Decimal((sets or 0) * (reps or 0)) * (weight or 1)
+        if rollup.first_load is None:
+            rollup.first_load = load
+        rollup.last_load = load
+        rollup.sessions.add(session_id)
+        rollup.log_count += 1
+        rollup.total_sets += sets or 0
+        rollup.total_reps += (sets or 0) * (reps or 0)
+        if weight is not None and (rollup.max_weight is None or weight > rollup.max_weight):
+            rollup.max_weight = weight
+    if rollup is not None:
+        rollup.session_count = len(rollup.sessions)
+        yield rollup
+
+
+def backfill_rollups(apps, schema_editor):
+    WorkoutLog = apps.get_model('workouts', 'WorkoutLog')
+    DailyExerciseRollup = apps.get_model('workouts', 'DailyExerciseRollup')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        WorkoutLog.objects.using(db_alias)
+        .order_by(*LOG_ORDERING)
+        .values_list(*LOG_ORDERING, 'sets', 'reps', 'weight')
+    )
+    DailyExerciseRollup.objects.using(db_alias).bulk_create(
+        summarize_logs(rows.iterator(chunk_size=2000), DailyExerciseRollup),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0001_initial'),
+        ('workouts', '0002_alter_workoutlog_notes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyExerciseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Training day summarised by this row')),
+                ('log_count', models.PositiveIntegerField(default=0)),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('total_sets', models.PositiveIntegerField(default=0)),
+                ('total_reps', models.PositiveIntegerField(default=0, help_text="Sum of sets x reps over the day's logs")),
+                ('max_weight', models.DecimalField(blank=True, decimal_places=2, help_text='Heaviest weight logged that day in kg', max_digits=5, null=True)),
+                ('first_load', models.DecimalField(decimal_places=2, default=0, help_text="sets x reps x weight of the day's first log", max_digits=16)),
+                ('last_load', models.DecimalField(decimal_places=2, default=0, help_text="sets x reps x weight of the day's last log", max_digits=16)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='exercises.exercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_exercise_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Exercise Rollup',
+                'verbose_name_plural': 'Daily Exercise Rollups',
+                'ordering': ['date'],
+                'unique_together': {('user', 'exercise', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
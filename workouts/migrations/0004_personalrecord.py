@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0001_initial'),
+        ('workouts', '0003_dailyexerciserollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_type', models.CharField(choices=[('max_weight', 'Heaviest weight'), ('best_set_volume', 'Best set volume (reps x weight)'), ('best_estimated_1rm', 'Best estimated 1RM (Epley)'), ('best_session_volume', 'Best session volume (sets x reps x weight)')], max_length=32)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('achieved_on', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='exercises.exercise')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='personal_records', to='workouts.trainingsession')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to=settings.AUTH_USER_MODEL)),
+                ('workout_log', models.ForeignKey(blank=True, help_text='Log that set the record (empty for session volume)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='personal_records', to='workouts.workoutlog')),
+            ],
+            options={
+                'verbose_name': 'Personal Record',
+                'verbose_name_plural': 'Personal Records',
+                'ordering': ['exercise', 'record_type'],
+                'unique_together': {('user', 'exercise', 'record_type')},
+            },
+        ),
+    ]
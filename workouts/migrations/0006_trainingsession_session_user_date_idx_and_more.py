@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0002_exercise_exercise_user_name_idx'),
+        ('programs', '0003_programexercise_program_exercise_order_idx'),
+        ('workouts', '0005_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trainingsession',
+            index=models.Index(fields=['user', 'date', 'created_at'], name='session_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutlog',
+            index=models.Index(fields=['exercise', 'session'], name='log_exercise_session_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
 from accounts.models import User
 from programs.models import ExerciseProgram, Exercise
 
@@ -29,6 +30,11 @@ class TrainingSession(models.Model):
         verbose_name = 'Training Session'
         verbose_name_plural = 'Training Sessions'
         ordering = ['-date', '-created_at']
+        indexes = [
+            # The user's sessions by day: session lists, date lookups and joins
+            # from logs ordered by session date
+            models.Index(fields=['user', 'date', 'created_at'], name='session_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s session on {self.date}"
@@ -68,6 +74,141 @@ class WorkoutLog(models.Model):
         verbose_name = 'Workout Log'
         verbose_name_plural = 'Workout Logs'
         ordering = ['session', 'id']
+        indexes = [
+            # An exercise's history (records, analytics) joined to its sessions
+            models.Index(fields=['exercise', 'session'], name='log_exercise_session_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.exercise.name} in session {self.session.id}"
\ No newline at end of file
+        return f"{self.exercise.name} in session {self.session.id}"
+
+
+class DailyExerciseRollup(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='daily_exercise_rollups'
+    )
+    exercise = models.ForeignKey(
+        Exercise,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups'
+    )
+    date = models.DateField(help_text="Training day summarised by this row")
+    log_count = models.PositiveIntegerField(default=0)
+    session_count = models.PositiveIntegerField(default=0)
+    total_sets = models.PositiveIntegerField(default=0)
+    total_reps = models.PositiveIntegerField(
+        default=0,
+        help_text="Sum of sets x reps over the day's logs"
+    )
+    max_weight = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Heaviest weight logged that day in kg"
+    )
+    first_load = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        help_text="sets x reps x weight of the day's first log"
+    )
+    last_load = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        help_text="sets x reps x weight of the day's last log"
+    )
+
+    class Meta:
+        verbose_name = 'Daily Exercise Rollup'
+        verbose_name_plural = 'Daily Exercise Rollups'
+        ordering = ['date']
+        unique_together = ['user', 'exercise', 'date']
+
+    def __str__(self):
+        return f"{self.exercise_id} on {self.date} for user {self.user_id}"
+
+
+class PersonalRecord(models.Model):
+    MAX_WEIGHT = 'max_weight'
+    BEST_SET_VOLUME = 'best_set_volume'
+    BEST_ESTIMATED_1RM = 'best_estimated_1rm'
+    BEST_SESSION_VOLUME = 'best_session_volume'
+    RECORD_TYPES = [
+        (MAX_WEIGHT, 'Heaviest weight'),
+        (BEST_SET_VOLUME, 'Best set volume (reps x weight)'),
+        (BEST_ESTIMATED_1RM, 'Best estimated 1RM (Epley)'),
+        (BEST_SESSION_VOLUME, 'Best session volume (sets x reps x weight)'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='personal_records'
+    )
+    exercise = models.ForeignKey(
+        Exercise,
+        on_delete=models.CASCADE,
+        related_name='personal_records'
+    )
+    record_type = models.CharField(max_length=32, choices=RECORD_TYPES)
+    value = models.DecimalField(max_digits=16, decimal_places=2)
+    workout_log = models.ForeignKey(
+        WorkoutLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='personal_records',
+        help_text="Log that set the record (empty for session volume)"
+    )
+    session = models.ForeignKey(
+        TrainingSession,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='personal_records'
+    )
+    achieved_on = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Personal Record'
+        verbose_name_plural = 'Personal Records'
+        ordering = ['exercise', 'record_type']
+        unique_together = ['user', 'exercise', 'record_type']
+
+    def __str__(self):
+        return f"{self.get_record_type_display()} of {self.value} on {self.achieved_on}"
+
+
+class IdempotencyKey(models.Model):
+    """Response of a non-idempotent request sent with an ``Idempotency-Key``
+    header, replayed when the client retries with the same key"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    request_path = models.CharField(max_length=255)
+    request_hash = models.CharField(
+        max_length=64, default='', help_text='SHA-256 of the request body'
+    )
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        unique_together = ['user', 'key']
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} for {self.request_path}"
@@ -1,24 +1,27 @@
 from rest_framework import permissions
 
+from TMN.identity import identity_map
+
+
 class IsSessionOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # For TrainingSession objects
-        if hasattr(obj, 'user'):
-            return obj.user == request.user
+        if hasattr(obj, 'user_id'):
+            return obj.user_id == request.user.pk
         # For WorkoutLog objects - check through session
-        elif hasattr(obj, 'session'):
-            return obj.session.user == request.user
+        elif hasattr(obj, 'session_id'):
+            return obj.session.user_id == request.user.pk
         return False
 
 class CanLogExercise(permissions.BasePermission):
     def has_permission(self, request, view):
-        if request.method == "POST":
+        # Batches (lists) are checked by WorkoutLogListSerializer, which only
+        # resolves the user's own sessions
+        if request.method == "POST" and hasattr(request.data, "get"):
             session_id = request.data.get("session")
             if session_id:
                 from .models import TrainingSession
-                try:
-                    session = TrainingSession.objects.get(pk=session_id)
-                    return session.user == request.user
-                except TrainingSession.DoesNotExist:
-                    return False
-        return True
\ No newline at end of file
+                # The serializer's session field reuses the instance
+                session = identity_map(request).get(TrainingSession, session_id)
+                return session is not None and session.user_id == request.user.pk
+        return True
@@ -0,0 +1,255 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import router, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, FloatField, Q, Sum, When
+
+from TMN.shards import user_groups
+from .models import PersonalRecord, WorkoutLog
+
+
+CENT = Decimal("0.01")
+
+PER_LOG_RECORDS = [
+    PersonalRecord.MAX_WEIGHT,
+    PersonalRecord.BEST_SET_VOLUME,
+    PersonalRecord.BEST_ESTIMATED_1RM,
+]
+RECORD_TYPES = PER_LOG_RECORDS + [PersonalRecord.BEST_SESSION_VOLUME]
+
+# SQL ranking of a single log for each per-log record type. Values are always
+# recomputed in Python from the winning row, so both paths round identically.
+RANKINGS = {
+    PersonalRecord.MAX_WEIGHT: F("weight"),
+    PersonalRecord.BEST_SET_VOLUME: ExpressionWrapper(
+        F("reps") * F("weight"), output_field=FloatField()
+    ),
+    PersonalRecord.BEST_ESTIMATED_1RM: Case(
+        When(reps=1, then=ExpressionWrapper(F("weight") * 1.0, output_field=FloatField())),
+        default=ExpressionWrapper(
+            F("weight") * (1 + F("reps") / 30.0), output_field=FloatField()
+        ),
+        output_field=FloatField(),
+    ),
+}
+
+SESSION_VOLUME = Sum(
+    F("sets") * F("reps") * F("weight"),
+    output_field=DecimalField(max_digits=16, decimal_places=2),
+)
+
+
+def _quantize(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def log_record_values(reps, weight):
+    """Per-log record values of one log; unweighted logs set no records"""
+    if not weight:
+        return {}
+    weight = Decimal(weight)
+    estimated_1rm = weight if reps == 1 else weight * (1 + Decimal(reps) / 30)
+    return {
+        PersonalRecord.MAX_WEIGHT: _quantize(weight),
+        PersonalRecord.BEST_SET_VOLUME: _quantize(reps * weight),
+        PersonalRecord.BEST_ESTIMATED_1RM: _quantize(estimated_1rm),
+    }
+
+
+def _weighted_logs(user_id, exercise_id):
+    return WorkoutLog.objects.filter(
+        session__user_id=user_id, exercise_id=exercise_id, weight__gt=0
+    )
+
+
+def session_volume(session_id, exercise_id):
+    volume = (
+        WorkoutLog.objects.filter(session_id=session_id, exercise_id=exercise_id, weight__gt=0)
+        .aggregate(volume=SESSION_VOLUME)["volume"]
+    )
+    return _quantize(volume) if volume else None
+
+
+def recompute_record(user_id, exercise_id, record_type):
+    """Rebuild one record from the full history, or drop it if nothing qualifies"""
+    logs = _weighted_logs(user_id, exercise_id)
+    if record_type == PersonalRecord.BEST_SESSION_VOLUME:
+        best = (
+            logs.values("session_id", "session__date")
+            .annotate(volume=SESSION_VOLUME)
+            .order_by("-volume", "session__date", "session_id")
+            .first()
+        )
+        if best is not None:
+            defaults = {
+                "value": _quantize(best["volume"]),
+                "workout_log": None,
+                "session_id": best["session_id"],
+                "achieved_on": best["session__date"],
+            }
+    else:
+        best = (
+            logs.annotate(rank=RANKINGS[record_type])
+            .select_related("session")
+            .order_by("-rank", "session__date", "id")
+            .first()
+        )
+        if best is not None:
+            defaults = {
+                "value": log_record_values(best.reps, best.weight)[record_type],
+                "workout_log": best,
+                "session_id": best.session_id,
+                "achieved_on": best.session.date,
+            }
+
+    if best is None:
+        PersonalRecord.objects.filter(
+            user_id=user_id, exercise_id=exercise_id, record_type=record_type
+        ).delete()
+        return None
+    record, _ = PersonalRecord.objects.update_or_create(
+        user_id=user_id,
+        exercise_id=exercise_id,
+        record_type=record_type,
+        defaults=defaults,
+    )
+    return record
+
+
+def update_records_for_log(log, previous_state=None):
+    """Apply a saved log to its exercise's records and return the new PR types"""
+    return update_records_for_logs([log], [previous_state])[log.pk]
+
+
+def update_records_for_logs(logs, previous_states=None):
+    """Apply saved logs (with their sessions loaded) to the records in a fixed
+    number of queries; returns {log pk: [new PR types]}.
+
+    Logs are applied in order, so a log counts as a new record when it beats
+    the records as they stood after the logs before it. A log only beats or
+    keeps existing records, so history is rescanned only when a log
+    previously held a record that no log in the batch beat."""
+    previous_states = previous_states or [None] * len(logs)
+    user_ids = {log.session.user_id for log in logs}
+    exercise_ids = {log.exercise_id for log in logs}
+    records = {
+        (record.user_id, record.exercise_id, record.record_type): record
+        for record in PersonalRecord.objects.filter(
+            user_id__in=user_ids, exercise_id__in=exercise_ids
+        ).order_by()
+    }
+    volumes = {
+        (row["session_id"], row["exercise_id"]): _quantize(row["volume"])
+        for row in WorkoutLog.objects.filter(
+            session_id__in={log.session_id for log in logs},
+            exercise_id__in=exercise_ids,
+            weight__gt=0,
+        )
+        .values("session_id", "exercise_id")
+        .annotate(volume=SESSION_VOLUME)
+        if row["volume"]
+    }
+
+    new_records = {log.pk: [] for log in logs}
+    winners = {}
+    lost = set()
+    moved = set()
+    for log, previous_state in zip(logs, previous_states):
+        session = log.session
+        candidates = log_record_values(log.reps, log.weight)
+        candidates[PersonalRecord.BEST_SESSION_VOLUME] = volumes.get(
+            (log.session_id, log.exercise_id)
+        )
+        previous_session_id = previous_state.session_id if previous_state else None
+
+        for record_type in RECORD_TYPES:
+            key = (session.user_id, log.exercise_id, record_type)
+            record = records.get(key)
+            candidate = candidates.get(record_type)
+            if record_type == PersonalRecord.BEST_SESSION_VOLUME:
+                holds = record is not None and record.session_id in (
+                    log.session_id,
+                    previous_session_id,
+                )
+            else:
+                holds = record is not None and record.workout_log_id == log.pk
+
+            if candidate is not None and (record is None or candidate > record.value):
+                records[key] = winners[key] = PersonalRecord(
+                    user_id=session.user_id,
+                    exercise_id=log.exercise_id,
+                    record_type=record_type,
+                    value=candidate,
+                    workout_log=None if record_type == PersonalRecord.BEST_SESSION_VOLUME else log,
+                    session_id=log.session_id,
+                    achieved_on=session.date,
+                )
+                new_records[log.pk].append(record_type)
+            elif holds:
+                lost.add(key)
+
+        # A log moved to another exercise (or user) may have held records there
+        if previous_state and (previous_state.user_id, previous_state.exercise_id) != (
+            session.user_id,
+            log.exercise_id,
+        ):
+            moved.add((previous_state.user_id, previous_state.exercise_id))
+
+    with transaction.atomic(using=router.db_for_write(PersonalRecord)):
+        if winners:
+            PersonalRecord.objects.bulk_create(
+                winners.values(),
+                update_conflicts=True,
+                unique_fields=["user", "exercise", "record_type"],
+                update_fields=["value", "workout_log", "session", "achieved_on", "updated_at"],
+            )
+        for user_id, exercise_id, record_type in lost - winners.keys():
+            recompute_record(user_id, exercise_id, record_type)
+        if moved:
+            refresh_personal_records(moved)
+    return new_records
+
+
+def held_records(log):
+    """Record types the log holds, directly or through its session's volume"""
+    return list(
+        PersonalRecord.objects.filter(
+            Q(workout_log_id=log.pk)
+            | Q(
+                session_id=log.session_id,
+                exercise_id=log.exercise_id,
+                record_type=PersonalRecord.BEST_SESSION_VOLUME,
+            )
+        ).values_list("user_id", "exercise_id", "record_type")
+    )
+
+
+def refresh_personal_records(pairs):
+    """Recompute every record type for the given (user_id, exercise_id) pairs"""
+    with transaction.atomic(using=router.db_for_write(PersonalRecord)):
+        for user_id, exercise_id in pairs:
+            for record_type in RECORD_TYPES:
+                recompute_record(user_id, exercise_id, record_type)
+
+
+def rebuild_personal_records(user_ids=None):
+    """Drop and recompute all records (optionally only for some users), one
+    shard at a time when sharded"""
+    return sum(_rebuild_personal_records(group) for group in user_groups(user_ids))
+
+
+def _rebuild_personal_records(user_ids):
+    logs = WorkoutLog.objects.all()
+    records = PersonalRecord.objects.all()
+    if user_ids is not None:
+        logs = logs.filter(session__user_id__in=user_ids)
+        records = records.filter(user_id__in=user_ids)
+    pairs = set(logs.values_list("session__user_id", "exercise_id").distinct())
+    with transaction.atomic(using=router.db_for_write(PersonalRecord)):
+        records.delete()
+        refresh_personal_records(pairs)
+    return len(pairs)
+
+
+def new_record_flags(log):
+    new_records = getattr(log, "_new_records", [])
+    return {record_type: record_type in new_records for record_type in RECORD_TYPES}
@@ -0,0 +1,204 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+from django.db import router, transaction
+from django.db.models import Q
+
+from TMN.shards import user_groups
+from .bulk import db_decimal, insert_rows
+from .models import DailyExerciseRollup, WorkoutLog
+
+
+RollupKey = namedtuple("RollupKey", ["user_id", "exercise_id", "date"])
+
+ROLLUP_FIELDS = [
+    "log_count",
+    "session_count",
+    "total_sets",
+    "total_reps",
+    "max_weight",
+    "first_load",
+    "last_load",
+]
+
+ROLLUP_COLUMNS = ["user", "exercise", "date", *ROLLUP_FIELDS]
+
+REFRESH_BATCH_SIZE = 200
+
+# Rows are read in this order so the first/last log of a day is deterministic
+LOG_ORDERING = ("session__user_id", "exercise_id", "session__date", "session_id", "id")
+LOG_COLUMNS = LOG_ORDERING + ("sets", "reps", "weight")
+
+
+def _as_date(value):
+    # Unsaved/un-refreshed instances may still carry the raw "YYYY-MM-DD" string
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def log_load(sets, reps, weight):
+    """Training load of a single log, counting a missing weight as bodyweight (1)"""
+    return Decimal((sets or 0) * (reps or 0)) * (weight or 1)
+
+
+class _DayAccumulator:
+    def __init__(self, key):
+        self.key = key
+        self.sessions = set()
+        self.log_count = 0
+        self.total_sets = 0
+        self.total_reps = 0
+        self.max_weight = None
+        self.first_load = None
+        self.last_load = None
+
+    def add(self, session_id, sets, reps, weight):
+        load = log_load(sets, reps, weight)
+        if self.first_load is None:
+            self.first_load = load
+        self.last_load = load
+        self.sessions.add(session_id)
+        self.log_count += 1
+        self.total_sets += sets or 0
+        self.total_reps += (sets or 0) * (reps or 0)
+        if weight is not None and (self.max_weight is None or weight > self.max_weight):
+            self.max_weight = weight
+
+    def as_row(self):
+        """Database-ready values in ROLLUP_COLUMNS order, for insert_rows()"""
+        return (
+            self.key.user_id,
+            self.key.exercise_id,
+            self.key.date.isoformat(),
+            self.log_count,
+            len(self.sessions),
+            self.total_sets,
+            self.total_reps,
+            db_decimal(self.max_weight),
+            db_decimal(self.first_load),
+            db_decimal(self.last_load),
+        )
+
+    def to_model(self):
+        return DailyExerciseRollup(
+            user_id=self.key.user_id,
+            exercise_id=self.key.exercise_id,
+            date=self.key.date,
+            log_count=self.log_count,
+            session_count=len(self.sessions),
+            total_sets=self.total_sets,
+            total_reps=self.total_reps,
+            max_weight=self.max_weight,
+            first_load=self.first_load,
+            last_load=self.last_load,
+        )
+
+
+def _accumulate(rows):
+    current = None
+    for user_id, exercise_id, day, session_id, _id, sets, reps, weight in rows:
+        key = RollupKey(user_id, exercise_id, day)
+        if current is None or current.key != key:
+            if current is not None:
+                yield current
+            current = _DayAccumulator(key)
+        current.add(session_id, sets, reps, weight)
+    if current is not None:
+        yield current
+
+
+def summarize_logs(rows):
+    """Fold (user, exercise, date, session, id, sets, reps, weight) rows,
+    sorted by LOG_ORDERING, into unsaved DailyExerciseRollup instances."""
+    for day in _accumulate(rows):
+        yield day.to_model()
+
+
+def upsert_rollups(rollups, batch_size=None):
+    return DailyExerciseRollup.objects.bulk_create(
+        rollups,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["user", "exercise", "date"],
+        update_fields=ROLLUP_FIELDS,
+    )
+
+
+def refresh_daily_rollups(keys):
+    """Recompute the rollup rows for the given (user_id, exercise_id, date) keys
+    from the raw logs of those days only."""
+    keys = sorted(
+        {
+            RollupKey(user_id, exercise_id, _as_date(day))
+            for user_id, exercise_id, day in keys
+            if None not in (user_id, exercise_id, day)
+        }
+    )
+    with transaction.atomic(using=router.db_for_write(DailyExerciseRollup)):
+        # Bounded batches keep the OR-ed filter under SQLite's expression depth
+        for start in range(0, len(keys), REFRESH_BATCH_SIZE):
+            _refresh_batch(set(keys[start : start + REFRESH_BATCH_SIZE]))
+
+
+def _refresh_batch(keys):
+    day_filter = Q()
+    for key in keys:
+        day_filter |= Q(
+            session__user_id=key.user_id,
+            exercise_id=key.exercise_id,
+            session__date=key.date,
+        )
+
+    rows = (
+        WorkoutLog.objects.filter(day_filter)
+        .order_by(*LOG_ORDERING)
+        .values_list(*LOG_COLUMNS)
+    )
+    rollups = list(summarize_logs(rows))
+    upsert_rollups(rollups)
+
+    emptied = keys - {RollupKey(r.user_id, r.exercise_id, r.date) for r in rollups}
+    if emptied:
+        stale = Q()
+        for key in emptied:
+            stale |= Q(user_id=key.user_id, exercise_id=key.exercise_id, date=key.date)
+        DailyExerciseRollup.objects.filter(stale).delete()
+
+
+def rebuild_daily_rollups(user_ids=None, chunk_size=2000, since=None, until=None):
+    """Drop and recompute rollup rows, optionally only for some users and/or
+    an inclusive date range.
+
+    Logs are streamed in key order, so memory use does not grow with history,
+    and shards are rebuilt one at a time. Returns the number of rollup rows
+    written."""
+    return sum(
+        _rebuild_daily_rollups(group, chunk_size, since, until) for group in user_groups(user_ids)
+    )
+
+
+def _rebuild_daily_rollups(user_ids, chunk_size, since, until):
+    logs = WorkoutLog.objects.all()
+    rollups = DailyExerciseRollup.objects.all()
+    if user_ids is not None:
+        logs = logs.filter(session__user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+    if since is not None:
+        logs = logs.filter(session__date__gte=since)
+        rollups = rollups.filter(date__gte=since)
+    if until is not None:
+        logs = logs.filter(session__date__lte=until)
+        rollups = rollups.filter(date__lte=until)
+
+    written = 0
+    with transaction.atomic(using=router.db_for_write(DailyExerciseRollup)):
+        rollups.delete()
+        rows = logs.order_by(*LOG_ORDERING).values_list(*LOG_COLUMNS)
+        days = _accumulate(rows.iterator(chunk_size=chunk_size))
+        # The table was just cleared for this scope, so plain inserts suffice
+        while batch := [day.as_row() for day in islice(days, chunk_size)]:
+            written += insert_rows(DailyExerciseRollup, ROLLUP_COLUMNS, batch)
+    return written
@@ -1,11 +1,17 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import TrainingSession, WorkoutLog
+from TMN.fieldsets import SparseFieldsetSerializerMixin
+from TMN.identity import IdentityMapRelatedField
+from .models import TrainingSession, WorkoutLog, PersonalRecord
 from programs.models import ExerciseProgram
+from programs.serializers import ExerciseProgramSerializer, ProgramExerciseReadSerializer
+from exercises.serializers import ExerciseSerializer
 from accounts.models import User
 from exercises.models import Exercise
+from .signals import log_state, sync_log_writes
 
 
-class TrainingSessionSerializer(serializers.ModelSerializer):
+class TrainingSessionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     program_name = serializers.CharField(source="program.name", read_only=True)
     user = serializers.CharField(source="user.username", read_only=True)
 
@@ -28,8 +34,34 @@ class TrainingSessionSerializer(serializers.ModelSerializer):
             validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
 
+    def required_paths(self):
+        columns, relations = super().required_paths()
+        if "program" in self.context.get("include", ()):
+            relations.add("program")
+        return columns, relations
+
+    def to_representation(self, instance):
+        """Adds the related data asked for with ?include= (context["include"]);
+        the view prefetches it, see workouts/includes.py"""
+        data = super().to_representation(instance)
+        include = self.context.get("include", ())
+        if "logs" in include:
+            data["logs"] = IncludedWorkoutLogSerializer(
+                instance.workout_logs.all(), many=True, context=self.context
+            ).data
+        if "program" in include:
+            program = instance.program
+            data["program_detail"] = None
+            if program is not None:
+                data["program_detail"] = ExerciseProgramSerializer(program).data
+                if "program.exercises" in include:
+                    data["program_detail"]["exercises"] = ProgramExerciseReadSerializer(
+                        program.program_exercises.all(), many=True
+                    ).data
+        return data
+
 
-class WorkoutLogSerializer(serializers.ModelSerializer):
+class WorkoutLogSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     session_id = serializers.CharField(source="session.id", read_only=True)
     exercise_name = serializers.CharField(source="exercise.name", read_only=True)
     volume = serializers.SerializerMethodField()
@@ -50,20 +82,123 @@ class WorkoutLogSerializer(serializers.ModelSerializer):
             "notes",
         ]
         read_only_fields = ["id", "volume", "exercise"]  # Make 'exercise' read-only
+        field_columns = {"volume": ["sets", "reps", "weight"], "notes": ["notes"]}
 
     def get_volume(self, obj):
+        if obj.weight is None:
+            return None
         return obj.sets * obj.reps * obj.weight
 
     def get_notes(self, obj):
         return obj.notes if obj.notes else ""
 
 
+class IncludedWorkoutLogSerializer(WorkoutLogSerializer):
+    """A session's log inside ?include=logs, with the whole exercise on
+    ?include=logs.exercise"""
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if "logs.exercise" in self.context.get("include", ()):
+            data["exercise_detail"] = ExerciseSerializer(instance.exercise).data
+        return data
+
+
+
+class PrefetchedPrimaryKeyRelatedField(IdentityMapRelatedField):
+    """Resolves pks from the {pk: instance} map a list serializer loaded for
+    the whole batch (see WorkoutLogListSerializer), and falls back to the
+    request's identity map when used on its own."""
+
+    def to_internal_value(self, data):
+        prefetched = getattr(self.parent, "prefetched", None)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return prefetched[self.field_name][int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class WorkoutLogListSerializer(serializers.ListSerializer):
+    """Validates and writes a batch of logs in a fixed number of queries.
+
+    The user's sessions and exercises referenced by the batch are loaded once
+    up front, rows are written with bulk_create/bulk_update, and the rollups,
+    personal records and analytics cache are refreshed once for the batch.
+    For updates every item carries the ``id`` of one of ``instance``."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._prefetch([item for item in data if isinstance(item, dict)])
+        self._matched = []
+        return super().to_internal_value(data)
+
+    def _prefetch(self, items):
+        user = self.context["request"].user
+        session_ids, exercise_ids = set(), set()
+        for item in items:
+            for name, ids in (("session", session_ids), ("exercise", exercise_ids)):
+                if isinstance(item.get(name), (int, str)) and str(item[name]).isdigit():
+                    ids.add(int(item[name]))
+        if self.instance is not None:
+            self.instances = {log.pk: log for log in self.instance}
+            for log in self.instances.values():
+                session_ids.add(log.session_id)
+                exercise_ids.add(log.exercise_id)
+        self.child.prefetched = {
+            "session": TrainingSession.objects.filter(user=user).in_bulk(session_ids),
+            "exercise": Exercise.objects.filter(user=user).in_bulk(exercise_ids),
+        }
+
+    @staticmethod
+    def _coerce_id(data):
+        """The item's ``id`` as a pk value, so ``"5"`` finds log 5"""
+        try:
+            return WorkoutLog._meta.pk.to_python(data.get("id"))
+        except DjangoValidationError:
+            return None
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            log = self.instances.get(self._coerce_id(data)) if isinstance(data, dict) else None
+            if log is None:
+                raise serializers.ValidationError({"id": ["Unknown workout log."]})
+            # Let the child validate the item against the log's current values
+            self.child.instance = log
+            self.child.initial_data = data
+            self._matched.append(log)
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        logs = WorkoutLog.objects.bulk_create(
+            [WorkoutLog(**attrs) for attrs in validated_data]
+        )
+        sync_log_writes(logs)
+        return logs
+
+    def update(self, instances, validated_data):
+        previous_states = [log_state(log) for log in self._matched]
+        fields = set()
+        for log, attrs in zip(self._matched, validated_data):
+            for name, value in attrs.items():
+                setattr(log, name, value)
+            fields.update(attrs)
+        if fields:
+            WorkoutLog.objects.bulk_update(self._matched, sorted(fields))
+        sync_log_writes(self._matched, previous_states)
+        return self._matched
+
 
 class WorkoutLogCreateUpdateSerializer(serializers.ModelSerializer):
-    exercise = serializers.PrimaryKeyRelatedField(
+    exercise = PrefetchedPrimaryKeyRelatedField(
         queryset=Exercise.objects.all(), required=True
     )
-    session = serializers.PrimaryKeyRelatedField(
+    session = PrefetchedPrimaryKeyRelatedField(
         queryset=TrainingSession.objects.all(), required=True
     )
 
@@ -74,12 +209,12 @@ class WorkoutLogCreateUpdateSerializer(serializers.ModelSerializer):
             "rest_time": {"required": False, "allow_null": True},
             "notes": {"required": False, "allow_null": True},
         }
+        list_serializer_class = WorkoutLogListSerializer
 
     def validate(self, data):
-        session_user = data["session"].user
-        exercise_user = data["exercise"].user
-
-        if session_user != exercise_user:
+        session = data.get("session") or self.instance.session
+        exercise = data.get("exercise") or self.instance.exercise
+        if session.user_id != exercise.user_id:
             raise serializers.ValidationError(
                 "You can only log exercises for your own sessions."
             )
@@ -92,3 +227,21 @@ class WorkoutLogCreateUpdateSerializer(serializers.ModelSerializer):
         if "notes" in data and data["notes"] == "":
             data["notes"] = None
         return super().to_internal_value(data)
+
+
+class PersonalRecordSerializer(serializers.ModelSerializer):
+    exercise_name = serializers.CharField(source="exercise.name", read_only=True)
+
+    class Meta:
+        model = PersonalRecord
+        fields = [
+            "id",
+            "exercise",
+            "exercise_name",
+            "record_type",
+            "value",
+            "achieved_on",
+            "session",
+            "workout_log",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,189 @@
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from TMN.conditional import bump_watermarks
+from accounts.cache import bump_data_version
+from .models import PersonalRecord, TrainingSession, WorkoutLog
+from .records import (
+    held_records,
+    recompute_record,
+    refresh_personal_records,
+    update_records_for_log,
+    update_records_for_logs,
+)
+from .rollups import RollupKey, refresh_daily_rollups
+
+
+LogState = namedtuple("LogState", ["user_id", "exercise_id", "date", "session_id"])
+
+
+def _rollup_key(log):
+    session = log.session
+    return RollupKey(session.user_id, log.exercise_id, session.date)
+
+
+def log_state(log):
+    session = log.session
+    return LogState(session.user_id, log.exercise_id, session.date, log.session_id)
+
+
+def _model_of(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def deleted_with_parent(origin):
+    """Whether a log is deleted along with its session, exercise or user
+    (``origin``, the object or queryset whose delete() cascaded to it). Their
+    receivers then handle all of its logs at once, so the log's own skip."""
+    return origin is not None and _model_of(origin) is not WorkoutLog
+
+
+def sync_log_writes(logs, previous_states=None):
+    """Do for logs written with bulk_create/bulk_update, which send no signals,
+    what the receivers below do per save: refresh the affected rollup days,
+    apply the logs to the personal records (leaving ``_new_records`` on each
+    log) and, once the write commits, invalidate the owners' analytics and
+    move their watermarks. Logs need their sessions loaded."""
+    if not logs:
+        return
+    keys = {_rollup_key(log) for log in logs}
+    keys.update(RollupKey(*state[:3]) for state in previous_states or [] if state)
+    refresh_daily_rollups(keys)
+    new_records = update_records_for_logs(logs, previous_states)
+    for log in logs:
+        log._new_records = new_records[log.pk]
+    using = logs[0]._state.db
+    user_ids = {key.user_id for key in keys}
+
+    def bump():
+        for user_id in user_ids:
+            bump_data_version(user_id, using=using)
+            bump_watermarks(user_id, "logs", using=using)
+
+    transaction.on_commit(bump, using=using)
+
+
+@receiver(pre_save, sender=WorkoutLog)
+def remember_log_state(sender, instance, raw=False, **kwargs):
+    """Keep where a log was before an update so that day and its records can be refreshed too"""
+    instance._previous_state = None
+    instance._previous_rollup_key = None
+    if raw or instance.pk is None:
+        return
+    previous = (
+        WorkoutLog.objects.filter(pk=instance.pk)
+        .values_list("session__user_id", "exercise_id", "session__date", "session_id")
+        .first()
+    )
+    if previous:
+        instance._previous_state = LogState(*previous)
+        instance._previous_rollup_key = RollupKey(*previous[:3])
+
+
+@receiver(post_save, sender=WorkoutLog)
+def refresh_rollup_on_log_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {_rollup_key(instance)}
+    previous = getattr(instance, "_previous_rollup_key", None)
+    if previous:
+        keys.add(previous)
+    refresh_daily_rollups(keys)
+
+
+@receiver(post_save, sender=WorkoutLog)
+def update_records_on_log_save(sender, instance, raw=False, **kwargs):
+    """New PR types are left on the instance for the view's response"""
+    if raw:
+        return
+    instance._new_records = update_records_for_log(
+        instance, getattr(instance, "_previous_state", None)
+    )
+
+
+@receiver(pre_delete, sender=WorkoutLog)
+def remember_deleted_log(sender, instance, origin=None, **kwargs):
+    # The record's link to the log is nulled before post_delete, so resolve it now
+    if deleted_with_parent(origin):
+        return
+    instance._previous_rollup_key = _rollup_key(instance)
+    instance._held_records = held_records(instance)
+
+
+@receiver(post_delete, sender=WorkoutLog)
+def refresh_rollup_on_log_delete(sender, instance, origin=None, **kwargs):
+    if not deleted_with_parent(origin):
+        refresh_daily_rollups({instance._previous_rollup_key})
+
+
+@receiver(post_delete, sender=WorkoutLog)
+def recompute_records_on_log_delete(sender, instance, origin=None, **kwargs):
+    """Only records the deleted log held need a rescan of the history"""
+    if deleted_with_parent(origin):
+        return
+    for user_id, exercise_id, record_type in instance._held_records:
+        recompute_record(user_id, exercise_id, record_type)
+
+
+@receiver(pre_delete, sender=TrainingSession)
+def remember_deleted_session(sender, instance, origin=None, **kwargs):
+    """Keep the days and records the session's logs affect, refreshed once
+    it is gone. Its rollups and records are deleted with its user, and those
+    of an exercise with the exercise, so only sessions need this."""
+    instance._deleted_rollup_keys = set()
+    instance._held_records = []
+    if origin is not None and _model_of(origin) is get_user_model():
+        return
+    instance._deleted_rollup_keys = {
+        RollupKey(instance.user_id, exercise_id, instance.date)
+        for exercise_id in instance.workout_logs.values_list("exercise_id", flat=True).distinct()
+    }
+    instance._held_records = list(
+        PersonalRecord.objects.filter(Q(session=instance) | Q(workout_log__session=instance))
+        .values_list("user_id", "exercise_id", "record_type")
+        .distinct()
+    )
+
+
+@receiver(post_delete, sender=TrainingSession)
+def refresh_after_session_delete(sender, instance, **kwargs):
+    if instance._deleted_rollup_keys:
+        refresh_daily_rollups(instance._deleted_rollup_keys)
+    for user_id, exercise_id, record_type in instance._held_records:
+        recompute_record(user_id, exercise_id, record_type)
+
+
+@receiver(pre_save, sender=TrainingSession)
+def remember_session_day(sender, instance, raw=False, **kwargs):
+    instance._previous_day = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_day = (
+        TrainingSession.objects.filter(pk=instance.pk)
+        .values_list("user_id", "date")
+        .first()
+    )
+
+
+@receiver(post_save, sender=TrainingSession)
+def refresh_rollups_on_session_move(sender, instance, created, raw=False, **kwargs):
+    """A session moved to another day (or user) shifts all of its logs with it"""
+    previous = getattr(instance, "_previous_day", None)
+    if raw or created or not previous or previous == (instance.user_id, instance.date):
+        return
+    exercise_ids = set(
+        instance.workout_logs.values_list("exercise_id", flat=True).distinct()
+    )
+    keys = set()
+    for exercise_id in exercise_ids:
+        keys.add(RollupKey(previous[0], exercise_id, previous[1]))
+        keys.add(RollupKey(instance.user_id, exercise_id, instance.date))
+    refresh_daily_rollups(keys)
+    # Ties go to the earliest session, so the move can change who holds a
+    # record even when no value changes
+    refresh_personal_records({(key.user_id, key.exercise_id) for key in keys})
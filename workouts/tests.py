@@ -1,3 +1,1241 @@
-from django.test import TestCase
+import json
+import os
+import re
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, router, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import parse_http_date
+from rest_framework.test import APIClient
+
+from TMN.metrics import registry
+from TMN.pagination import KeysetPagination
+from TMN.shards import ID_RANGE, copy_users, reserve_id_ranges, shard_for, use_user_shard
+from TMN.sqlite.base import DatabaseWrapper
+from accounts.cache import get_cache
+from accounts.models import Profile, User
+from exercises.models import Exercise
+from programs.models import ExerciseProgram, ProgramExercise
+from .importer import import_workouts
+from .models import (
+    DailyExerciseRollup,
+    IdempotencyKey,
+    PersonalRecord,
+    TrainingSession,
+    WorkoutLog,
+)
+
+
+class WorkoutDataMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="lifter", email="lifter@example.com", password="pass1234"
+        )
+        self.exercise = Exercise.objects.create(
+            name="Squat", category="Legs", user=self.user
+        )
+        self.session = TrainingSession.objects.create(
+            user=self.user, date=date(2025, 1, 6), duration=60
+        )
+
+    def log(self, **kwargs):
+        values = {"session": self.session, "exercise": self.exercise, "sets": 3, "reps": 5}
+        values.update(kwargs)
+        return WorkoutLog.objects.create(**values)
+
+
+class DailyExerciseRollupTests(WorkoutDataMixin, TestCase):
+    def rollup(self, day=date(2025, 1, 6)):
+        return DailyExerciseRollup.objects.get(
+            user=self.user, exercise=self.exercise, date=day
+        )
+
+    def test_log_writes_keep_rollup_in_sync(self):
+        first = self.log(weight=Decimal("100"))
+        self.log(sets=5, reps=5, weight=Decimal("80"))
+
+        rollup = self.rollup()
+        self.assertEqual(rollup.log_count, 2)
+        self.assertEqual(rollup.total_sets, 8)
+        self.assertEqual(rollup.total_reps, 40)
+        self.assertEqual(rollup.max_weight, Decimal("100"))
+        self.assertEqual(rollup.first_load, Decimal("1500"))
+        self.assertEqual(rollup.last_load, Decimal("2000"))
+
+        first.weight = Decimal("60")
+        first.save()
+        self.assertEqual(self.rollup().max_weight, Decimal("80"))
+
+        WorkoutLog.objects.all().delete()
+        self.assertFalse(DailyExerciseRollup.objects.exists())
+
+    def test_moving_a_session_moves_its_rollup(self):
+        self.log(weight=Decimal("100"))
+        self.session.date = date(2025, 1, 7)
+        self.session.save()
+
+        self.assertEqual(DailyExerciseRollup.objects.count(), 1)
+        self.assertEqual(self.rollup(date(2025, 1, 7)).log_count, 1)
+
+    def test_rebuild_command_matches_incremental_rows(self):
+        self.log(weight=Decimal("100"))
+        self.log(weight=None)
+        expected = list(DailyExerciseRollup.objects.values())
+
+        DailyExerciseRollup.objects.all().delete()
+        call_command("rebuild_exercise_rollups", stdout=StringIO())
+
+        rebuilt = list(DailyExerciseRollup.objects.values())
+        for row in expected + rebuilt:
+            row.pop("id")
+        self.assertEqual(rebuilt, expected)
+
+
+class PersonalRecordTests(WorkoutDataMixin, TestCase):
+    def records(self):
+        return dict(
+            PersonalRecord.objects.filter(user=self.user).values_list("record_type", "value")
+        )
+
+    def test_records_follow_log_writes(self):
+        first = self.log(sets=3, reps=5, weight=Decimal("100"))
+        self.log(sets=1, reps=1, weight=Decimal("110"))
+
+        self.assertEqual(
+            self.records(),
+            {
+                PersonalRecord.MAX_WEIGHT: Decimal("110.00"),
+                PersonalRecord.BEST_SET_VOLUME: Decimal("500.00"),
+                PersonalRecord.BEST_ESTIMATED_1RM: Decimal("116.67"),
+                PersonalRecord.BEST_SESSION_VOLUME: Decimal("1610.00"),
+            },
+        )
+
+        first.delete()
+        self.assertEqual(
+            self.records(),
+            {
+                PersonalRecord.MAX_WEIGHT: Decimal("110.00"),
+                PersonalRecord.BEST_SET_VOLUME: Decimal("110.00"),
+                PersonalRecord.BEST_ESTIMATED_1RM: Decimal("110.00"),
+                PersonalRecord.BEST_SESSION_VOLUME: Decimal("110.00"),
+            },
+        )
+
+    def test_session_delete_refreshes_once_for_all_its_logs(self):
+        earlier = TrainingSession.objects.create(
+            user=self.user, date=date(2025, 1, 1), duration=60
+        )
+        self.log(session=earlier, sets=3, reps=5, weight=Decimal("90"))
+
+        def delete_session(logs):
+            session = TrainingSession.objects.create(
+                user=self.user, date=date(2025, 1, 8), duration=60
+            )
+            for weight in range(100, 100 + logs):
+                self.log(session=session, weight=Decimal(weight))
+            with CaptureQueriesContext(connection) as queries:
+                session.delete()
+            return len(queries)
+
+        self.assertEqual(delete_session(2), delete_session(10))
+        self.assertEqual(self.records()[PersonalRecord.MAX_WEIGHT], Decimal("90.00"))
+        self.assertFalse(DailyExerciseRollup.objects.filter(date=date(2025, 1, 8)).exists())
+
+    def test_moving_a_session_across_a_tie_matches_a_rebuild(self):
+        self.log(weight=Decimal("100"))
+        later = TrainingSession.objects.create(user=self.user, date=date(2025, 1, 8), duration=60)
+        self.log(session=later, weight=Decimal("100"))
+        later.date = date(2025, 1, 1)
+        later.save()
+
+        fields = ("record_type", "value", "workout_log", "session", "achieved_on")
+        moved = sorted(PersonalRecord.objects.values_list(*fields))
+        self.assertEqual(
+            PersonalRecord.objects.get(record_type=PersonalRecord.MAX_WEIGHT).session, later
+        )
+        call_command("rebuild_personal_records", stdout=StringIO())
+        self.assertEqual(sorted(PersonalRecord.objects.values_list(*fields)), moved)
+
+    def test_create_response_flags_new_records(self):
+        self.log(sets=3, reps=5, weight=Decimal("100"))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {"session": self.session.id, "exercise": self.exercise.id, "sets": 1, "reps": 3}
+
+        heavier = client.post("/api/workouts/logs/", {**payload, "weight": "105"}).json()
+        lighter = client.post("/api/workouts/logs/", {**payload, "weight": "50"}).json()
+
+        self.assertTrue(heavier["new_records"][PersonalRecord.MAX_WEIGHT])
+        self.assertFalse(heavier["new_records"][PersonalRecord.BEST_SET_VOLUME])
+        # Only the session total grew
+        self.assertEqual(
+            [name for name, is_new in lighter["new_records"].items() if is_new],
+            [PersonalRecord.BEST_SESSION_VOLUME],
+        )
+        listed = client.get("/api/workouts/records/").json()
+        self.assertEqual(len(listed), 4)
+        filtered = client.get("/api/workouts/records/", {"exercise_id": self.exercise.id})
+        self.assertEqual(len(filtered.json()), 4)
+        self.assertEqual(
+            client.get("/api/workouts/records/", {"exercise_id": "abc"}).status_code, 400
+        )
+
+
+class WorkoutLogBulkTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.bench = Exercise.objects.create(name="Bench", category="Chest", user=self.user)
+
+    def items(self, count):
+        return [
+            {
+                "session": self.session.id,
+                "exercise": (self.exercise if i % 2 else self.bench).id,
+                "sets": 3,
+                "reps": 5,
+                "weight": str(60 + i),
+            }
+            for i in range(count)
+        ]
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        with self.assertNumQueries(14):
+            small = self.client.post("/api/workouts/logs/", self.items(2), format="json")
+        with self.assertNumQueries(14):
+            large = self.client.post("/api/workouts/logs/bulk/", self.items(20), format="json")
+
+        self.assertEqual((small.status_code, large.status_code), (201, 201))
+        self.assertEqual(len(large.json()), 20)
+        self.assertTrue(large.json()[-1]["new_records"][PersonalRecord.MAX_WEIGHT])
+        rollup = DailyExerciseRollup.objects.get(
+            user=self.user, exercise=self.exercise, date=self.session.date
+        )
+        self.assertEqual((rollup.log_count, rollup.max_weight), (11, Decimal("79")))
+        self.assertEqual(
+            PersonalRecord.objects.get(
+                exercise=self.bench, record_type=PersonalRecord.MAX_WEIGHT
+            ).value,
+            Decimal("78.00"),
+        )
+
+    def test_bulk_update(self):
+        logs = [self.log(weight=Decimal("100")), self.log(weight=Decimal("80"))]
+        response = self.client.patch(
+            "/api/workouts/logs/bulk/",
+            [{"id": logs[0].id, "weight": "90"}, {"id": logs[1].id, "exercise": self.bench.id}],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["exercise_name"] for item in response.json()], ["Squat", "Bench"])
+        records = dict(
+            PersonalRecord.objects.filter(record_type=PersonalRecord.MAX_WEIGHT).values_list(
+                "exercise__name", "value"
+            )
+        )
+        self.assertEqual(records, {"Squat": Decimal("90.00"), "Bench": Decimal("80.00")})
+
+    def test_bulk_update_accepts_string_ids(self):
+        log = self.log(weight=Decimal("100"))
+        response = self.client.patch(
+            "/api/workouts/logs/bulk/", [{"id": str(log.id), "weight": "90"}], format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        log.refresh_from_db()
+        self.assertEqual(log.weight, Decimal("90"))
+        invalid = self.client.patch("/api/workouts/logs/bulk/", [{"id": "abc"}], format="json")
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(invalid.json(), {"id": "Expected integer ids."})
+
+    def test_batch_is_rejected_as_a_whole(self):
+        other = User.objects.create_user(username="other", email="o@example.com", password="x")
+        foreign = TrainingSession.objects.create(user=other, date=date(2025, 1, 6), duration=5)
+        items = self.items(2)
+        items[1]["session"] = foreign.id
+
+        response = self.client.post("/api/workouts/logs/bulk/", items, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn("session", response.json()[1])
+        self.assertFalse(WorkoutLog.objects.exists())
+        unknown = self.client.patch("/api/workouts/logs/bulk/", [{"id": 999}], format="json")
+        self.assertEqual(unknown.json(), [{"id": ["Unknown workout log."]}])
+
+
+
+class CreateProgramLogsTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.bench = Exercise.objects.create(name="Bench", category="Chest", user=self.user)
+        self.program = ExerciseProgram.objects.create(name="Strength", user=self.user)
+        ProgramExercise.objects.create(program=self.program, exercise=self.exercise, order=1)
+        ProgramExercise.objects.create(
+            program=self.program, exercise=self.bench, default_sets=4, default_reps=8, order=2
+        )
+        self.log(sets=5, reps=3, weight=Decimal("120"))
+        self.today = TrainingSession.objects.create(
+            user=self.user, date=date(2025, 1, 9), duration=60, program=self.program
+        )
+        self.url = f"/api/workouts/sessions/{self.today.id}/create_program_logs/"
+
+    def test_logs_are_prefilled_from_the_latest_history(self):
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 201)
+        squat, bench = response.json()["logs"]
+        self.assertEqual((squat["sets"], squat["reps"], squat["weight"]), (5, 3, 120.0))
+        self.assertEqual((bench["sets"], bench["reps"], bench["weight"]), (4, 8, 0))
+        self.assertEqual(
+            DailyExerciseRollup.objects.filter(date=self.today.date).count(), 2
+        )
+
+    def test_retry_with_the_same_key_replays_the_response(self):
+        first = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY="tap-1")
+        again = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY="tap-1")
+
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(self.today.workout_logs.count(), 2)
+
+        other = f"/api/workouts/sessions/{self.session.id}/create_program_logs/"
+        self.assertEqual(self.client.post(other, HTTP_IDEMPOTENCY_KEY="tap-1").status_code, 422)
+        self.client.post(self.url, HTTP_IDEMPOTENCY_KEY="tap-2")
+        self.assertEqual(self.today.workout_logs.count(), 4)
+
+    def test_keys_are_tied_to_the_body_and_expire(self):
+        self.client.post(self.url, {"source": "watch"}, HTTP_IDEMPOTENCY_KEY="tap-1")
+        other = self.client.post(self.url, {"source": "phone"}, HTTP_IDEMPOTENCY_KEY="tap-1")
+        self.assertEqual(other.status_code, 422)
+        self.assertEqual(self.today.workout_logs.count(), 2)
+
+        IdempotencyKey.objects.update(created_at=datetime(2020, 1, 1, tzinfo=timezone.utc))
+        again = self.client.post(self.url, {"source": "watch"}, HTTP_IDEMPOTENCY_KEY="tap-1")
+        self.assertNotIn("Idempotent-Replayed", again)
+        self.assertEqual(self.today.workout_logs.count(), 4)
+
+        IdempotencyKey.objects.update(created_at=datetime(2020, 1, 1, tzinfo=timezone.utc))
+        self.client.post(self.url, HTTP_IDEMPOTENCY_KEY="tap-2")
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Deleted 1 expired", out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["tap-2"])
+
+
+class SessionIncludeTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.program = ExerciseProgram.objects.create(name="Strength", user=self.user)
+        ProgramExercise.objects.create(program=self.program, exercise=self.exercise, order=1)
+        self.add_session(date(2025, 1, 7))
+
+    def add_session(self, day):
+        session = TrainingSession.objects.create(
+            user=self.user, date=day, duration=45, program=self.program
+        )
+        self.log(session=session, weight=Decimal("100"))
+        self.log(session=session, weight=Decimal("105"))
+        return session
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        url = "/api/workouts/sessions/?include=logs.exercise,program.exercises"
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        for day in range(10, 20):
+            self.add_session(date(2025, 1, day))
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+
+        sessions = response.json()["results"]
+        self.assertEqual(len(sessions), 12)
+        self.assertEqual(len(sessions[0]["logs"]), 2)
+        self.assertEqual(sessions[0]["logs"][0]["exercise_detail"]["name"], "Squat")
+        self.assertEqual(sessions[0]["program_detail"]["exercises"][0]["exercise_name"], "Squat")
+        self.assertEqual(sessions[-1]["logs"], [])
+        self.assertIsNone(sessions[-1]["program_detail"])
+
+    def test_detail_includes_only_what_was_asked(self):
+        session = self.add_session(date(2025, 2, 1))
+        body = self.client.get(f"/api/workouts/sessions/{session.id}/", {"include": "logs"}).json()
+
+        self.assertEqual([log["weight"] for log in body["logs"]], ["100.00", "105.00"])
+        self.assertNotIn("exercise_detail", body["logs"][0])
+        self.assertNotIn("program_detail", body)
+        plain = self.client.get(f"/api/workouts/sessions/{session.id}/").json()
+        self.assertNotIn("logs", plain)
+        bad = self.client.get("/api/workouts/sessions/", {"include": "logs,comments"})
+        self.assertEqual(bad.status_code, 400)
+
+
+class KeysetPaginationTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Two sessions on one day interleave their logs' ids
+        same_day = TrainingSession.objects.create(user=self.user, date=self.session.date, duration=5)
+        for session in [same_day, self.session, same_day]:
+            self.log(session=session, weight=Decimal("50"))
+            self.log(session=session, weight=Decimal("60"))
+        earlier = TrainingSession.objects.create(user=self.user, date=date(2024, 12, 1), duration=5)
+        self.log(session=earlier, weight=Decimal("40"))
+
+    def walk(self, url):
+        pages = []
+        while url:
+            body = self.client.get(url).json()
+            pages.append([item["id"] for item in body["results"]])
+            url = body["next"]
+        return pages
+
+    def test_pages_follow_the_list_ordering_both_ways(self):
+        expected = list(
+            WorkoutLog.objects.order_by("session__date", "id").values_list("id", flat=True)
+        )
+        pages = self.walk("/api/workouts/logs/?page_size=3")
+
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        last = self.client.get("/api/workouts/logs/?page_size=3").json()["next"]
+        last = self.client.get(last).json()["next"]
+        previous = self.client.get(last).json()["previous"]
+        back = self.client.get(previous).json()
+        self.assertEqual([item["id"] for item in back["results"]], pages[1])
+        first = self.client.get(back["previous"]).json()
+        self.assertEqual([item["id"] for item in first["results"]], pages[0])
+        self.assertIsNone(first["previous"])
+
+    def test_sessions_page_newest_first_and_bad_cursors_are_rejected(self):
+        body = self.client.get("/api/workouts/sessions/", {"page_size": 2}).json()
+
+        self.assertEqual(
+            [item["date"] for item in body["results"]], ["2025-01-06", "2025-01-06"]
+        )
+        oldest = TrainingSession.objects.get(date=date(2024, 12, 1))
+        self.assertEqual(self.walk(body["next"]), [[oldest.id]])
+        self.assertEqual(
+            self.client.get("/api/workouts/sessions/", {"cursor": "not-a-cursor"}).status_code,
+            404,
+        )
+
+
+class ConditionalGetTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        get_cache().clear()
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.log(weight=Decimal("100"))
+
+    def test_unchanged_list_is_not_modified_without_touching_the_database(self):
+        response = self.client.get("/api/workouts/logs/")
+        etag = response["ETag"]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        with self.assertNumQueries(0):
+            cached = self.client.get("/api/workouts/logs/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], etag)
+        self.assertEqual(cached.content, b"")
+        # Another URL (here another page size) is another representation
+        other = self.client.get("/api/workouts/logs/?page_size=1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other.status_code, 200)
+
+    def test_writes_change_the_validators_of_dependent_endpoints(self):
+        logs = self.client.get("/api/workouts/logs/")
+        sessions = self.client.get("/api/workouts/sessions/")
+        exercises = self.client.get("/api/exercises/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log(weight=Decimal("110"))
+
+        changed = self.client.get("/api/workouts/logs/", HTTP_IF_NONE_MATCH=logs["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()["results"]), 2)
+        self.assertEqual(
+            self.client.get("/api/workouts/sessions/", HTTP_IF_NONE_MATCH=sessions["ETag"]).status_code,
+            200,
+        )
+        self.assertEqual(
+            self.client.get("/api/exercises/", HTTP_IF_NONE_MATCH=exercises["ETag"]).status_code,
+            304,
+        )
+
+    def test_bulk_writes_change_the_validators(self):
+        etag = self.client.get("/api/workouts/logs/")["ETag"]
+        payload = [{"session": self.session.id, "exercise": self.exercise.id, "sets": 3, "reps": 5, "weight": "90"}]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/workouts/logs/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(
+            self.client.get("/api/workouts/logs/", HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_validators_change_when_the_write_commits(self):
+        etag = self.client.get("/api/workouts/logs/")["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.log(weight=Decimal("110"))
+                # Other connections still read the old rows, which the old
+                # validators describe
+                self.assertEqual(
+                    self.client.get("/api/workouts/logs/", HTTP_IF_NONE_MATCH=etag).status_code,
+                    304,
+                )
+        self.assertEqual(
+            self.client.get("/api/workouts/logs/", HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_if_modified_since(self):
+        detail = f"/api/workouts/sessions/{self.session.id}/"
+        written = time.time_ns()
+        clock = mock.patch("TMN.conditional.time.time_ns", return_value=written)
+        with clock:
+            # Until the write's second is over, a later write could share it
+            self.assertNotIn("Last-Modified", self.client.get(detail))
+        clock = mock.patch("TMN.conditional.time.time_ns", return_value=written + 10**9)
+        with clock:
+            last_modified = self.client.get(detail)["Last-Modified"]
+            self.assertEqual(parse_http_date(last_modified), -(-written // 10**9))
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(detail, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(cached.status_code, 304)
+            stale = self.client.get(detail, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2001 00:00:00 GMT")
+            self.assertEqual(stale.status_code, 200)
+            # If-None-Match takes precedence when both are sent
+            mismatch = self.client.get(
+                detail, HTTP_IF_MODIFIED_SINCE=last_modified, HTTP_IF_NONE_MATCH='"other"'
+            )
+            self.assertEqual(mismatch.status_code, 200)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.session.save()
+            changed = self.client.get(detail, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(changed.status_code, 200)
+
+
+@override_settings(API_FAST_LISTS=False)
+class SparseFieldsetTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.program = ExerciseProgram.objects.create(
+            name="Strength", description="Five by five", user=self.user
+        )
+        self.session.program = self.program
+        self.session.notes = "Felt strong"
+        self.session.save()
+        self.squat = self.log(weight=Decimal("100"), notes="Paused reps")
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        # Deferred columns must not be loaded lazily afterwards
+        self.assertEqual(len(queries), 1)
+        return response.json(), queries[0]["sql"]
+
+    def test_fields_trim_the_output_and_the_columns(self):
+        body, sql = self.get("/api/workouts/logs/", fields="id,exercise_name,volume")
+
+        self.assertEqual(
+            body["results"], [{"id": self.squat.id, "exercise_name": "Squat", "volume": 1500.0}]
+        )
+        self.assertNotIn('"notes"', sql)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"rest_time"', sql)
+
+        # Without a fieldset only the related columns nobody reads are left out
+        body, sql = self.get("/api/workouts/logs/")
+        self.assertEqual(body["results"][0]["notes"], "Paused reps")
+        self.assertIn('"workouts_workoutlog"."notes"', sql)
+        self.assertNotIn('"exercises_exercise"."description"', sql)
+        self.assertNotIn('"workouts_trainingsession"."notes"', sql)
+
+    def test_omit_and_includes(self):
+        body, sql = self.get("/api/workouts/sessions/", omit="notes,user")
+        self.assertNotIn("notes", body["results"][0])
+        self.assertNotIn("user", body["results"][0])
+        self.assertNotIn('"notes"', sql)
+        self.assertNotIn('"accounts_user"."username"', sql)
+
+        # An included program is rendered whole, so it is loaded whole
+        body, sql = self.get(
+            f"/api/workouts/sessions/{self.session.id}/", omit="notes", include="program"
+        )
+        self.assertEqual(body["program_detail"]["description"], "Five by five")
+        self.assertIn('"programs_exerciseprogram"."description"', sql)
+
+    def test_other_read_endpoints_and_unknown_fields(self):
+        body, sql = self.get("/api/exercises/", fields="id,name")
+        self.assertEqual(body["results"], [{"id": self.exercise.id, "name": "Squat"}])
+        self.assertNotIn('"description"', sql)
+
+        ProgramExercise.objects.create(program=self.program, exercise=self.exercise, order=1)
+        body, sql = self.get("/api/programs/program-exercises/", fields="exercise_name,order")
+        self.assertEqual(body["results"], [{"order": 1, "exercise_name": "Squat"}])
+        self.assertNotIn('"description"', sql)
+
+        response = self.client.get("/api/workouts/logs/", {"fields": "sets,secret"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["fields"])
+
+
+class WorkoutFastListTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        program = ExerciseProgram.objects.create(name="Strength", user=self.user)
+        bench = Exercise.objects.create(name="Bench", category="Chest", user=self.user)
+        later = TrainingSession.objects.create(
+            user=self.user, date=date(2025, 1, 8), duration=45, program=program, notes="Deload"
+        )
+        self.log(weight=Decimal("33.35"), reps=7, rest_time=90, notes="Belt")
+        self.log(weight=Decimal("102.5"), sets=5, notes="")
+        self.log(session=later, exercise=bench, weight=None, rest_time=None, notes=None)
+        self.log(session=later, exercise=bench, weight=Decimal("999.99"), sets=12, reps=12)
+
+    def pages(self, url):
+        """The raw bodies of every page, with and without the fast path"""
+        bodies = {}
+        for fast in (True, False):
+            with self.settings(API_FAST_LISTS=fast):
+                bodies[fast], next_url = [], url
+                while next_url:
+                    response = self.client.get(next_url)
+                    self.assertEqual(response.status_code, 200)
+                    bodies[fast].append(response.content)
+                    next_url = response.json()["next"]
+        return bodies[True], bodies[False]
+
+    def test_log_rows_match_the_serializer(self):
+        fast, serialized = self.pages("/api/workouts/logs/?page_size=3")
+
+        self.assertEqual(fast, serialized)
+        self.assertEqual(len(fast), 2)
+        logs = json.loads(fast[0])["results"]
+        self.assertEqual(logs[0]["volume"], 700.35)
+        self.assertEqual(logs[0]["weight"], "33.35")
+        self.assertEqual(json.loads(fast[1])["results"][0]["notes"], "")
+
+    def test_session_rows_and_filtered_lists_match_the_serializer(self):
+        fast, serialized = self.pages(f"/api/workouts/logs/?session_id={self.session.id}")
+        self.assertEqual(fast, serialized)
+
+        fast, serialized = self.pages("/api/workouts/sessions/?page_size=1")
+        self.assertEqual(fast, serialized)
+        self.assertEqual(json.loads(fast[0])["results"][0]["program_name"], "Strength")
+        self.assertNotIn("program_name", json.loads(fast[1])["results"][0])
+
+    def test_shaped_requests_keep_the_serializer(self):
+        with self.assertNumQueries(2):
+            body = self.client.get("/api/workouts/sessions/", {"include": "logs"}).json()
+        self.assertEqual(len(body["results"][1]["logs"]), 2)
+
+
+class IdentityMapTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.program = ExerciseProgram.objects.create(name="Strength", user=self.user)
+
+    def selects(self, queries, table):
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT") and f'FROM "{table}"' in query["sql"]
+        ]
+
+    def test_each_object_is_loaded_once_per_request(self):
+        payload = {"session": self.session.id, "exercise": self.exercise.id, "sets": 3, "reps": 5}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/workouts/logs/", payload | {"weight": "80"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.selects(queries, "workouts_trainingsession")), 1)
+        self.assertEqual(len(self.selects(queries, "exercises_exercise")), 1)
+        self.assertEqual(self.selects(queries, "accounts_user"), [])
+
+        payload = {"program": self.program.id, "exercise": self.exercise.id, "order": 1}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/programs/program-exercises/", payload)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.selects(queries, "programs_exerciseprogram")), 1)
+        self.assertEqual(self.selects(queries, "accounts_user"), [])
+
+    def test_ownership_is_still_enforced(self):
+        other = User.objects.create_user(username="other", email="o@example.com", password="x")
+        theirs = TrainingSession.objects.create(user=other, date=date(2025, 1, 7), duration=5)
+        their_program = ExerciseProgram.objects.create(name="Theirs", user=other)
+        payload = {"session": theirs.id, "exercise": self.exercise.id, "sets": 3, "reps": 5}
+
+        self.assertEqual(self.client.post("/api/workouts/logs/", payload).status_code, 403)
+        url = "/api/programs/program-exercises/"
+        payload = {"program": their_program.id, "exercise": self.exercise.id}
+        self.assertEqual(self.client.post(url, payload).status_code, 403)
+        response = self.client.post(url, payload | {"program": 999})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("program", response.json())
+        mine = ProgramExercise.objects.create(program=self.program, exercise=self.exercise)
+        self.assertEqual(self.client.get(f"{url}{mine.id}/").status_code, 200)
+        self.assertEqual(self.client.get(f"/api/workouts/sessions/{theirs.id}/").status_code, 404)
+
+
+@override_settings(REQUEST_METRICS=True)
+class RequestMetricsTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.log(weight=Decimal("100"))
+
+    def test_server_timing_and_metrics(self):
+        self.assertNotIn("Server-Timing", self.client.get("/api/workouts/logs/"))
+        self.assertNotIn("Server-Timing", APIClient().get("/api/_metrics/"))
+        self.assertEqual(self.client.get("/api/_metrics/").status_code, 403)
+        registry.clear()
+
+        self.user.is_staff = True
+        self.user.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/workouts/sessions/", {"include": "logs"})
+        # Captured now, as the next request resets the connection's query log
+        count = len(queries)
+        timing = response["Server-Timing"]
+        self.assertIn(f'desc="{count} queries"', timing)
+        serialize = re.search(r"serialize;dur=([\d.]+)", timing).group(1)
+        self.assertGreater(float(serialize), 0)
+
+        body = self.client.get("/api/_metrics/").content.decode()
+        self.assertIn("# TYPE tmn_request_duration_seconds summary", body)
+        labels = 'view="session-list",method="GET"'
+        self.assertIn(f'tmn_request_sql_queries{{{labels},quantile="0.99"}} {count}', body)
+        self.assertIn(f"tmn_request_duration_seconds_count{{{labels}}} 1", body)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled_middleware_drops_out(self):
+        response = self.client.get("/api/workouts/logs/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(registry.render().count("_count"), 0)
+
+
+class SeedAndBenchmarkTests(TestCase):
+    def seed(self):
+        out = StringIO()
+        call_command("seed_fitness", users=1, years=0.1, prefix="bench", stdout=out)
+        return User.objects.get(username="bench0000")
+
+    def test_seeding_is_reproducible(self):
+        user = self.seed()
+        weights = list(
+            WorkoutLog.objects.filter(session__user=user)
+            .order_by("session__date", "id")
+            .values_list("exercise__name", "weight")
+        )
+        self.assertGreater(len(weights), 50)
+        self.assertEqual(Profile.objects.filter(user=user, is_current=True).count(), 1)
+        self.assertTrue(DailyExerciseRollup.objects.filter(user=user).exists())
+
+        user.delete()
+        again = self.seed()
+        self.assertEqual(
+            list(
+                WorkoutLog.objects.filter(session__user=again)
+                .order_by("session__date", "id")
+                .values_list("exercise__name", "weight")
+            ),
+            weights,
+        )
+
+    def test_benchmark_baseline_and_regressions(self):
+        self.seed()
+        options = {"username": "bench0000", "only": r"workouts/(logs|sessions)/", "repeat": 2}
+        path = os.path.join(self.enterContext(TemporaryDirectory()), "baseline.json")
+        out, err = StringIO(), StringIO()
+        call_command("bench_endpoints", save_baseline=path, stdout=out, stderr=err, **options)
+
+        with open(path) as stream:
+            baseline = json.load(stream)
+        endpoints = baseline["endpoints"]
+        self.assertEqual(
+            sorted(endpoints),
+            [
+                "GET /api/workouts/logs/",
+                "GET /api/workouts/logs/<pk>/",
+                "GET /api/workouts/sessions/",
+                "GET /api/workouts/sessions/<pk>/",
+                "GET /api/workouts/sessions/<pk>/program_exercises/",
+            ],
+        )
+        self.assertEqual(endpoints["GET /api/workouts/logs/"]["queries"], 1)
+
+        # Timings of two runs are noise, only query counts and statuses count
+        call_command(
+            "bench_endpoints", baseline=path, min_delta_ms=1000, stdout=out, stderr=err, **options
+        )
+        self.assertIn("No regressions", out.getvalue())
+
+        endpoints["GET /api/workouts/logs/"]["queries"] = 0
+        endpoints["GET /api/workouts/sessions/"]["p50_ms"] = 0.0
+        with open(path, "w") as stream:
+            json.dump(baseline, stream)
+        err = StringIO()
+        with self.assertRaisesMessage(CommandError, "regressions against"):
+            call_command(
+                "bench_endpoints", baseline=path, min_delta_ms=0, stdout=out, stderr=err, **options
+            )
+        self.assertIn("GET /api/workouts/logs/: 0 -> 1 queries", err.getvalue())
+        self.assertIn("GET /api/workouts/sessions/: p50 0.00ms ->", err.getvalue())
+
+
+class SQLiteBackendTests(TestCase):
+    def test_pragmas_and_immediate_transactions(self):
+        pragmas = {}
+        with connection.cursor() as cursor:
+            for name in ("synchronous", "busy_timeout", "cache_size", "temp_store"):
+                cursor.execute(f"PRAGMA {name}")
+                pragmas[name] = cursor.fetchone()[0]
+
+        self.assertEqual(
+            pragmas, {"synchronous": 1, "busy_timeout": 5000, "cache_size": -20000, "temp_store": 2}
+        )
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+    def test_wal_and_health_check(self):
+        directory = self.enterContext(TemporaryDirectory())
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, "NAME": os.path.join(directory, "db.sqlite3")}, "scratch"
+        )
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+
+        self.assertTrue(wrapper.is_usable())
+        wrapper.connection.close()
+        self.assertFalse(wrapper.is_usable())
+
+    def test_stress_command(self):
+        out = StringIO()
+        # The command's scratch databases are aliases added while it runs
+        scratch = {"stress_template", "stress_stock", "stress_tuned"}
+        with mock.patch.object(type(self), "databases", {"default", *scratch}):
+            call_command("stress_sqlite", writers=3, readers=1, seconds=0.3, stdout=out)
+
+        rows = {
+            line.split()[0]: line.split()[1:]
+            for line in out.getvalue().splitlines()
+            if line.split()[0] in ("stock", "tuned")
+        }
+        posts, locked = float(rows["tuned"][0]), int(rows["tuned"][1])
+        self.assertGreater(posts, 0)
+        self.assertEqual(locked, 0)
+
+
+@override_settings(REPLICA_DATABASE="replica", REPLICA_PIN_SECONDS=30)
+class ReplicaRoutingTests(WorkoutDataMixin, TransactionTestCase):
+    # Two separate test databases, copied with sync_replica
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        get_cache().clear()
+        super().setUp()
+        self.first = self.log(weight=Decimal("100"))
+        call_command("sync_replica", stdout=StringIO())
+        self.second = self.log(weight=Decimal("110"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_ids(self):
+        response = self.client.get("/api/workouts/logs/")
+        return [log["id"] for log in response.json()["results"]]
+
+    def test_lists_and_exports_read_from_the_replica(self):
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertEqual(self.list_ids(), [self.first.id])
+            export = self.client.get("/api/workouts/export/", {"format": "ndjson"})
+            self.assertEqual(len(b"".join(export.streaming_content).splitlines()), 1)
+            # Only lists use the replica
+            detail = self.client.get(f"/api/workouts/logs/{self.second.id}/")
+            self.assertEqual(detail.status_code, 200)
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        self.assertEqual(self.list_ids(), [self.first.id, self.second.id])
+
+    def test_unknown_writes_read_from_the_primary(self):
+        get_cache().clear()
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertEqual(self.list_ids(), [self.first.id, self.second.id])
+            # That list set the watermarks again
+            self.assertEqual(self.list_ids(), [self.first.id])
+
+    def test_writes_go_to_the_primary(self):
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            response = self.client.post(
+                "/api/workouts/logs/",
+                {"session": self.session.id, "exercise": self.exercise.id, "sets": 3, "reps": 5},
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(WorkoutLog.objects.count(), 3)
+        self.assertEqual(WorkoutLog.objects.using("replica").count(), 1)
+        self.assertFalse(router.allow_migrate("replica", "workouts"))
+
+        call_command("sync_replica", stdout=StringIO())
+        self.assertEqual(WorkoutLog.objects.using("replica").count(), 3)
+
+
+@override_settings(SHARD_DATABASES=["shard0", "shard1"])
+class ShardingTests(TransactionTestCase):
+    databases = {"default", "shard0", "shard1"}
+    # Rebalancing moves rows into other id ranges; setUp reserves them again
+    reset_sequences = True
+
+    def setUp(self):
+        get_cache().clear()
+        for alias in ("shard0", "shard1"):
+            reserve_id_ranges(using=alias)
+        # A user on each shard
+        self.users = {}
+        while len(self.users) < 2:
+            number = User.objects.count()
+            user = User.objects.create_user(
+                username=f"lifter{number}", email=f"lifter{number}@example.com", password="pass1234"
+            )
+            self.users.setdefault(shard_for(user.pk), user)
+
+    def add_history(self, user):
+        exercise = Exercise.objects.create(name="Squat", category="Legs", user=user)
+        session = TrainingSession.objects.create(user=user, date=date(2025, 1, 6), duration=60)
+        return WorkoutLog.objects.create(
+            session=session, exercise=exercise, sets=3, reps=5, weight=Decimal("100")
+        )
+
+    def rebalance(self, **options):
+        out = StringIO()
+        call_command("rebalance_shards", stdout=out, **options)
+        return out.getvalue()
+
+    def test_placement_is_stable_and_moves_few_users(self):
+        user_ids = range(1, 1001)
+        two = [shard_for(user_id) for user_id in user_ids]
+        three = [shard_for(user_id, ["shard0", "shard1", "shard2"]) for user_id in user_ids]
+
+        self.assertEqual(two, [shard_for(user_id) for user_id in user_ids])
+        self.assertTrue(400 < two.count("shard0") < 600)
+        moved = [after for before, after in zip(two, three) if before != after]
+        # Only users won by the new shard move, about a third of them
+        self.assertEqual(set(moved), {"shard2"})
+        self.assertTrue(250 < len(moved) < 420)
+
+    def test_requests_use_the_users_shard(self):
+        for alias, user in self.users.items():
+            client = APIClient()
+            client.force_authenticate(user)
+            exercise = client.post("/api/exercises/", {"name": "Squat", "category": "Legs"})
+            session = client.post(
+                "/api/workouts/sessions/", {"date": "2025-01-06", "duration": 60}
+            )
+            log = client.post(
+                "/api/workouts/logs/",
+                {
+                    "session": session.data["id"],
+                    "exercise": exercise.data["id"],
+                    "sets": 3,
+                    "reps": 5,
+                    "weight": "100",
+                },
+            )
+            self.assertEqual(log.status_code, 201)
+            (listed,) = client.get("/api/workouts/logs/").json()["results"]
+            index = ["shard0", "shard1"].index(alias) + 1
+            self.assertTrue(index * ID_RANGE < listed["id"] < (index + 1) * ID_RANGE)
+
+        for alias, user in self.users.items():
+            self.assertEqual(
+                list(WorkoutLog.objects.using(alias).values_list("session__user", flat=True)),
+                [user.pk],
+            )
+            self.assertEqual(DailyExerciseRollup.objects.using(alias).count(), 1)
+            self.assertTrue(PersonalRecord.objects.using(alias).exists())
+        self.assertFalse(WorkoutLog.objects.using("default").exists())
+        with self.assertRaisesMessage(RuntimeError, "No shard for workouts.WorkoutLog"):
+            WorkoutLog.objects.count()
+
+    def test_deleting_a_user_deletes_their_shard_data(self):
+        user = self.users["shard1"]
+        with use_user_shard(user.pk):
+            self.add_history(user)
+
+        user.delete()
+
+        self.assertFalse(User.objects.using("shard1").filter(pk=user.pk).exists())
+        self.assertFalse(TrainingSession.objects.using("shard1").exists())
+        self.assertFalse(PersonalRecord.objects.using("shard1").exists())
+
+    def test_rebalance(self):
+        misplaced, unsharded = self.users["shard0"], self.users["shard1"]
+        # Written while shard1 was the only shard, and before sharding
+        with override_settings(SHARD_DATABASES=["shard1"]), use_user_shard(misplaced.pk):
+            copy_users([misplaced])
+            first = self.add_history(misplaced)
+        with override_settings(SHARD_DATABASES=[]):
+            second = self.add_history(unsharded)
+
+        planned = self.rebalance(dry_run=True)
+        self.assertIn(f"Would move user {misplaced.pk}: shard1 -> shard0", planned)
+        self.assertIn(f"Would move user {unsharded.pk}: default -> shard1", planned)
+        self.assertTrue(WorkoutLog.objects.using("default").exists())
+
+        # An id taken by another user's row rolls the owner's move back
+        with override_settings(SHARD_DATABASES=["shard0"]):
+            copy_users([unsharded])
+        taken = Exercise.objects.using("shard0").create(
+            pk=first.exercise_id, name="Bench", category="Chest", user=unsharded
+        )
+        with self.assertRaisesMessage(CommandError, "already exists on"):
+            self.rebalance()
+        self.assertTrue(WorkoutLog.objects.using("shard1").filter(pk=first.pk).exists())
+        taken.delete()
+        self.rebalance()
+
+        for log, alias in ((first, "shard0"), (second, "shard1")):
+            moved = WorkoutLog.objects.using(alias).get(pk=log.pk)
+            self.assertEqual(moved.weight, Decimal("100"))
+            self.assertTrue(PersonalRecord.objects.using(alias).filter(workout_log=moved).exists())
+        self.assertFalse(WorkoutLog.objects.using("default").exists())
+        self.assertFalse(User.objects.using("shard1").filter(pk=misplaced.pk).exists())
+        self.assertIn("Moved 0 users", self.rebalance())
+
+    def test_rebalance_never_drops_rows_on_a_failed_commit(self):
+        user = self.users["shard0"]
+        with override_settings(SHARD_DATABASES=["shard1"]), use_user_shard(user.pk):
+            copy_users([user])
+            log = self.add_history(user)
+        records = PersonalRecord.objects.using("shard1").count()
+        failure = OperationalError("disk I/O error")
+
+        # The target fails: everything stays on the source
+        with mock.patch.object(connections["shard0"], "commit", side_effect=failure):
+            with self.assertRaises(OperationalError):
+                self.rebalance()
+        self.assertTrue(WorkoutLog.objects.using("shard1").filter(pk=log.pk).exists())
+        self.assertFalse(WorkoutLog.objects.using("shard0").exists())
+
+        # The source fails after the target committed: the rows are on both,
+        # and the next run finishes the move
+        with mock.patch.object(connections["shard1"], "commit", side_effect=failure):
+            with self.assertRaises(OperationalError):
+                self.rebalance()
+        self.assertTrue(WorkoutLog.objects.using("shard1").filter(pk=log.pk).exists())
+        self.assertTrue(WorkoutLog.objects.using("shard0").filter(pk=log.pk).exists())
+        self.assertIn("Moved 1 users", self.rebalance())
+        self.assertFalse(WorkoutLog.objects.using("shard1").exists())
+        self.assertEqual(WorkoutLog.objects.using("shard0").get().pk, log.pk)
+        self.assertEqual(PersonalRecord.objects.using("shard0").count(), records)
+
+    def test_benchmark(self):
+        out = StringIO()
+        scratch = {"bench_template", "bench_1_0", "bench_2_0", "bench_2_1"}
+        with mock.patch.object(type(self), "databases", {*self.databases, *scratch}):
+            call_command(
+                "bench_shards", shards="1,2", writers=2, seconds=0.3, work_ms=0, stdout=out
+            )
+
+        rows = {line.split()[0]: line.split()[1:] for line in out.getvalue().splitlines()[2:]}
+        self.assertEqual(set(rows), {"1", "2"})
+        self.assertGreater(float(rows["2"][1]), 0)
+        self.assertEqual(rows["2"][2], "0")
+
+
+class WorkoutExportTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.log(weight=Decimal("100"))
+        TrainingSession.objects.create(user=self.user, date=date(2025, 2, 1), duration=30)
+
+    def read(self, response):
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_includes_sessions_without_logs(self):
+        response = self.client.get("/api/workouts/export/", {"format": "csv"})
+
+        lines = self.read(response).splitlines()
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(lines[0].split(",")[:3], ["session_id", "date", "program"])
+        self.assertEqual(len(lines), 3)
+        self.assertIn("Squat", lines[1])
+
+    def test_ndjson_export_with_date_filter(self):
+        response = self.client.get(
+            "/api/workouts/export/", {"format": "ndjson", "until": "2025-01-31"}
+        )
+
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["weight"], "100.00")
+        self.assertEqual(
+            self.client.get("/api/workouts/export/", {"since": "yesterday"}).status_code, 400
+        )
+
+
+class WorkoutImportTests(WorkoutDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content, **extra):
+        return self.client.post(
+            "/api/workouts/import/",
+            {"file": SimpleUploadedFile(name, content.encode()), **extra},
+            format="multipart",
+        )
+
+    def test_csv_import_reports_rows_and_refreshes_derived_data(self):
+        content = (
+            "date,exercise,category,sets,reps,weight\n"
+            "2025-01-06,Squat,Legs,3,5,100\n"
+            "2025-01-07,Squat,,5,5,110.5\n"
+            "2025-01-07,Deadlift,Back,1,1,180\n"
+            "not-a-date,Squat,Legs,x,5,100\n"
+        )
+        response = self.upload("history.csv", content)
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report["imported"], 3)
+        self.assertEqual(report["exercises_created"], 1)
+        self.assertEqual(report["sessions_created"], 1)
+        self.assertEqual(report["errors"][0]["row"], 4)
+        self.assertEqual(set(report["errors"][0]["errors"]), {"date", "sets"})
+
+        # The existing session of 2025-01-06 is reused
+        self.assertEqual(self.session.workout_logs.count(), 1)
+        rollup = DailyExerciseRollup.objects.get(
+            user=self.user, exercise=self.exercise, date=date(2025, 1, 7)
+        )
+        self.assertEqual((rollup.total_reps, rollup.max_weight), (25, Decimal("110.50")))
+        self.assertEqual(
+            PersonalRecord.objects.get(
+                exercise=self.exercise, record_type=PersonalRecord.MAX_WEIGHT
+            ).value,
+            Decimal("110.50"),
+        )
+
+    def test_ndjson_import_groups_rows_by_session_reference(self):
+        rows = [
+            {"session_id": 7, "date": "2025-03-01", "exercise": "Squat", "sets": 3, "reps": 5},
+            {"session_id": 7, "date": "2025-03-01", "exercise": "Squat", "sets": 2, "reps": 5},
+            {"session_id": 8, "date": "2025-03-01", "duration": 20},
+        ]
+        content = "\n".join(json.dumps(row) for row in rows) + "\n{broken\n"
+        response = self.upload("history.jsonl", content)
+
+        report = response.json()
+        self.assertEqual((report["imported"], report["sessions_created"]), (2, 2))
+        self.assertEqual(report["errors"], [{"row": 4, "errors": {"row": "Invalid JSON object."}}])
+        self.assertEqual(self.upload("history.txt", "").status_code, 400)
+
+    def test_committed_chunks_are_refreshed_when_a_later_one_fails(self):
+        def lines():
+            yield "date,exercise,category,sets,reps,weight\n"
+            yield "2025-01-07,Squat,Legs,5,5,120\n"
+            yield "2025-01-08,Squat,Legs,5,5,100\n"
+            raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+        with self.assertRaises(UnicodeDecodeError):
+            import_workouts(self.user, lines(), "csv", chunk_size=1)
+
+        self.assertEqual(WorkoutLog.objects.filter(session__user=self.user).count(), 2)
+        self.assertEqual(
+            DailyExerciseRollup.objects.filter(user=self.user, exercise=self.exercise).count(), 2
+        )
+        self.assertEqual(
+            PersonalRecord.objects.get(
+                exercise=self.exercise, record_type=PersonalRecord.MAX_WEIGHT
+            ).value,
+            Decimal("120"),
+        )
+
+
+@skipUnless(connection.vendor == "sqlite", "Plans are read from SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(TestCase):
+    """The hot-path queries must be answered from an index, never a full scan"""
+
+    def assertIndexed(self, queryset, index=None):
+        plan = queryset.explain()
+        scans = [line for line in plan.splitlines() if re.search(r"\bSCAN\b", line)]
+        self.assertEqual(scans, [], f"Full scan in:\n{plan}")
+        if index:
+            self.assertIn(index, plan)
+
+    def test_session_and_log_lists(self):
+        pagination = KeysetPagination()
+        sessions = TrainingSession.objects.filter(user_id=1)
+        self.assertIndexed(
+            sessions.order_by("-date", "-created_at", "-id")[:51], "session_user_date_idx"
+        )
+        self.assertIndexed(sessions.filter(date__in=[date(2025, 1, 6)]), "session_user_date_idx")
+
+        ordering = ["session__date", "id"]
+        logs = WorkoutLog.objects.filter(session__user_id=1).select_related("session", "exercise")
+        self.assertIndexed(logs.order_by(*ordering)[:51], "session_user_date_idx")
+        after = pagination._after(ordering, ["2025-01-06", 10])
+        self.assertIndexed(logs.filter(after).order_by(*ordering)[:51], "session_user_date_idx")
+
+    def test_exercise_history(self):
+        logs = WorkoutLog.objects.filter(session__user_id=1, exercise_id=1, weight__gt=0)
+        self.assertIndexed(
+            logs.order_by("-weight", "session__date", "id")[:1], "log_exercise_session_idx"
+        )
+        self.assertIndexed(
+            DailyExerciseRollup.objects.filter(
+                user_id=1, exercise_id__in=[1, 2], date__gte=date(2025, 1, 1)
+            ).order_by("exercise_id", "date")
+        )
+        self.assertIndexed(ProgramExercise.objects.filter(program_id=1).order_by("order", "id"))
+
+    def test_profiles_and_exercises(self):
+        profiles = Profile.objects.filter(user_id=1)
+        self.assertIndexed(profiles.order_by("-created_at", "-id")[:51], "profile_user_created_idx")
+        self.assertIndexed(profiles.filter(is_current=True))
+        self.assertIndexed(
+            profiles.filter(
+                created_at__range=[
+                    datetime(2025, 1, 1, tzinfo=timezone.utc),
+                    datetime(2025, 2, 1, tzinfo=timezone.utc),
+                ]
+            ),
+            "profile_user_created_idx",
+        )
+        exercises = Exercise.objects.filter(user_id=1)
+        self.assertIndexed(exercises.filter(name="Squat", category="Legs"), "exercise_user_name_idx")
+        self.assertIndexed(exercises.order_by("name", "id")[:51], "exercise_user_name_idx")
@@ -1,12 +1,21 @@
 # workouts/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TrainingSessionViewSet, WorkoutLogViewSet
+from .views import (
+    TrainingSessionViewSet,
+    WorkoutLogViewSet,
+    PersonalRecordViewSet,
+    WorkoutExportView,
+    WorkoutImportView,
+)
 
 router = DefaultRouter()
 router.register(r'sessions', TrainingSessionViewSet, basename='session')
 router.register(r'logs', WorkoutLogViewSet, basename='log')
+router.register(r'records', PersonalRecordViewSet, basename='record')
 
 urlpatterns = [
+    path('export/', WorkoutExportView.as_view(), name='workout-export'),
+    path('import/', WorkoutImportView.as_view(), name='workout-import'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
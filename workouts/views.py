@@ -1,20 +1,82 @@
+import csv
+import io
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import router, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets
+from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from .serializers import (
     WorkoutLogCreateUpdateSerializer,
     WorkoutLogSerializer,
     TrainingSessionSerializer,
+    PersonalRecordSerializer,
 )
-from .models import WorkoutLog, TrainingSession
+from .models import WorkoutLog, TrainingSession, PersonalRecord
+from .records import new_record_flags
+from .fast_lists import FastListMixin, TrainingSessionRows, WorkoutLogRows
+from .export import CSVRenderer, NDJSONRenderer, export_rows, stream_csv, stream_ndjson
+from .idempotency import idempotent
+from .includes import parse_includes, plan_includes
+from .importer import FILE_TYPES, detect_file_type, import_workouts
 from .permissions import IsSessionOwner, CanLogExercise
+from .signals import sync_log_writes
+from TMN.conditional import ConditionalGetMixin
+from TMN.fieldsets import SparseFieldsetMixin
+from TMN.identity import IdentityMapMixin
+from TMN.pagination import KeysetPagination
+from TMN.replicas import ReplicaReadsMixin
 from programs.serializers import ProgramExerciseReadSerializer
 from programs.models import ProgramExercise
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+
 
+MAX_BULK_LOGS = 100
 
-class WorkoutLogViewSet(viewsets.ModelViewSet):
+
+def latest_logs(session, exercise_ids):
+    """{exercise_id: {sets, reps, weight}} of the user's most recent log of
+    each exercise up to the session's day (excluding the session), in one query"""
+    ranked = (
+        WorkoutLog.objects.filter(
+            session__user_id=session.user_id,
+            session__date__lte=session.date,
+            exercise_id__in=exercise_ids,
+        )
+        .exclude(session_id=session.id)
+        .annotate(
+            recency=Window(
+                RowNumber(),
+                partition_by=[F("exercise_id")],
+                order_by=[F("session__date").desc(), F("session_id").desc(), F("id").desc()],
+            )
+        )
+        .filter(recency=1)
+        .values("exercise_id", "sets", "reps", "weight")
+    )
+    return {row["exercise_id"]: row for row in ranked}
+
+
+class WorkoutLogViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    FastListMixin,
+    IdentityMapMixin,
+    ReplicaReadsMixin,
+    viewsets.ModelViewSet,
+):
     permission_classes = [IsSessionOwner, CanLogExercise]
+    pagination_class = KeysetPagination
+    watermark_resources = ["logs", "sessions", "exercises"]
+    list_rows = WorkoutLogRows
 
     def get_serializer_class(self):
         if self.request.method in ["POST", "PATCH", "PUT"]:
@@ -34,6 +96,17 @@ class WorkoutLogViewSet(viewsets.ModelViewSet):
 
         return queryset.order_by("session__date", "id")
 
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk(request)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        data = dict(serializer.data)
+        data["new_records"] = new_record_flags(serializer.instance)
+        headers = self.get_success_headers(serializer.data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+
     def update(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
@@ -51,7 +124,9 @@ class WorkoutLogViewSet(viewsets.ModelViewSet):
 
             # Return the updated data with read serializer
             read_serializer = WorkoutLogSerializer(instance)
-            return Response(read_serializer.data)
+            data = dict(read_serializer.data)
+            data["new_records"] = new_record_flags(instance)
+            return Response(data)
 
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -65,19 +140,82 @@ class WorkoutLogViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=["post", "patch"])
+    def bulk(self, request):
+        """Create (POST) or partially update (PATCH, items carry ``id``) up to
+        MAX_BULK_LOGS logs in one transaction; also reachable by POSTing a list
+        to the collection. The number of queries does not grow with the batch."""
+        if not isinstance(request.data, list):
+            raise ValidationError({"detail": "Expected a list of workout logs."})
+        instance = None
+        if request.method == "PATCH":
+            # Clients that are loosely typed send ids as strings ("5")
+            try:
+                ids = [
+                    WorkoutLog._meta.pk.to_python(item.get("id"))
+                    for item in request.data
+                    if isinstance(item, dict)
+                ]
+            except DjangoValidationError:
+                raise ValidationError({"id": "Expected integer ids."})
+            instance = list(self.get_queryset().filter(pk__in=[pk for pk in ids if pk is not None]))
+        serializer = self.get_serializer(
+            instance,
+            data=request.data,
+            many=True,
+            partial=instance is not None,
+            max_length=MAX_BULK_LOGS,
+            allow_empty=False,
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(using=router.db_for_write(WorkoutLog)):
+            logs = serializer.save()
 
-class TrainingSessionViewSet(viewsets.ModelViewSet):
+        data = WorkoutLogSerializer(logs, many=True).data
+        for item, log in zip(data, logs):
+            item["new_records"] = new_record_flags(log)
+        return Response(
+            data, status=status.HTTP_200_OK if instance is not None else status.HTTP_201_CREATED
+        )
+
+
+class TrainingSessionViewSet(
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    FastListMixin,
+    IdentityMapMixin,
+    ReplicaReadsMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = TrainingSessionSerializer
     permission_classes = [IsSessionOwner]
+    pagination_class = KeysetPagination
+    watermark_resources = ["sessions", "logs", "programs", "exercises"]
+    list_rows = TrainingSessionRows
 
     def get_queryset(self):
-        queryset = TrainingSession.objects.filter(user=self.request.user)
+        queryset = TrainingSession.objects.filter(user=self.request.user).select_related(
+            "program", "user"
+        )
         program_id = self.request.query_params.get("program_id")
         if program_id:
             queryset = queryset.filter(program_id=program_id)
+        if self.action in ("list", "retrieve"):
+            queryset = plan_includes(queryset, self.get_includes())
 
         return queryset.order_by("-date", "-created_at")
 
+    def get_includes(self):
+        """?include=logs,logs.exercise,program,program.exercises on list and detail"""
+        if self.action not in ("list", "retrieve"):
+            return set()
+        return parse_includes(self.request.query_params.get("include"))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include"] = self.get_includes()
+        return context
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -94,7 +232,7 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
 
             program_exercises = (
                 ProgramExercise.objects.filter(program=session.program)
-                .select_related("exercise")
+                .select_related("program", "exercise")
                 .order_by("order")
             )
 
@@ -107,55 +245,152 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=True, methods=["post"])
+    @idempotent
     def create_program_logs(self, request, pk=None):
-        """Automatically create workout logs for all exercises in the program"""
-        try:
-            session = self.get_object()
+        """Create a workout log for every exercise in the session's program.
 
-            if not session.program:
-                return Response(
-                    {"detail": "This session is not linked to a program."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            # Get all exercises from the program
-            program_exercises = ProgramExercise.objects.filter(
-                program=session.program
-            ).select_related("exercise")
-
-            created_logs = []
+        Each log is prefilled with the sets, reps and weight of the user's
+        latest earlier log of that exercise (program defaults otherwise), all
+        in one insert. Send an ``Idempotency-Key`` header to make retries safe."""
+        session = self.get_object()
+        if not session.program_id:
+            return Response(
+                {"detail": "This session is not linked to a program."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-            # Create workout log for each exercise
-            for program_exercise in program_exercises:
-                workout_log = WorkoutLog.objects.create(
+        program_exercises = list(
+            ProgramExercise.objects.filter(program_id=session.program_id)
+            .select_related("exercise", "program")
+            .order_by("order")
+        )
+        latest = latest_logs(session, [pe.exercise_id for pe in program_exercises])
+        logs = []
+        for program_exercise in program_exercises:
+            previous = latest.get(program_exercise.exercise_id, {})
+            logs.append(
+                WorkoutLog(
                     session=session,
                     exercise=program_exercise.exercise,
-                    sets=program_exercise.default_sets or 3,  # Default values
-                    reps=program_exercise.default_reps or 10,
-                    weight=0,  # User will fill this in
+                    sets=previous.get("sets") or program_exercise.default_sets or 3,
+                    reps=previous.get("reps") or program_exercise.default_reps or 10,
+                    weight=previous.get("weight") or 0,
                     rest_time=program_exercise.default_rest_time or 60,
-                    notes=f"Auto-created from program: {session.program.name}",
-                )
-                created_logs.append(
-                    {
-                        "id": workout_log.id,
-                        "exercise": workout_log.exercise.name,
-                        "sets": workout_log.sets,
-                        "reps": workout_log.reps,
-                        "weight": workout_log.weight,
-                        "rest_time": workout_log.rest_time,
-                    }
+                    notes=f"Auto-created from program: {program_exercise.program.name}",
                 )
-
-            return Response(
-                {
-                    "detail": f"Created {len(created_logs)} workout logs",
-                    "logs": created_logs,
-                },
-                status=status.HTTP_201_CREATED,
             )
+        with transaction.atomic(using=router.db_for_write(WorkoutLog)):
+            WorkoutLog.objects.bulk_create(logs)
+            sync_log_writes(logs)
 
-        except TrainingSession.DoesNotExist:
-            return Response(
-                {"detail": "Session not found."}, status=status.HTTP_404_NOT_FOUND
+        created_logs = [
+            {
+                "id": log.id,
+                "exercise": log.exercise.name,
+                "sets": log.sets,
+                "reps": log.reps,
+                "weight": log.weight,
+                "rest_time": log.rest_time,
+            }
+            for log in logs
+        ]
+        return Response(
+            {
+                "detail": f"Created {len(created_logs)} workout logs",
+                "logs": created_logs,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class PersonalRecordViewSet(
+    ConditionalGetMixin, ReplicaReadsMixin, viewsets.ReadOnlyModelViewSet
+):
+    """The user's current personal records, one row per exercise and record type"""
+
+    serializer_class = PersonalRecordSerializer
+    permission_classes = [IsAuthenticated]
+    watermark_resources = ["logs", "sessions", "exercises"]
+
+    def get_queryset(self):
+        queryset = PersonalRecord.objects.filter(user=self.request.user).select_related(
+            "exercise"
+        )
+        exercise_id = self.request.query_params.get("exercise_id")
+        if exercise_id:
+            try:
+                exercise_id = int(exercise_id)
+            except ValueError:
+                raise ValidationError({"exercise_id": "Expected an integer."})
+            queryset = queryset.filter(exercise_id=exercise_id)
+        return queryset.order_by("exercise__name", "record_type")
+
+
+class WorkoutExportView(ReplicaReadsMixin, APIView):
+    """Stream the user's complete training history.
+
+    ``?format=csv`` (default) or ``?format=ndjson``; ``since``/``until``
+    (YYYY-MM-DD) limit the session dates."""
+
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request):
+        since = self._parse_date_param(request, "since")
+        until = self._parse_date_param(request, "until")
+        rows = export_rows(request.user, since=since, until=until)
+
+        if request.accepted_renderer.format == "ndjson":
+            response = StreamingHttpResponse(
+                stream_ndjson(rows), content_type="application/x-ndjson"
             )
+            extension = "ndjson"
+        else:
+            response = StreamingHttpResponse(
+                stream_csv(rows), content_type="text/csv; charset=utf-8"
+            )
+            extension = "csv"
+        response["Content-Disposition"] = f'attachment; filename="training-history.{extension}"'
+        return response
+
+    def _parse_date_param(self, request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: "Expected a date in YYYY-MM-DD format."})
+        return parsed
+
+
+class WorkoutImportView(APIView):
+    """Bulk import workout history from an uploaded CSV, NDJSON or JSON file.
+
+    Accepts the columns produced by the export (date, exercise, category,
+    sets, reps, weight, ...). The type comes from ``file_type`` or the file
+    extension. Invalid rows are skipped and listed in the report."""
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "Upload a CSV, NDJSON or JSON file."})
+        file_type = request.data.get("file_type") or detect_file_type(upload.name)
+        if file_type not in FILE_TYPES:
+            raise ValidationError({"file_type": f"Must be one of: {', '.join(FILE_TYPES)}."})
+
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            result = import_workouts(request.user, stream, file_type)
+        except (ValueError, UnicodeDecodeError, csv.Error) as exc:
+            raise ValidationError({"file": str(exc)})
+
+        return Response(
+            result.as_dict(),
+            status=status.HTTP_201_CREATED if result.imported else status.HTTP_200_OK,
+        )